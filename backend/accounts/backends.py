@@ -3,12 +3,20 @@
 from django.contrib.auth import get_user_model
 from django.contrib.auth.backends import ModelBackend
 
+from .models import normalize_email_address
+
 class EmailBackend(ModelBackend):
     def authenticate(self, request, username=None, password=None, **kwargs):
         UserModel = get_user_model()
+        if username is None:
+            # simplejwt passes the USERNAME_FIELD (email) as a keyword
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if not username:
+            return None
         try:
-            # Try to fetch user by case-insensitive email (which is passed as 'username')
-            user = UserModel.objects.get(email__iexact=username)
+            # Emails are stored lowercased, so this is an exact match on
+            # the unique email index (not a case-insensitive scan).
+            user = UserModel.objects.get(email=normalize_email_address(username))
         except UserModel.DoesNotExist:
             return None
 
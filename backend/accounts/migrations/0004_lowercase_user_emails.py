@@ -0,0 +1,40 @@
+# Generated by Django 5.0.6 on 2026-10-17 02:40
+
+from collections import defaultdict
+
+from django.db import migrations
+
+
+def lowercase_emails(apps, schema_editor):
+    # Logins now match the stored email exactly, so every stored email must
+    # already be in its normalized (stripped, lowercased) form.
+    User = apps.get_model('accounts', 'User')
+    by_normalized = defaultdict(list)
+    for pk, email in User.objects.values_list('id', 'email'):
+        by_normalized[(email or '').strip().lower()].append((pk, email))
+
+    clashes = {email: rows for email, rows in by_normalized.items() if len(rows) > 1}
+    if clashes:
+        raise RuntimeError(
+            "Users whose emails differ only by case must be merged or renamed first: "
+            + ", ".join(sorted(email for rows in clashes.values() for _, email in rows))
+        )
+
+    changed = [
+        User(id=pk, email=normalized)
+        for normalized, rows in by_normalized.items()
+        for pk, email in rows
+        if email != normalized
+    ]
+    User.objects.bulk_update(changed, ['email'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_alter_user_managers_alter_user_email_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(lowercase_emails, migrations.RunPython.noop),
+    ]
@@ -3,10 +3,19 @@
 from django.contrib.auth.models import AbstractUser, UserManager
 from django.db import models
 
+def normalize_email_address(email):
+    """Emails are stored lowercased so logins are exact matches on the unique index."""
+    return (email or "").strip().lower()
+
+
 class CustomUserManager(UserManager):
+    @classmethod
+    def normalize_email(cls, email):
+        return normalize_email_address(email)
+
     def get_by_natural_key(self, username):
         # Allow login with case-insensitive email
-        return self.get(email__iexact=username)
+        return self.get(email=normalize_email_address(username))
 
 class User(AbstractUser):
     class Role(models.TextChoices):
@@ -36,5 +45,9 @@ class User(AbstractUser):
 
     objects = CustomUserManager() # Use the custom manager
 
+    def save(self, *args, **kwargs):
+        self.email = normalize_email_address(self.email)
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.email} ({self.role})"
\ No newline at end of file
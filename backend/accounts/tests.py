@@ -1,3 +1,29 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from .models import User
+
+
+class EmailLoginTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email="  Owner@Example.COM ", username="owner", password="pass12345")
+
+    def test_email_is_stored_lowercased(self):
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.email, "owner@example.com")
+
+    def test_login_is_case_insensitive_and_uses_an_exact_match(self):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = APIClient().post(
+                "/api/token/", {"email": "OWNER@example.com", "password": "pass12345"}, format="json"
+            )
+        self.assertEqual(resp.status_code, 200, resp.content)
+        user_queries = [q["sql"] for q in ctx.captured_queries if 'FROM "accounts_user"' in q["sql"]]
+        self.assertEqual(len(user_queries), 1)
+        self.assertNotIn("LIKE", user_queries[0])
+
+    def test_forgot_password_finds_mixed_case_email(self):
+        resp = APIClient().post("/api/auth/forgot-password/", {"email": "OWNER@EXAMPLE.com"}, format="json")
+        self.assertEqual(resp.status_code, 200)
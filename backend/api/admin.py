@@ -1,6 +1,6 @@
 # backend/api/admin.py
 from django.contrib import admin
-from .models import SubscriptionPlan # Removed UserSubscription
+from .models import OutboundEmail, SubscriptionPlan, WebhookEvent # Removed UserSubscription
 
 # This admin is great, keep it.
 @admin.register(SubscriptionPlan)
@@ -11,4 +11,20 @@ class SubscriptionPlanAdmin(admin.ModelAdmin):
     search_fields = ("name",)
 
 # We remove UserSubscriptionAdmin because it's
-# already an inline on the User page, which is better.
\ No newline at end of file
+# already an inline on the User page, which is better.
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ("to", "subject", "status", "attempts", "next_attempt_at", "sent_at")
+    list_filter = ("status",)
+    search_fields = ("to", "subject")
+    readonly_fields = ("claim_token", "claimed_at", "created_at", "sent_at", "last_error")
+
+
+@admin.register(WebhookEvent)
+class WebhookEventAdmin(admin.ModelAdmin):
+    list_display = ("event_id", "event", "status", "attempts", "received_at", "processed_at")
+    list_filter = ("status", "event")
+    search_fields = ("event_id",)
+    readonly_fields = ("received_at", "processed_at", "last_error")
@@ -1,3 +0,0 @@
-# backend/api/apps.py
-def ready(self):
-    import api.signals
@@ -0,0 +1,16 @@
+# backend/api/apps.py
+from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save
+
+
+class ApiConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'api'
+
+    def ready(self):
+        # api/signals.py (trial on sign-up) stays unconnected, as before.
+        from . import plans
+        from .models import SubscriptionPlan
+
+        post_save.connect(plans.bump_version, sender=SubscriptionPlan, dispatch_uid="plans-version-save")
+        post_delete.connect(plans.bump_version, sender=SubscriptionPlan, dispatch_uid="plans-version-delete")
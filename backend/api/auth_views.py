@@ -3,6 +3,7 @@ import json
 from datetime import timedelta
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.response import Response
@@ -11,14 +12,26 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.views import APIView
 from rest_framework.throttling import AnonRateThrottle
 
+from .tokens import access_token_for, claims_enabled
+
 User = get_user_model()
 
 
+class EntitlementTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Mints the access token through access_token_for (entitlement claims)."""
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        data["access"] = str(access_token_for(RefreshToken(data["refresh"]), self.user))
+        return data
+
+
 class CookieTokenObtainPairView(TokenObtainPairView):
     """
     Returns `access` in json body and sets `refresh` token as httpOnly cookie.
     """
     permission_classes = (permissions.AllowAny,)
+    serializer_class = EntitlementTokenObtainPairSerializer
     
     # --- FIX: Removed the custom throttle ---
     # throttle_classes = [LoginThrottle]
@@ -66,7 +79,14 @@ class CookieTokenRefreshView(APIView):
 
         try:
             token = RefreshToken(refresh_token)
-            new_access = str(token.access_token)
+            user = None
+            if claims_enabled():
+                # Claims are re-read on every refresh so plan changes show up
+                # within one access lifetime.
+                user = User.objects.filter(pk=token.get("user_id"), is_active=True).first()
+                if not user:
+                    return Response({"detail": "User not found."}, status=status.HTTP_401_UNAUTHORIZED)
+            new_access = str(access_token_for(token, user))
 
             # Optionally rotate refresh tokens
             if settings.SIMPLE_JWT.get("ROTATE_REFRESH_TOKENS", False):
@@ -0,0 +1,38 @@
+# backend/api/authentication.py
+from django.contrib.auth import get_user_model
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+from .tokens import ENTITLEMENT_CLAIM, claims_enabled, entitlement_from_claim
+
+User = get_user_model()
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that trusts entitlement claims (see api/tokens.py)
+    instead of loading the user. request.user is an unsaved User built from
+    the token, so FK assignments and shop_id filters work without a query;
+    `user.shop` still loads the shop when a view needs it. The instance
+    only holds what the token carries, so it must never be saved.
+
+    Tokens without the claims, or any token while JWT_ENTITLEMENT_CLAIMS is
+    off, fall back to the normal database lookup.
+    """
+
+    def get_user(self, validated_token):
+        if not claims_enabled() or ENTITLEMENT_CLAIM not in validated_token:
+            return super().get_user(validated_token)
+
+        user = User(
+            pk=validated_token[api_settings.USER_ID_CLAIM],
+            email=validated_token.get("email", ""),
+            username=validated_token.get("username"),
+            role=validated_token.get("role"),
+            shop_id=validated_token.get("shop_id"),
+            is_active=True,
+        )
+        user._state.adding = False
+        user._state.db = "default"
+        user.entitlement = entitlement_from_claim(validated_token[ENTITLEMENT_CLAIM])
+        return user
@@ -1,6 +1,36 @@
 # backend/api/emails.py
-from django.core.mail import send_mail
+"""
+Outbound email.
+
+Views never talk to SMTP: they `enqueue` an OutboundEmail row and return.
+The `send_queued_emails` worker calls `deliver_pending`, which claims a
+batch of due messages, sends them over one reused connection and records
+each outcome. A failed message is retried with exponential backoff (1 min,
+2, 4, ... capped at an hour) until MAX_ATTEMPTS, then marked FAILED.
+"""
+import uuid
+from datetime import timedelta
+
 from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+MAX_ATTEMPTS = 6
+BASE_BACKOFF = timedelta(minutes=1)
+MAX_BACKOFF = timedelta(hours=1)
+# A claim older than this belongs to a worker that died mid-batch.
+CLAIM_TIMEOUT = timedelta(minutes=10)
+
+
+def enqueue(subject, body, to, from_email=None):
+    return OutboundEmail.objects.create(
+        to=to, subject=subject, body=body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+    )
+
 
 def send_password_reset_email(email, reset_url):
     subject = "Password Reset Request"
@@ -17,10 +47,75 @@ If you didn't request this, you can ignore this email.
 Thanks,
 Your Billing App Team
 """
-    send_mail(
-        subject,
-        message,
-        settings.DEFAULT_FROM_EMAIL,
-        [email],
-        fail_silently=False,
+    return enqueue(subject, message, email)
+
+
+def backoff(attempts):
+    return min(BASE_BACKOFF * 2 ** max(attempts - 1, 0), MAX_BACKOFF)
+
+
+def _claim(batch_size, now):
+    due = (
+        Q(status='PENDING', next_attempt_at__lte=now)
+        | Q(status='SENDING', claimed_at__lt=now - CLAIM_TIMEOUT)
+    )
+    pks = list(OutboundEmail.objects.filter(due).order_by('next_attempt_at').values_list('pk', flat=True)[:batch_size])
+    if not pks:
+        return []
+    token = uuid.uuid4().hex
+    # Only rows still due get our token, so two workers never share a message.
+    OutboundEmail.objects.filter(due, pk__in=pks).update(status='SENDING', claim_token=token, claimed_at=now)
+    return list(OutboundEmail.objects.filter(claim_token=token, status='SENDING'))
+
+
+def _failed(message, error, now):
+    message.attempts += 1
+    message.last_error = str(error)[:2000]
+    if message.attempts >= MAX_ATTEMPTS:
+        message.status = 'FAILED'
+    else:
+        message.status = 'PENDING'
+        message.next_attempt_at = now + backoff(message.attempts)
+
+
+def deliver_pending(batch_size=100, now=None, connection=None):
+    """
+    Sends up to `batch_size` due messages over a single connection.
+    Returns (sent, failed) counts for this batch.
+    """
+    now = now or timezone.now()
+    messages = _claim(batch_size, now)
+    if not messages:
+        return 0, 0
+
+    connection = connection or get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as exc:
+        # Relay unreachable: the whole batch goes back with backoff.
+        for message in messages:
+            _failed(message, exc, now)
+    else:
+        try:
+            for message in messages:
+                email = EmailMessage(message.subject, message.body, message.from_email, [message.to], connection=connection)
+                try:
+                    email.send()
+                except Exception as exc:
+                    _failed(message, exc, now)
+                else:
+                    message.status = 'SENT'
+                    message.attempts += 1
+                    message.sent_at = timezone.now()
+        finally:
+            connection.close()
+
+    for message in messages:
+        message.claim_token = ''
+        message.claimed_at = None
+    OutboundEmail.objects.bulk_update(
+        messages,
+        ['status', 'attempts', 'next_attempt_at', 'last_error', 'claim_token', 'claimed_at', 'sent_at'],
     )
+    sent = sum(1 for message in messages if message.status == 'SENT')
+    return sent, len(messages) - sent
@@ -0,0 +1,138 @@
+# backend/api/entitlements.py
+"""
+Cached subscription entitlements.
+
+SubscriptionMiddleware runs on every request; instead of loading
+UserSubscription (and its plan) each time it reads a small snapshot from
+the cache, keyed by user id:
+
+    {"exists", "allowed_by_admin", "valid_until", "plan_type", "features"}
+
+`valid_until` folds the trial, paid and grace windows of
+UserSubscription.is_valid() into one timestamp, so checking validity is a
+comparison with now. UserSubscription.save() (and so activate_plan,
+start_trial and enter_grace_period) drops the user's entry.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+DEFAULT_TTL = 300
+
+
+def _key(user_id):
+    return f"entitlements:{user_id}"
+
+
+def snapshot(subscription):
+    """Builds the cacheable entitlement dict for a UserSubscription (or None)."""
+    if subscription is None:
+        return {"exists": False, "allowed_by_admin": False, "valid_until": None, "plan_type": None, "features": {}}
+
+    windows = [subscription.grace_period_end]
+    if subscription.active:
+        windows.append(subscription.end_date)
+        if subscription.trial_used:
+            windows.append(subscription.trial_end_date)
+    windows = [end for end in windows if end is not None]
+
+    plan = subscription.plan
+    return {
+        "exists": True,
+        "allowed_by_admin": subscription.allowed_by_admin,
+        "valid_until": max(windows) if windows else None,
+        "plan_type": plan.plan_type if plan else None,
+        "features": (plan.features or {}) if plan else {},
+    }
+
+
+def for_user(user_id):
+    """Returns the user's entitlement snapshot, loading it on a cache miss."""
+    data = cache.get(_key(user_id))
+    if data is None:
+        from .models import UserSubscription
+        subscription = UserSubscription.objects.select_related("plan").filter(user_id=user_id).first()
+        data = snapshot(subscription)
+        cache.set(_key(user_id), data, getattr(settings, "ENTITLEMENT_CACHE_TTL", DEFAULT_TTL))
+    return data
+
+
+def is_valid(entitlement, now=None):
+    """Same answer as UserSubscription.is_valid(), from a snapshot."""
+    if not entitlement["exists"]:
+        return False
+    if entitlement["allowed_by_admin"]:
+        return True
+    valid_until = entitlement["valid_until"]
+    return valid_until is not None and (now or timezone.now()) <= valid_until
+
+
+def has_feature(entitlement, feature_name, now=None):
+    if entitlement["allowed_by_admin"]:
+        return True
+    if not is_valid(entitlement, now):
+        return False
+    return entitlement["features"].get(feature_name, False)
+
+
+def current(user):
+    """The request user's snapshot: from the token claims if present, else cached."""
+    return getattr(user, "entitlement", None) or for_user(user.pk)
+
+
+def _owner_key(shop_id):
+    return f"shop-owner:{shop_id}"
+
+
+def shop_owner_id(shop_id):
+    """Id of the shop's (first) SHOP_OWNER user, or None; cached like the snapshots."""
+    owner_id = cache.get(_owner_key(shop_id))
+    if owner_id is None:
+        from accounts.models import User
+        owner_id = (
+            User.objects.filter(shop_id=shop_id, role=User.Role.SHOP_OWNER)
+            .order_by("id").values_list("id", flat=True).first()
+        ) or 0
+        cache.set(_owner_key(shop_id), owner_id, getattr(settings, "ENTITLEMENT_CACHE_TTL", DEFAULT_TTL))
+    return owner_id or None
+
+
+def for_shop(user):
+    """
+    The snapshot whose plan governs the user's shop: the shop owner's.
+    Shopkeepers usually have no subscription of their own, so shop-wide
+    limits such as `max_bills_per_week` must not come from current(user).
+    """
+    from accounts.models import User
+    if user.role == User.Role.SHOP_OWNER or not user.shop_id:
+        return current(user)
+    owner_id = shop_owner_id(user.shop_id)
+    return for_user(owner_id) if owner_id else current(user)
+
+
+def limit(entitlement, feature_name):
+    """
+    Numeric plan limit such as `max_bills_per_week`, or None for
+    unlimited (admin override, feature absent, or a negative value).
+    """
+    if entitlement["allowed_by_admin"]:
+        return None
+    value = entitlement["features"].get(feature_name)
+    if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+        return None
+    return value
+
+
+def invalidate(user_id):
+    """
+    Drops the cached entry now and again once the surrounding transaction
+    commits, so a request racing the write cannot re-cache the old state.
+    """
+    cache.delete(_key(user_id))
+    transaction.on_commit(lambda: cache.delete(_key(user_id)))
+
+
+def invalidate_many(user_ids):
+    """Drops several users' entries, e.g. after a bulk UPDATE that skips save()."""
+    cache.delete_many([_key(user_id) for user_id in user_ids])
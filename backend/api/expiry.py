@@ -0,0 +1,71 @@
+# backend/api/expiry.py
+"""
+Batch subscription expiry.
+
+`sweep` finds subscriptions whose paid or trial period has ended and moves
+them into the grace period, and ends grace periods that have run out, with
+one indexed SELECT and chunked UPDATEs per step instead of discovering
+expiry lazily on each request. It is run by the `expire_subscriptions`
+command (e.g. from cron every few minutes).
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from . import entitlements
+from .models import UserSubscription
+
+# Same length as UserSubscription.enter_grace_period().
+GRACE_PERIOD = timedelta(days=3)
+CHUNK_SIZE = 1000
+
+
+def expired(now):
+    """Active subscriptions with no paid or trial time left."""
+    return (
+        UserSubscription.objects
+        .filter(Q(end_date__lt=now) | Q(trial_end_date__lt=now), active=True, allowed_by_admin=False)
+        .exclude(end_date__gte=now)
+        .exclude(trial_used=True, trial_end_date__gte=now)
+    )
+
+
+# When the paid or trial period actually ended. expired() guarantees at
+# least one of the two dates is set; Coalesce keeps Greatest off NULLs.
+LAPSED_AT = Greatest(Coalesce("end_date", "trial_end_date"), Coalesce("trial_end_date", "end_date"))
+
+
+def grace_over(now):
+    """Subscriptions whose grace period has ended."""
+    return UserSubscription.objects.filter(grace_period_end__lt=now, allowed_by_admin=False)
+
+
+def _update(rows, **changes):
+    for start in range(0, len(rows), CHUNK_SIZE):
+        chunk = rows[start:start + CHUNK_SIZE]
+        UserSubscription.objects.filter(pk__in=[pk for pk, _ in chunk]).update(**changes)
+        user_ids = [user_id for _, user_id in chunk]
+        transaction.on_commit(lambda user_ids=user_ids: entitlements.invalidate_many(user_ids))
+
+
+def sweep(now=None, dry_run=False):
+    """
+    Returns {"grace": n, "inactive": m}: subscriptions moved into grace and
+    subscriptions made inactive. Grace runs from when the subscription
+    really lapsed, not from the sweep, so one that lapsed more than
+    GRACE_PERIOD ago goes straight to inactive.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        ending = list(grace_over(now).values_list("pk", "user_id"))
+        lapsed = expired(now).annotate(lapsed_at=LAPSED_AT)
+        recent = list(lapsed.filter(lapsed_at__gte=now - GRACE_PERIOD).values_list("pk", "user_id"))
+        stale = list(lapsed.filter(lapsed_at__lt=now - GRACE_PERIOD).values_list("pk", "user_id"))
+        if not dry_run:
+            _update(ending, grace_period_end=None, updated_at=now)
+            _update(recent, active=False, grace_period_end=LAPSED_AT + GRACE_PERIOD, updated_at=now)
+            _update(stale, active=False, grace_period_end=None, updated_at=now)
+    return {"grace": len(recent), "inactive": len(ending) + len(stale)}
@@ -0,0 +1,172 @@
+# backend/api/gateway.py
+"""
+Razorpay gateway access.
+
+One client per process, built on first use rather than at import time. It
+sits on a keep-alive requests session with a connection pool and default
+(connect, read) timeouts. Every gateway call goes through `call`, which:
+
+* refuses fast with GatewayUnavailable while the circuit breaker is open
+  (RAZORPAY_BREAKER_THRESHOLD consecutive network/5xx failures open it
+  for RAZORPAY_BREAKER_RESET seconds, after which one trial call decides),
+* records per-operation timing (count, errors, total and max ms), exposed
+  by `metrics()` and logged at DEBUG.
+"""
+import logging
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class GatewayUnavailable(Exception):
+    """The circuit breaker is open; the gateway is not being called."""
+
+
+class TimeoutSession(requests.Session):
+    """requests.Session with a default timeout on every request."""
+
+    def __init__(self, timeout):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+class CircuitBreaker:
+    def __init__(self, threshold, reset_after):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_after:
+                # Half-open: let this call through; its outcome decides.
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+
+_lock = threading.Lock()
+_state = {}  # pid, session, client, breaker
+_metrics = {}
+
+
+def _current():
+    if _state.get("pid") != os.getpid():
+        with _lock:
+            if _state.get("pid") != os.getpid():
+                # Fresh state per process; a forked worker must not share sockets.
+                _state.clear()
+                _metrics.clear()
+                _state["breaker"] = CircuitBreaker(
+                    getattr(settings, "RAZORPAY_BREAKER_THRESHOLD", 5),
+                    getattr(settings, "RAZORPAY_BREAKER_RESET", 30),
+                )
+                _state["pid"] = os.getpid()
+    return _state
+
+
+def get_session():
+    state = _current()
+    if "session" not in state:
+        with _lock:
+            if "session" not in state:
+                session = TimeoutSession((
+                    getattr(settings, "RAZORPAY_CONNECT_TIMEOUT", 3.0),
+                    getattr(settings, "RAZORPAY_READ_TIMEOUT", 10.0),
+                ))
+                session.auth = (settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET)
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=getattr(settings, "RAZORPAY_POOL_SIZE", 10))
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                state["session"] = session
+    return state["session"]
+
+
+def get_client():
+    state = _current()
+    if "client" not in state:
+        session = get_session()
+        with _lock:
+            if "client" not in state:
+                import razorpay
+                state["client"] = razorpay.Client(
+                    session=session, auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET)
+                )
+    return state["client"]
+
+
+def _trips_breaker(exc):
+    from razorpay.errors import GatewayError, ServerError
+    if isinstance(exc, requests.HTTPError):
+        return exc.response is None or exc.response.status_code >= 500
+    return isinstance(exc, (requests.RequestException, GatewayError, ServerError))
+
+
+def _record(name, elapsed_ms, ok):
+    with _lock:
+        stats = _metrics.setdefault(name, {"count": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0})
+        stats["count"] += 1
+        stats["errors"] += 0 if ok else 1
+        stats["total_ms"] += elapsed_ms
+        stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+    logger.debug("razorpay %s %s in %.1f ms", name, "ok" if ok else "failed", elapsed_ms)
+
+
+def call(name, fn, *args, **kwargs):
+    """Runs `fn(*args, **kwargs)` against the gateway, timed and breaker-guarded."""
+    breaker = _current()["breaker"]
+    if not breaker.allow():
+        raise GatewayUnavailable("Payment gateway is temporarily unavailable.")
+    start = time.perf_counter()
+    try:
+        result = fn(*args, **kwargs)
+    except Exception as exc:
+        _record(name, (time.perf_counter() - start) * 1000, ok=False)
+        if _trips_breaker(exc):
+            breaker.failure()
+        else:
+            breaker.success()  # the gateway answered; the request was at fault
+        raise
+    _record(name, (time.perf_counter() - start) * 1000, ok=True)
+    breaker.success()
+    return result
+
+
+def metrics():
+    with _lock:
+        return {name: dict(stats) for name, stats in _metrics.items()}
+
+
+def reset():
+    """Drops the client, session, breaker state and metrics (tests, settings changes)."""
+    with _lock:
+        session = _state.get("session")
+        _state.clear()
+        _metrics.clear()
+    if session is not None:
+        session.close()
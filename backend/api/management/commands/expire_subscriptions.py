@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from api.expiry import sweep
+
+
+class Command(BaseCommand):
+    help = "Moves expired subscriptions into their grace period and ends finished grace periods."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Only report what would change.")
+
+    def handle(self, *args, **options):
+        counts = sweep(dry_run=options["dry_run"])
+        prefix = "Would move" if options["dry_run"] else "Moved"
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix} {counts['grace']} subscriptions into grace and "
+            f"{counts['inactive']} out of grace (now inactive)."
+        ))
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.webhooks import process_pending
+
+
+class Command(BaseCommand):
+    help = "Applies stored Razorpay webhook events (payment captured/failed) exactly once."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100, help="Events loaded per batch.")
+        parser.add_argument("--loop", action="store_true", help="Keep polling instead of exiting when nothing is pending.")
+        parser.add_argument("--interval", type=float, default=2.0, help="Seconds to wait between polls with --loop.")
+
+    def handle(self, *args, **options):
+        total_processed = total_failed = 0
+        while True:
+            processed, failed = process_pending(batch_size=options["batch_size"])
+            total_processed += processed
+            total_failed += failed
+            if processed:
+                continue  # more may be waiting; failures are retried on a later poll
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
+        self.stdout.write(self.style.SUCCESS(f"Processed {total_processed} webhook events, {total_failed} failed."))
@@ -0,0 +1,30 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from api.reconcile import reconcile
+
+
+class Command(BaseCommand):
+    help = "Resolves CREATED/PENDING payments by asking Razorpay for their status."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--older-than", type=int, default=15, help="Only payments older than this many minutes.")
+        parser.add_argument("--abandon-after", type=int, default=24,
+                            help="Hours after which an order with no payment attempt is marked FAILED.")
+        parser.add_argument("--page-size", type=int, default=100)
+        parser.add_argument("--rate", type=float, default=5.0, help="Max Razorpay requests per second.")
+        parser.add_argument("--dry-run", action="store_true", help="Only report what would change.")
+
+    def handle(self, *args, **options):
+        counts = reconcile(
+            older_than=timedelta(minutes=options["older_than"]),
+            abandon_after=timedelta(hours=options["abandon_after"]),
+            page_size=options["page_size"],
+            rate=options["rate"],
+            dry_run=options["dry_run"],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            "Checked {checked} payments: {captured} captured, {failed} failed, "
+            "{unchanged} unchanged, {errors} lookup errors.".format(**counts)
+        ))
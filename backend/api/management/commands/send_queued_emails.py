@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.emails import deliver_pending
+
+
+class Command(BaseCommand):
+    help = "Delivers queued outbound emails (password resets, etc.) over a reused connection."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100, help="Messages per connection.")
+        parser.add_argument("--loop", action="store_true", help="Keep polling instead of exiting when the queue is empty.")
+        parser.add_argument("--interval", type=float, default=5.0, help="Seconds to wait between polls with --loop.")
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = deliver_pending(batch_size=options["batch_size"])
+            total_sent += sent
+            total_failed += failed
+            if sent or failed:
+                continue  # drain the queue before waiting
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
+        self.stdout.write(self.style.SUCCESS(f"Sent {total_sent} emails, {total_failed} failed or deferred."))
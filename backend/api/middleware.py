@@ -3,12 +3,14 @@ from django.utils.deprecation import MiddlewareMixin
 from django.http import JsonResponse
 from django.urls import resolve
 
+from . import entitlements
+
 EXEMPT_PATHS = [
     "/api/auth/login/",
     "/api/auth/register/",
     "/api/auth/refresh/",
     "/api/auth/logout/",
-    "/api/razorpay-webhook/",  # allow webhook
+    "/api/payments/webhook/",  # allow webhook
 ]
 
 class SubscriptionMiddleware(MiddlewareMixin):
@@ -20,9 +22,9 @@ class SubscriptionMiddleware(MiddlewareMixin):
         if not request.user.is_authenticated:
             return None  # normal auth middleware handles this
 
-        # Get subscription
-        subscription = getattr(request.user, "usersubscription", None)
-        if not subscription or not subscription.is_valid():
+        # Cached subscription snapshot; no queries in the steady state
+        entitlement = entitlements.for_user(request.user.pk)
+        if not entitlements.is_valid(entitlement):
             return JsonResponse(
                 {"detail": "Your subscription has expired or payment required."},
                 status=403
@@ -0,0 +1,27 @@
+# Generated by Django 5.0.6 on 2026-10-17 02:09
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_alter_subscriptionplan_duration_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='usersubscription',
+            index=models.Index(fields=['end_date'], name='usersub_end_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usersubscription',
+            index=models.Index(fields=['trial_end_date'], name='usersub_trial_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usersubscription',
+            index=models.Index(fields=['grace_period_end'], name='usersub_grace_end_idx'),
+        ),
+    ]
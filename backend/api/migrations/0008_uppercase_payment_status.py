@@ -0,0 +1,22 @@
+# Generated by Django 5.0.6 on 2026-10-17 09:12
+
+from django.db import migrations
+from django.db.models.functions import Upper
+
+
+def uppercase_statuses(apps, schema_editor):
+    # create_order used to store "created"; reconciliation and the webhooks
+    # match the upper-case STATUS_CHOICES values.
+    Payment = apps.get_model('api', 'Payment')
+    Payment.objects.filter(status__in=['created', 'pending', 'success', 'failed']).update(status=Upper('status'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_webhookevent'),
+    ]
+
+    operations = [
+        migrations.RunPython(uppercase_statuses, migrations.RunPython.noop),
+    ]
@@ -66,21 +66,36 @@ class UserSubscription(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        # Range scans for the expire_subscriptions sweeper.
+        indexes = [
+            models.Index(fields=["end_date"], name="usersub_end_date_idx"),
+            models.Index(fields=["trial_end_date"], name="usersub_trial_end_idx"),
+            models.Index(fields=["grace_period_end"], name="usersub_grace_end_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # activate_plan, start_trial, enter_grace_period and admin edits all
+        # land here; drop the middleware's cached entitlements.
+        from .entitlements import invalidate
+        invalidate(self.user_id)
+
     def start_trial(self):
         """Start 7-day free trial"""
         if not self.trial_used:
-            try:
-                # --- UPDATED: Find the 'FREE' plan ---
-                free_plan = SubscriptionPlan.objects.get(plan_type='FREE')
-                self.plan = free_plan
-                self.trial_used = True
-                self.trial_start_date = timezone.now()
-                self.trial_end_date = timezone.now() + timedelta(days=free_plan.duration_days) # Use duration from plan
-                self.active = True # Trial is active
-                self.save()
-                return True
-            except SubscriptionPlan.DoesNotExist:
+            # --- UPDATED: Find the 'FREE' plan (from the in-process catalog) ---
+            from .plans import get_free_plan
+            free_plan = get_free_plan()
+            if free_plan is None:
                 return False # Cannot start trial if FREE plan is not seeded
+            self.plan = free_plan
+            self.trial_used = True
+            self.trial_start_date = timezone.now()
+            self.trial_end_date = timezone.now() + timedelta(days=free_plan.duration_days) # Use duration from plan
+            self.active = True # Trial is active
+            self.save()
+            return True
         return False
 
     def activate_plan(self, plan):
@@ -235,4 +250,76 @@ class Expense(models.Model):
         ordering = ['-date']
 
     def __str__(self):
-        return f"{self.category} - ₹{self.amount} - {self.date}"
\ No newline at end of file
+        return f"{self.category} - ₹{self.amount} - {self.date}"
+
+# ========== OUTBOUND EMAIL QUEUE ==========
+class OutboundEmail(models.Model):
+    """
+    An email waiting to be (or already) delivered by the
+    `send_queued_emails` worker; views only enqueue. See api/emails.py.
+    """
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('SENDING', 'Sending'),
+        ('SENT', 'Sent'),
+        ('FAILED', 'Failed'),
+    ]
+
+    to = models.EmailField(max_length=254)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254, blank=True)
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    # Set while a worker holds the message; stale claims are picked up again.
+    claim_token = models.CharField(max_length=32, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['next_attempt_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbound_email_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.to} | {self.subject} | {self.status}"
+
+
+# ========== WEBHOOK EVENTS ==========
+class WebhookEvent(models.Model):
+    """
+    A verified Razorpay webhook delivery, stored as received. The webhook
+    view only inserts it (duplicates by event_id are dropped); the
+    `process_webhook_events` worker applies it. See api/webhooks.py.
+    """
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('PROCESSED', 'Processed'),
+        ('FAILED', 'Failed'),
+    ]
+
+    # X-Razorpay-Event-Id (or a hash of the body when the header is missing).
+    event_id = models.CharField(max_length=64, unique=True)
+    event = models.CharField(max_length=64)
+    payload = models.JSONField()
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'id'], name='webhook_event_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.event_id} | {self.event} | {self.status}"
@@ -0,0 +1,18 @@
+# backend/api/pagination.py
+from rest_framework.pagination import CursorPagination
+
+
+class InvoiceCursorPagination(CursorPagination):
+    """
+    Cursor pagination, newest first. DRF keys the cursor on invoice_date
+    alone: each page is an index range scan on (shop, invoice_date, id)
+    starting at the last invoice_date seen, plus a small offset that skips
+    the rows already shown at that same timestamp. invoice_date is a
+    creation datetime, so ties (and the offset) stay tiny however deep the
+    client pages, unlike OFFSET which rescans every skipped row. -id keeps
+    the order of tied rows stable, so the offset skips the right ones.
+    """
+    ordering = ('-invoice_date', '-id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
@@ -1,16 +1,15 @@
 # backend/api/payment_views.py
 
-import razorpay
 import hmac
 import hashlib
 from django.conf import settings
-from django.views.decorators.csrf import csrf_exempt
 from rest_framework import status, viewsets
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from django.db import transaction
 
+from . import gateway, plans
 from .models import SubscriptionPlan, UserSubscription, Payment
 from .serializers import (
     SubscriptionPlanSerializer,
@@ -20,13 +19,6 @@ from .serializers import (
     VerifyPaymentSerializer
 )
 
-# ========== INITIALIZE RAZORPAY CLIENT ==========
-razorpay_client = razorpay.Client(auth=(
-    settings.RAZORPAY_KEY_ID,
-    settings.RAZORPAY_KEY_SECRET
-))
-
-
 # ========== SUBSCRIPTION PLANS VIEWSET ==========
 class SubscriptionPlanViewSet(viewsets.ReadOnlyModelViewSet):
     """List all active subscription plans"""
@@ -48,9 +40,8 @@ def create_order(request):
     
     plan_id = serializer.validated_data['plan_id']
     
-    try:
-        plan = SubscriptionPlan.objects.get(id=plan_id, is_active=True)
-    except SubscriptionPlan.DoesNotExist:
+    plan = plans.get_plan(plan_id, active_only=True)
+    if plan is None:
         return Response(
             {"error": "Plan not found"},
             status=status.HTTP_404_NOT_FOUND
@@ -60,8 +51,9 @@ def create_order(request):
     amount_paise = int(float(plan.price) * 100)
     
     try:
-        # Create Razorpay order
-        razorpay_order = razorpay_client.order.create({
+        # Create Razorpay order (pooled client, timeouts and circuit breaker in api/gateway.py)
+        client = gateway.get_client()
+        razorpay_order = gateway.call("order.create", client.order.create, {
             "amount": amount_paise,
             "currency": "INR",
             "payment_capture": 1,
@@ -93,6 +85,8 @@ def create_order(request):
             "user_email": request.user.email,
         }, status=status.HTTP_201_CREATED)
         
+    except gateway.GatewayUnavailable as e:
+        return Response({"error": str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
     except Exception as e:
         return Response(
             {"error": f"Failed to create order: {str(e)}"},
@@ -223,71 +217,3 @@ def payment_history(request):
     payments = Payment.objects.filter(user=request.user)
     serializer = PaymentSerializer(payments, many=True)
     return Response(serializer.data)
-
-
-# ========== RAZORPAY WEBHOOK ==========
-@csrf_exempt
-@api_view(['POST'])
-@permission_classes([AllowAny])
-def razorpay_webhook(request):
-    """
-    Handles Razorpay webhook events
-    Configure this URL in Razorpay Dashboard: https://yourdomain.com/api/payments/webhook/
-    """
-    # Get webhook secret from settings (set in Razorpay dashboard)
-    webhook_secret = settings.RAZORPAY_KEY_SECRET
-    webhook_signature = request.headers.get('X-Razorpay-Signature', '')
-    
-    # Verify webhook signature
-    try:
-        razorpay_client.utility.verify_webhook_signature(
-            request.body.decode('utf-8'),
-            webhook_signature,
-            webhook_secret
-        )
-    except:
-        return Response(
-            {"error": "Invalid signature"},
-            status=status.HTTP_400_BAD_REQUEST
-        )
-    
-    # Process event
-    webhook_body = request.data
-    event = webhook_body.get('event')
-    
-    if event == 'payment.captured':
-        # Payment successful
-        payment_entity = webhook_body['payload']['payment']['entity']
-        order_id = payment_entity['order_id']
-        payment_id = payment_entity['id']
-        
-        try:
-            payment = Payment.objects.get(order_id=order_id)
-            
-            with transaction.atomic():
-                payment.payment_id = payment_id
-                payment.status = 'SUCCESS'
-                payment.save()
-                
-                # Activate subscription
-                subscription, _ = UserSubscription.objects.get_or_create(
-                    user=payment.user
-                )
-                subscription.activate_plan(payment.plan)
-            
-        except Payment.DoesNotExist:
-            pass
-    
-    elif event == 'payment.failed':
-        # Payment failed
-        payment_entity = webhook_body['payload']['payment']['entity']
-        order_id = payment_entity['order_id']
-        
-        try:
-            payment = Payment.objects.get(order_id=order_id)
-            payment.status = 'FAILED'
-            payment.save()
-        except Payment.DoesNotExist:
-            pass
-    
-    return Response({"status": "ok"})
\ No newline at end of file
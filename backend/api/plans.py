@@ -0,0 +1,109 @@
+# backend/api/plans.py
+"""
+Process-local SubscriptionPlan catalog.
+
+Plans change a few times a year, so each worker loads them all once and
+serves lookups from memory. A version stamp in the shared cache tells
+workers when to reload: saving or deleting a plan (post_save/post_delete,
+connected in ApiConfig.ready) writes a new stamp, and every worker compares
+it with the version it loaded on its next lookup. With the default
+local-memory cache only the writing process sees the new stamp, so every
+worker also reloads after PLAN_CATALOG_RECHECK seconds whatever the stamp
+says; if the plans changed meanwhile it takes a new version (and so a new
+ETag). Set CACHE_URL when running several workers to see changes at once.
+
+Plan objects handed out are shared between requests; treat them as
+read-only.
+"""
+import threading
+import time
+import uuid
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import SubscriptionPlan
+
+VERSION_KEY = "subscription-plans:version"
+
+Catalog = namedtuple("Catalog", ["version", "plans", "fingerprint", "loaded_at"])
+
+_catalog = Catalog(None, {}, None, float("-inf"))
+_serialized = {}  # version -> serialized plan list
+_lock = threading.Lock()
+
+
+def current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_version(**kwargs):
+    """Signal receiver: makes every worker reload the catalog."""
+    cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def _load():
+    plans = {plan.pk: plan for plan in SubscriptionPlan.objects.order_by("id")}
+    fields = SubscriptionPlan._meta.concrete_fields
+    fingerprint = repr([[getattr(plan, field.attname) for field in fields] for plan in plans.values()])
+    return plans, fingerprint
+
+
+def _expired(catalog):
+    return time.monotonic() - catalog.loaded_at > getattr(settings, "PLAN_CATALOG_RECHECK", 60)
+
+
+def get_catalog():
+    global _catalog
+    version = current_version()
+    catalog = _catalog
+    if catalog.version != version or _expired(catalog):
+        with _lock:
+            if _catalog.version != version or _expired(_catalog):
+                plans, fingerprint = _load()
+                if _catalog.version == version and fingerprint != _catalog.fingerprint:
+                    # Changed without this worker seeing a new stamp.
+                    version = uuid.uuid4().hex
+                    cache.set(VERSION_KEY, version, None)
+                if version != _catalog.version:
+                    _serialized.clear()
+                _catalog = Catalog(version, plans, fingerprint, time.monotonic())
+            catalog = _catalog
+    return catalog
+
+
+def etag(catalog=None):
+    return f'"plans-{(catalog or get_catalog()).version}"'
+
+
+def all_plans():
+    return list(get_catalog().plans.values())
+
+
+def get_plan(plan_id, active_only=False):
+    """The plan with this id, or None."""
+    try:
+        plan = get_catalog().plans.get(int(plan_id))
+    except (TypeError, ValueError):
+        return None
+    if plan is None or (active_only and not plan.is_active):
+        return None
+    return plan
+
+
+def get_free_plan():
+    """The FREE (trial) plan, or None if it has not been seeded."""
+    return next((plan for plan in get_catalog().plans.values() if plan.plan_type == "FREE"), None)
+
+
+def serialized(catalog, serialize):
+    """`serialize(plans)` for this catalog version, computed once per version."""
+    data = _serialized.get(catalog.version)
+    if data is None:
+        data = _serialized[catalog.version] = serialize(list(catalog.plans.values()))
+    return data
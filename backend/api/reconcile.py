@@ -0,0 +1,123 @@
+# backend/api/reconcile.py
+"""
+Payment reconciliation against Razorpay.
+
+Payments left in CREATED/PENDING (the user closed the tab before
+verify_payment ran and no webhook arrived) are paged through by id. Each
+page's orders are looked up with GET /orders/{id}/payments over the pooled
+gateway session (api/gateway.py), throttled to `rate` requests per second,
+and the page's outcomes are applied in one transaction:
+
+* a captured payment -> SUCCESS and the plan is activated (webhooks.mark_captured)
+* only failed attempts, or no attempt at all after `abandon_after` -> FAILED
+* anything else (authorized, in progress) is left for the next run
+
+If the gateway circuit breaker opens, the run stops after the current page.
+
+RAZORPAY_API_BASE points the job at a stub server in tests.
+"""
+import threading
+import time
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import gateway
+from .models import Payment
+from .webhooks import mark_captured, mark_failed
+
+OPEN_STATUSES = ("CREATED", "PENDING")
+
+
+class RateLimiter:
+    """Spaces calls at least 1/rate seconds apart."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+def fetch_order_payments(session, order_id):
+    base = getattr(settings, "RAZORPAY_API_BASE", "https://api.razorpay.com/v1").rstrip("/")
+    resp = session.get(f"{base}/orders/{order_id}/payments")
+    resp.raise_for_status()
+    return resp.json().get("items", [])
+
+
+def _outcome(attempts, payment, abandon_before):
+    captured = next((a for a in attempts if a.get("status") == "captured"), None)
+    if captured:
+        return "captured", captured.get("id")
+    if attempts and all(a.get("status") == "failed" for a in attempts):
+        return "failed", None
+    if not attempts and payment.created_at < abandon_before:
+        return "failed", None
+    return None, None
+
+
+def reconcile(older_than=timedelta(minutes=15), abandon_after=timedelta(hours=24),
+              page_size=100, rate=5.0, dry_run=False, session=None):
+    """
+    Returns {"checked", "captured", "failed", "unchanged", "errors"} counts.
+    """
+    now = timezone.now()
+    abandon_before = now - abandon_after
+    limiter = RateLimiter(rate)
+    session = session or gateway.get_session()
+    counts = dict.fromkeys(("checked", "captured", "failed", "unchanged", "errors"), 0)
+
+    last_id = 0
+    while True:
+        page = list(
+            Payment.objects
+            .filter(status__in=OPEN_STATUSES, created_at__lt=now - older_than, id__gt=last_id)
+            .select_related("plan")
+            .order_by("id")[:page_size]
+        )
+        if not page:
+            break
+        last_id = page[-1].id
+
+        outcomes = []
+        unavailable = False
+        for payment in page:
+            limiter.wait()
+            try:
+                attempts = gateway.call("order.payments", fetch_order_payments, session, payment.order_id)
+            except gateway.GatewayUnavailable:
+                unavailable = True  # breaker open: stop, the rest waits for the next run
+                break
+            except (requests.RequestException, ValueError):
+                counts["errors"] += 1
+                continue
+            counts["checked"] += 1
+            outcomes.append((payment, *_outcome(attempts, payment, abandon_before)))
+
+        with transaction.atomic():
+            for payment, outcome, payment_id in outcomes:
+                if outcome == "captured":
+                    counts["captured"] += 1
+                    if not dry_run:
+                        mark_captured(payment, payment_id)
+                elif outcome == "failed":
+                    counts["failed"] += 1
+                    if not dry_run:
+                        mark_failed(payment)
+                else:
+                    counts["unchanged"] += 1
+        if unavailable:
+            counts["errors"] += 1
+            break
+    return counts
@@ -3,13 +3,19 @@ import re
 # --- FIX: Import get_user_model ---
 from django.contrib.auth import get_user_model 
 from django.db import transaction , models
+from django.utils import timezone
 from rest_framework import serializers
 from .models import SubscriptionPlan, UserSubscription, Payment, Expense
 from shops.models import TaxProfile
-from django.db.models import F
+from django.db.models import F, Case, When, Value
+from catalog import sku_cache, stock
 from catalog.models import Product
 from customers.models import Customer
 from sales.models import Invoice, InvoiceItem
+from sales import quotas
+from sales.sequences import format_invoice_number, next_invoice_number
+from reports import rollups
+from . import entitlements, plans
 from shops.models import Shop
 
 # --- FIX: Get the correct User model ---
@@ -111,6 +117,38 @@ class ProductSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Quantity must be non-negative.")
         return value
 
+    def create(self, validated_data):
+        with transaction.atomic():
+            product = super().create(validated_data)
+            stock.record_change(product, 0, note="Opening balance")
+        return product
+
+    def update(self, instance, validated_data):
+        old_quantity = instance.quantity
+        with transaction.atomic():
+            product = super().update(instance, validated_data)
+            stock.record_change(product, old_quantity)
+        return product
+
+    def validate_sku(self, value):
+        # Scanned codes are looked up exactly, so store them trimmed. Checked
+        # here so a clash is a 400, not an IntegrityError from the
+        # (shop, sku) constraint.
+        value = value.strip()
+        if not value:
+            return value
+        if self.instance is not None:
+            shop_id = self.instance.shop_id
+        else:
+            request = self.context.get('request')
+            shop_id = getattr(getattr(request, 'user', None), 'shop_id', None)
+        clashes = Product.objects.filter(shop_id=shop_id, sku=value)
+        if self.instance is not None:
+            clashes = clashes.exclude(pk=self.instance.pk)
+        if shop_id is not None and clashes.exists():
+            raise serializers.ValidationError("Another product in this shop already uses this SKU.")
+        return value
+
 class CustomerSerializer(serializers.ModelSerializer):
     class Meta:
         model = Customer
@@ -118,14 +156,92 @@ class CustomerSerializer(serializers.ModelSerializer):
         read_only_fields = ("id",)
 
 
+class InvoiceProductField(serializers.PrimaryKeyRelatedField):
+    """
+    Resolves `product` from the batch loaded by InvoiceSerializer.to_internal_value,
+    so validating a 60-line cart costs one query instead of 60.
+    """
+    def to_internal_value(self, data):
+        products = self.context.get("invoice_products")
+        if products is not None:
+            try:
+                return products[int(data)]
+            except (KeyError, TypeError, ValueError):
+                pass
+        return super().to_internal_value(data)
+
+
 class InvoiceItemSerializer(serializers.ModelSerializer):
     # ... (Keep this serializer as it was) ...
+    product = InvoiceProductField(queryset=Product.objects.all())
     product_name = serializers.CharField(source='product.name', read_only=True)
     class Meta:
         model = InvoiceItem
         fields = ("id", "product", "product_name", "qty", "unit_price", "tax_rate")
         read_only_fields = ("id", "product_name")
 
+
+def decrement_stock(qty_by_product):
+    """
+    Applies all stock decrements of an invoice in a single UPDATE.
+    `qty_by_product` maps product id -> total qty sold (lines already grouped).
+    """
+    if not qty_by_product or stock.deferred_quantity():
+        # Deferred: the SALE movements are the write; compaction updates
+        # Product.quantity (catalog/stock.py).
+        return 0
+    delta = Case(
+        *[When(pk=pk, then=Value(qty)) for pk, qty in qty_by_product.items()],
+        output_field=models.DecimalField(max_digits=12, decimal_places=2),
+    )
+    # updated_at is set by hand (update() skips auto_now) so stock changes
+    # reach clients through the delta sync feed (catalog/sync.py).
+    updated = Product.objects.filter(pk__in=qty_by_product.keys()).update(
+        quantity=F('quantity') - delta, updated_at=timezone.now()
+    )
+    # The UPDATE sends no signal; drop this worker's cached scans of these
+    # products so the till sees the new stock on its next scan.
+    sku_cache.evict_products(qty_by_product.keys())
+    return updated
+
+
+def build_invoice_lines(items_data):
+    """
+    Turns validated cart lines into unsaved InvoiceItem objects.
+    Returns (lines, qty_by_product, (subtotal, tax_total, total_amount)).
+    """
+    lines = []
+    qty_by_product = {}
+    total_amount = 0
+    subtotal = 0
+    tax_total = 0
+
+    for item_data in items_data:
+        prod = item_data['product']
+        qty = item_data['qty']
+        price = item_data['unit_price']
+        tax_rate = item_data.get('tax_rate', 0)
+
+        line_subtotal = price * qty
+        line_tax = (line_subtotal * tax_rate) / 100
+        line_total = line_subtotal + line_tax
+
+        subtotal += line_subtotal
+        tax_total += line_tax
+        total_amount += line_total
+
+        lines.append(InvoiceItem(
+            product=prod,
+            qty=qty,
+            unit_price=price,
+            tax_rate=tax_rate,
+            line_total=line_total
+        ))
+        qty_by_product[prod.pk] = qty_by_product.get(prod.pk, 0) + qty
+
+    return lines, qty_by_product, (subtotal, tax_total, total_amount)
+
+
 class InvoiceSerializer(serializers.ModelSerializer):
     items = InvoiceItemSerializer(many=True)
     customer_name = serializers.CharField(allow_blank=True, required=False, write_only=True)
@@ -144,91 +260,168 @@ class InvoiceSerializer(serializers.ModelSerializer):
             "tax_total", "grand_total", "customer_detail", "invoice_date", "number"
         )
 
+    def to_internal_value(self, data):
+        # Load every product referenced by the cart in one query; the nested
+        # InvoiceProductField picks them out of the context instead of doing
+        # a lookup per line.
+        items = data.get("items") if hasattr(data, "get") else None
+        if isinstance(items, list):
+            ids = set()
+            for item in items:
+                try:
+                    ids.add(int(item.get("product")))
+                except (AttributeError, TypeError, ValueError):
+                    continue
+            # A batch import shares one context across many invoices, so only
+            # fetch what an earlier invoice has not already loaded.
+            products = self.context.setdefault("invoice_products", {})
+            missing = ids - products.keys()
+            if missing:
+                products.update(Product.objects.in_bulk(missing))
+        return super().to_internal_value(data)
 
-    @transaction.atomic
     def create(self, validated_data):
         items_data = validated_data.pop("items", [])
         request = self.context.get('request')
-        if not request or not hasattr(request.user, 'shop'):
+        if not request or not getattr(request.user, 'shop', None):
              raise serializers.ValidationError("Could not determine the shop for this request.")
-        
-        # --- START FIX: ATOMIC & GLOBALLY UNIQUE INVOICE NUMBER ---
-        
-        # 1. Lock the shop row for this transaction to prevent race conditions
-        shop = Shop.objects.select_for_update().get(id=request.user.shop.id)
+        shop = request.user.shop
 
-        # 2. Atomically increment the counter on the database
-        shop.counter_invoice = F('counter_invoice') + 1
-        shop.save()
-        
-        # 3. Get the new, unique value back from the database
-        shop.refresh_from_db() 
-        
-        # 4. Create a GLOBALLY unique number (e.g., "1-1", "2-1", "1-2")
-        formatted_number = f"{shop.id}-{shop.counter_invoice}"
-        
-        # --- END FIX ---
+        # Over-quota bills are turned away before any numbering or writes.
+        quotas.check(shop.id, entitlements.limit(entitlements.for_shop(request.user), quotas.FEATURE))
+
+        # Work out every line and the totals up front, so the write
+        # transaction is a fixed number of statements regardless of how
+        # many lines the bill has.
+        lines, qty_by_product, (subtotal, tax_total, total_amount) = build_invoice_lines(items_data)
+
+        # Globally unique number (e.g. "1-1", "2-1", "1-2") from the shop's
+        # invoice sequence. Allocated before the transaction opens so no
+        # shop-wide lock is held while the bill is written; see
+        # sales/sequences.py for the gap policy.
+        formatted_number = next_invoice_number(shop.id)
 
         customer_name = validated_data.pop("customer_name", "Walk-in")
         customer_mobile = validated_data.pop("customer_mobile", None)
 
-        customer = None
-        if customer_mobile:
-            customer, created = Customer.objects.get_or_create(
+        with transaction.atomic():
+            customer = None
+            if customer_mobile:
+                customer, created = Customer.objects.get_or_create(
+                    shop=shop,
+                    mobile=customer_mobile,
+                    defaults={'name': customer_name}
+                )
+
+            invoice = Invoice.objects.create(
                 shop=shop,
-                mobile=customer_mobile,
-                defaults={'name': customer_name}
+                customer=customer,
+                customer_name=customer_name,
+                customer_mobile=customer_mobile,
+                status="PAID",
+                number=formatted_number,
+                subtotal=subtotal,
+                tax_total=tax_total,
+                grand_total=total_amount,
+                total_amount=total_amount,
             )
 
-        invoice = Invoice.objects.create(
-            shop=shop,
-            customer=customer,
-            customer_name=customer_name,
-            customer_mobile=customer_mobile,
-            status="PAID",
-            number=formatted_number # <-- This is now globally unique
-        )
+            # One INSERT for all lines, one for their stock movements and one
+            # UPDATE for Product.quantity.
+            for line in lines:
+                line.invoice = invoice
+            InvoiceItem.objects.bulk_create(lines)
+            stock.record_sales(lines)
 
-        total_amount = 0
-        subtotal = 0
-        tax_total = 0
-
-        for item_data in items_data:
-            prod = item_data['product']
-            qty = item_data['qty']
-            price = item_data['unit_price']
-            tax_rate = item_data.get('tax_rate', 0)
-
-            line_subtotal = price * qty
-            line_tax = (line_subtotal * tax_rate) / 100
-            line_total = line_subtotal + line_tax
-
-            subtotal += line_subtotal
-            tax_total += line_tax
-            total_amount += line_total
-
-            InvoiceItem.objects.create(
-                invoice=invoice,
-                product=prod,
-                qty=qty,
-                unit_price=price,
-                tax_rate=tax_rate,
-                line_total=line_total
-            )
+            # The F() expression inside decrement_stock prevents race conditions on stock updates too
+            decrement_stock(qty_by_product)
+            rollups.add_invoices([invoice], lines)
+            quotas.add_bills([invoice])
 
-            # This F() expression prevents race conditions on stock updates too
-            prod.quantity = F('quantity') - qty
-            prod.save(update_fields=['quantity']) # More efficient save
+        # The lines already carry their product objects; hand them to the
+        # response serializer so it does not re-read them one by one.
+        invoice._prefetched_objects_cache = {"items": lines}
 
-        invoice.subtotal = subtotal
-        invoice.tax_total = tax_total
-        invoice.grand_total = total_amount
-        invoice.total_amount = total_amount
-        invoice.save()
+        return invoice
 
+    def update(self, instance, validated_data):
+        old_status = instance.status
+        with transaction.atomic():
+            invoice = super().update(instance, validated_data)
+            rollups.status_changed(invoice, old_status)
         return invoice
    
 
+def create_invoices_in_bulk(shop, validated_list, numbers):
+    """
+    Writes many validated invoices for one shop (offline till sync) with a
+    fixed number of statements: one customer lookup, one customer insert,
+    one invoice insert, one line insert and one stock UPDATE for the whole
+    batch. `numbers` are sequence values from allocate_invoice_numbers,
+    one per invoice. Returns the saved invoices in input order.
+    """
+    if not validated_list:
+        return []
+
+    built = []
+    qty_by_product = {}
+    for validated_data in validated_list:
+        lines, qtys, totals = build_invoice_lines(validated_data.get("items", []))
+        built.append((validated_data, lines, totals))
+        for pk, qty in qtys.items():
+            qty_by_product[pk] = qty_by_product.get(pk, 0) + qty
+
+    with transaction.atomic():
+        # Resolve every customer mobile in the batch at once.
+        names_by_mobile = {}
+        for validated_data in validated_list:
+            mobile = validated_data.get("customer_mobile")
+            if mobile:
+                names_by_mobile.setdefault(mobile, validated_data.get("customer_name", "Walk-in"))
+
+        customers = {}
+        if names_by_mobile:
+            for customer in Customer.objects.filter(shop=shop, mobile__in=names_by_mobile).order_by("id"):
+                customers.setdefault(customer.mobile, customer)
+            new_customers = [
+                Customer(shop=shop, mobile=mobile, name=name)
+                for mobile, name in names_by_mobile.items() if mobile not in customers
+            ]
+            for customer in Customer.objects.bulk_create(new_customers):
+                customers[customer.mobile] = customer
+
+        invoices = []
+        for (validated_data, lines, (subtotal, tax_total, total_amount)), value in zip(built, numbers):
+            customer_mobile = validated_data.get("customer_mobile") or None
+            invoices.append(Invoice(
+                shop=shop,
+                customer=customers.get(customer_mobile),
+                customer_name=validated_data.get("customer_name", "Walk-in"),
+                customer_mobile=customer_mobile,
+                status="PAID",
+                number=format_invoice_number(shop.id, value),
+                subtotal=subtotal,
+                tax_total=tax_total,
+                grand_total=total_amount,
+                total_amount=total_amount,
+            ))
+        Invoice.objects.bulk_create(invoices)
+
+        all_lines = []
+        for invoice, (_, lines, _) in zip(invoices, built):
+            for line in lines:
+                line.invoice = invoice
+            all_lines.extend(lines)
+        InvoiceItem.objects.bulk_create(all_lines)
+        stock.record_sales(all_lines)
+
+        decrement_stock(qty_by_product)
+        rollups.add_invoices(invoices, all_lines)
+        quotas.add_bills(invoices)
+
+    return invoices
+
+
 class TaxProfileSerializer(serializers.ModelSerializer):
     class Meta:
         model = TaxProfile
@@ -304,11 +497,9 @@ class CreateOrderSerializer(serializers.Serializer):
     plan_id = serializers.IntegerField()
     
     def validate_plan_id(self, value):
-        try:
-            plan = SubscriptionPlan.objects.get(id=value, is_active=True)
-            return value
-        except SubscriptionPlan.DoesNotExist:
+        if plans.get_plan(value, active_only=True) is None:
             raise serializers.ValidationError("Invalid or inactive plan.")
+        return value
 
 
 # ========== VERIFY PAYMENT SERIALIZER ==========
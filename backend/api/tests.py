@@ -0,0 +1,421 @@
+import hashlib
+import hmac
+import json
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import requests
+from django.core import mail
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.models import User
+from catalog.models import Product
+from shops.models import Shop
+from . import emails, entitlements, expiry, gateway, plans, reconcile, webhooks
+from .middleware import SubscriptionMiddleware
+from .models import OutboundEmail, Payment, SubscriptionPlan, UserSubscription, WebhookEvent
+
+
+class EntitlementCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.plan = SubscriptionPlan.objects.create(
+            plan_type="PRO", duration_days=30, features={"reports": True}
+        )
+        self.shop = Shop.objects.create(name="Test Kirana")
+        self.user = User.objects.create_user(
+            email="owner@example.com", username="owner", password="pass12345",
+            role=User.Role.SHOP_OWNER, shop=self.shop,
+        )
+        self.subscription, _ = UserSubscription.objects.get_or_create(user=self.user)
+        self.subscription.activate_plan(self.plan)
+        self.middleware = SubscriptionMiddleware(lambda request: None)
+
+    def _process(self):
+        request = RequestFactory().get("/api/products/")
+        request.user = self.user
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.middleware.process_view(request, None, (), {})
+        return response, len(ctx.captured_queries)
+
+    def test_steady_state_requests_do_not_query(self):
+        _, first = self._process()
+        response, second = self._process()
+        self.assertEqual(first, 1)
+        self.assertIsNone(response)
+        self.assertEqual(second, 0)
+
+    def test_plan_changes_invalidate_the_cache(self):
+        self._process()
+        self.subscription.enter_grace_period()
+        self.assertTrue(entitlements.is_valid(entitlements.for_user(self.user.pk)))
+
+        UserSubscription.objects.filter(pk=self.subscription.pk).update(
+            grace_period_end=timezone.now() - timedelta(minutes=1)
+        )
+        self.subscription.refresh_from_db()
+        self.subscription.save()
+        response, _ = self._process()
+        self.assertEqual(response.status_code, 403)
+
+        self.subscription.activate_plan(self.plan)
+        response, _ = self._process()
+        self.assertIsNone(response)
+        self.assertTrue(entitlements.has_feature(entitlements.for_user(self.user.pk), "reports"))
+
+    def test_snapshot_expires_with_the_subscription_window(self):
+        data = entitlements.for_user(self.user.pk)
+        self.assertTrue(entitlements.is_valid(data))
+        self.assertFalse(entitlements.is_valid(data, now=self.subscription.end_date + timedelta(seconds=1)))
+
+
+class EntitlementClaimsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        plan = SubscriptionPlan.objects.create(plan_type="PRO", duration_days=30, features={"reports": True})
+        self.shop = Shop.objects.create(name="Test Kirana")
+        self.user = User.objects.create_user(
+            email="owner@example.com", username="owner", password="pass12345",
+            role=User.Role.SHOP_OWNER, shop=self.shop,
+        )
+        subscription, _ = UserSubscription.objects.get_or_create(user=self.user)
+        subscription.activate_plan(plan)
+        Product.objects.create(shop=self.shop, name="Rice", price=50, quantity=10)
+
+    def _login(self):
+        client = APIClient()
+        resp = client.post("/api/token/", {"email": "owner@example.com", "password": "pass12345"}, format="json")
+        self.assertEqual(resp.status_code, 200, resp.content)
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {resp.data['access']}")
+        return client, AccessToken(resp.data["access"])
+
+    def _list_products(self, client):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = client.get("/api/products/")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.data), 1)
+        return len(ctx.captured_queries)
+
+    @override_settings(JWT_ENTITLEMENT_CLAIMS=True, JWT_CLAIMS_ACCESS_LIFETIME=timedelta(minutes=5))
+    def test_claims_token_authenticates_without_user_lookup(self):
+        client, token = self._login()
+        self.assertEqual(token["shop_id"], self.shop.id)
+        self.assertEqual(token["ent"]["plan"], "PRO")
+        self.assertEqual(token["ent"]["features"], {"reports": True})
+        self.assertLessEqual(token["exp"] - token["iat"], 300)
+        # Only the list's validator aggregate and the product query itself.
+        self.assertEqual(self._list_products(client), 2)
+
+        me = client.get("/api/me/")
+        self.assertEqual(me.data["user"]["email"], "owner@example.com")
+        self.assertEqual(me.data["shop"]["id"], self.shop.id)
+
+    def test_claims_are_opt_in(self):
+        client, token = self._login()
+        self.assertNotIn("ent", token)
+        self.assertEqual(self._list_products(client), 3)
+
+
+class ExpireSubscriptionsTests(TestCase):
+    def _subscription(self, name, **fields):
+        user = User.objects.create_user(email=f"{name}@example.com", username=name, password="pass12345")
+        subscription, _ = UserSubscription.objects.get_or_create(user=user)
+        UserSubscription.objects.filter(pk=subscription.pk).update(**fields)
+        return subscription
+
+    def test_sweep_moves_expired_into_grace_and_ends_grace(self):
+        now = timezone.now()
+        paid = self._subscription("paid", active=True, end_date=now + timedelta(days=5))
+        lapsed = self._subscription("lapsed", active=True, end_date=now - timedelta(hours=1))
+        trial = self._subscription("trial", active=True, trial_used=True, trial_end_date=now - timedelta(days=1))
+        old = self._subscription("old", active=True, end_date=now - timedelta(days=30))
+        admin = self._subscription("admin", active=True, allowed_by_admin=True, end_date=now - timedelta(days=9))
+        in_grace = self._subscription("grace", grace_period_end=now - timedelta(minutes=5))
+
+        self.assertFalse(entitlements.is_valid(entitlements.for_user(lapsed.user_id)))  # now cached
+        with self.captureOnCommitCallbacks(execute=True):
+            counts = expiry.sweep(now)
+        self.assertEqual(counts, {"grace": 2, "inactive": 2})
+
+        for sub in (paid, lapsed, trial, old, admin, in_grace):
+            sub.refresh_from_db()
+        self.assertTrue(paid.active and admin.active)
+        self.assertFalse(lapsed.active)
+        # Grace runs from the real expiry, not from the sweep.
+        self.assertEqual(lapsed.grace_period_end, lapsed.end_date + expiry.GRACE_PERIOD)
+        self.assertEqual(trial.grace_period_end, trial.trial_end_date + expiry.GRACE_PERIOD)
+        self.assertIsNone(in_grace.grace_period_end)
+        self.assertTrue(entitlements.is_valid(entitlements.for_user(lapsed.user_id)))
+
+        # A subscription that lapsed long ago gets no fresh grace period.
+        self.assertFalse(old.active)
+        self.assertIsNone(old.grace_period_end)
+        self.assertFalse(entitlements.is_valid(entitlements.for_user(old.user_id)))
+
+        # A second run finds nothing to do.
+        self.assertEqual(expiry.sweep(now), {"grace": 0, "inactive": 0})
+
+
+class PlanCatalogTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.free = SubscriptionPlan.objects.create(name="Free Trial", plan_type="FREE", duration_days=7)
+        self.user = User.objects.create_user(email="owner@example.com", username="owner", password="pass12345")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _list(self, **headers):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get("/api/subscription-plans/", **headers)
+        return resp, len(ctx.captured_queries)
+
+    def test_plans_are_served_from_the_catalog_with_an_etag(self):
+        first, _ = self._list()
+        second, queries = self._list()
+        self.assertEqual(queries, 0)
+        self.assertEqual(second.data, first.data)
+        self.assertIn("max-age=", second["Cache-Control"])
+
+        not_modified, queries = self._list(HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual((not_modified.status_code, queries), (304, 0))
+
+        SubscriptionPlan.objects.create(name="Pro Monthly", plan_type="PRO", price=299)
+        changed, _ = self._list(HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed["ETag"], first["ETag"])
+        self.assertEqual(len(changed.data), 2)
+
+    @override_settings(PLAN_CATALOG_RECHECK=0)
+    def test_changes_the_stamp_missed_are_picked_up_on_recheck(self):
+        pro = SubscriptionPlan.objects.create(name="Pro Monthly", plan_type="PRO", price=299)
+        before = plans.get_catalog()
+        # An UPDATE sends no signal, like a save seen only by another worker's cache.
+        SubscriptionPlan.objects.filter(pk=pro.pk).update(price=349)
+        self.assertEqual(plans.get_plan(pro.pk).price, 349)
+        self.assertNotEqual(plans.etag(), plans.etag(before))
+
+    def test_start_trial_uses_the_catalog(self):
+        plans.get_catalog()
+        subscription, _ = UserSubscription.objects.get_or_create(user=self.user)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertTrue(subscription.start_trial())
+        self.assertFalse(any("api_subscriptionplan" in q["sql"] for q in ctx.captured_queries))
+        self.assertEqual(subscription.plan, self.free)
+
+        self.free.delete()
+        self.assertIsNone(plans.get_free_plan())
+
+
+class OutboundEmailQueueTests(TestCase):
+    def setUp(self):
+        User.objects.create_user(email="owner@example.com", username="owner", password="pass12345")
+
+    def test_forgot_password_only_enqueues(self):
+        resp = APIClient().post("/api/auth/forgot-password/", {"email": "Owner@Example.com"}, format="json")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(mail.outbox), 0)
+        queued = OutboundEmail.objects.get()
+        self.assertEqual((queued.to, queued.status), ("owner@example.com", "PENDING"))
+
+        self.assertEqual(emails.deliver_pending(), (1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn("/reset-password/", mail.outbox[0].body)
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, "SENT")
+        self.assertEqual(emails.deliver_pending(), (0, 0))
+
+    def test_failures_back_off_and_give_up(self):
+        message = emails.enqueue("Hi", "Body", "a@example.com")
+        now = timezone.now()
+        with mock.patch("django.core.mail.EmailMessage.send", side_effect=OSError("relay down")):
+            self.assertEqual(emails.deliver_pending(now=now), (0, 1))
+            message.refresh_from_db()
+            self.assertEqual((message.status, message.attempts), ("PENDING", 1))
+            self.assertEqual(message.next_attempt_at, now + emails.BASE_BACKOFF)
+            # Not due yet.
+            self.assertEqual(emails.deliver_pending(now=now), (0, 0))
+
+            for day in range(1, emails.MAX_ATTEMPTS):
+                emails.deliver_pending(now=now + timedelta(days=day))
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts), ("FAILED", emails.MAX_ATTEMPTS))
+        self.assertIn("relay down", message.last_error)
+
+
+@override_settings(RAZORPAY_WEBHOOK_SECRET="whsec")
+class WebhookPipelineTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.plan = SubscriptionPlan.objects.create(plan_type="PRO", duration_days=30)
+        self.user = User.objects.create_user(email="owner@example.com", username="owner", password="pass12345")
+        self.payment = Payment.objects.create(user=self.user, plan=self.plan, order_id="order_1", amount=299)
+
+    def _deliver(self, event_id, event="payment.captured", signature=None):
+        body = json.dumps({
+            "event": event,
+            "payload": {"payment": {"entity": {"id": "pay_1", "order_id": "order_1"}}},
+        }).encode()
+        signature = signature or hmac.new(b"whsec", body, hashlib.sha256).hexdigest()
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.post(
+                "/api/payments/webhook/", body, content_type="application/json",
+                HTTP_X_RAZORPAY_SIGNATURE=signature, HTTP_X_RAZORPAY_EVENT_ID=event_id,
+            )
+        return resp, len(ctx.captured_queries)
+
+    def test_webhook_only_stores_the_event_and_drops_retries(self):
+        resp, queries = self._deliver("evt_1")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(queries, 1)
+        self._deliver("evt_1")  # Razorpay retry
+        self.assertEqual(WebhookEvent.objects.count(), 1)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, "CREATED")
+
+        self.assertEqual(self._deliver("evt_2", signature="forged")[0].status_code, 400)
+
+    def test_events_are_applied_exactly_once(self):
+        self._deliver("evt_1")
+        self.assertEqual(webhooks.process_pending(), (1, 0))
+        self.assertEqual(webhooks.process_pending(), (0, 0))
+
+        self.payment.refresh_from_db()
+        self.assertEqual((self.payment.status, self.payment.payment_id), ("SUCCESS", "pay_1"))
+        subscription = UserSubscription.objects.get(user=self.user)
+        self.assertEqual(subscription.plan, self.plan)
+        first_end = subscription.end_date
+
+        # A second capture event for the same payment does not extend the plan again.
+        self._deliver("evt_3")
+        webhooks.process_pending()
+        subscription.refresh_from_db()
+        self.assertEqual(subscription.end_date, first_end)
+        self.assertEqual(WebhookEvent.objects.filter(status="PROCESSED").count(), 2)
+
+
+class _StubRazorpay(BaseHTTPRequestHandler):
+    """GET /v1/orders/<id>/payments from the `orders` dict on the server."""
+
+    def do_GET(self):
+        order_id = self.path.split("/")[-2]
+        self.server.requests.append(self.path)
+        body = json.dumps({"items": self.server.orders.get(order_id, [])}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class ReconcilePaymentsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        gateway.reset()
+        self.addCleanup(gateway.reset)
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _StubRazorpay)
+        self.server.requests = []
+        self.server.orders = {
+            "order_paid": [{"id": "pay_f", "status": "failed"}, {"id": "pay_ok", "status": "captured"}],
+            "order_failed": [{"id": "pay_x", "status": "failed"}],
+            "order_authorized": [{"id": "pay_a", "status": "authorized"}],
+        }
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        self.plan = SubscriptionPlan.objects.create(plan_type="PRO", duration_days=30)
+        self.user = User.objects.create_user(email="owner@example.com", username="owner", password="pass12345")
+        hour_ago = timezone.now() - timedelta(hours=1)
+        for order_id in ("order_paid", "order_failed", "order_authorized", "order_untouched", "order_recent"):
+            Payment.objects.create(user=self.user, plan=self.plan, order_id=order_id, amount=299, status="CREATED")
+        Payment.objects.exclude(order_id="order_recent").update(created_at=hour_ago)
+        Payment.objects.filter(order_id="order_untouched").update(created_at=hour_ago - timedelta(days=2))
+
+    def test_reconcile_against_stub_gateway(self):
+        with override_settings(RAZORPAY_API_BASE=f"http://127.0.0.1:{self.server.server_port}/v1"):
+            counts = reconcile.reconcile(page_size=2, rate=0)
+
+        self.assertEqual(counts, {"checked": 4, "captured": 1, "failed": 2, "unchanged": 1, "errors": 0})
+        self.assertEqual(len(self.server.requests), 4)  # the recent payment is not looked up
+        statuses = dict(Payment.objects.values_list("order_id", "status"))
+        self.assertEqual(statuses, {
+            "order_paid": "SUCCESS", "order_failed": "FAILED", "order_authorized": "CREATED",
+            "order_untouched": "FAILED", "order_recent": "CREATED",
+        })
+        self.assertEqual(UserSubscription.objects.get(user=self.user).plan, self.plan)
+        self.assertEqual(Payment.objects.get(order_id="order_paid").payment_id, "pay_ok")
+
+    def test_reconciles_an_order_created_through_the_api(self):
+        self.server.orders["order_new"] = [{"id": "pay_new", "status": "captured"}]
+        client = APIClient()
+        client.force_authenticate(self.user)
+        fake = mock.Mock()
+        fake.order.create.return_value = {"id": "order_new"}
+        with mock.patch.object(gateway, "get_client", return_value=fake):
+            resp = client.post("/api/payments/create-order/", {"plan_id": self.plan.id}, format="json")
+        self.assertEqual(resp.status_code, 200, resp.content)
+        Payment.objects.exclude(order_id="order_recent").update(created_at=timezone.now() - timedelta(hours=1))
+        Payment.objects.exclude(order_id__in=("order_new", "order_recent")).update(status="SUCCESS")
+
+        with override_settings(RAZORPAY_API_BASE=f"http://127.0.0.1:{self.server.server_port}/v1"):
+            counts = reconcile.reconcile(rate=0)
+
+        self.assertEqual(counts["checked"], 1)
+        self.assertEqual(counts["captured"], 1)
+        self.assertEqual(Payment.objects.get(order_id="order_new").status, "SUCCESS")
+
+    def test_rate_limiter_spaces_calls(self):
+        limiter = reconcile.RateLimiter(50)
+        start = time.monotonic()
+        for _ in range(4):
+            limiter.wait()
+        self.assertGreaterEqual(time.monotonic() - start, 3 / 50)
+
+
+@override_settings(RAZORPAY_BREAKER_THRESHOLD=2, RAZORPAY_BREAKER_RESET=60)
+class GatewayTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        gateway.reset()
+        self.addCleanup(gateway.reset)
+
+    def test_circuit_breaker_opens_after_consecutive_failures(self):
+        def down():
+            raise requests.ConnectionError("connection refused")
+
+        for _ in range(2):
+            with self.assertRaises(requests.ConnectionError):
+                gateway.call("order.create", down)
+        called = mock.Mock()
+        with self.assertRaises(gateway.GatewayUnavailable):
+            gateway.call("order.create", called)
+        called.assert_not_called()
+        self.assertEqual(gateway.metrics()["order.create"]["errors"], 2)
+
+    def test_create_order_uses_the_shared_client(self):
+        plan = SubscriptionPlan.objects.create(plan_type="PRO", duration_days=30, price=299)
+        user = User.objects.create_user(email="owner@example.com", username="owner", password="pass12345")
+        client = APIClient()
+        client.force_authenticate(user)
+        fake = mock.Mock()
+        fake.order.create.return_value = {"id": "order_9"}
+
+        with mock.patch.object(gateway, "get_client", return_value=fake):
+            resp = client.post("/api/payments/create-order/", {"plan_id": plan.id}, format="json")
+
+        self.assertEqual(resp.status_code, 200, resp.content)
+        self.assertEqual(fake.order.create.call_args[0][0]["amount"], 29900)
+        self.assertEqual(Payment.objects.get(order_id="order_9", user=user).status, "CREATED")
+        self.assertEqual(gateway.metrics()["order.create"]["count"], 1)
@@ -0,0 +1,65 @@
+# backend/api/tokens.py
+"""
+Opt-in entitlement claims for JWT access tokens.
+
+With JWT_ENTITLEMENT_CLAIMS on, access tokens minted at login and refresh
+carry the user's role, shop id and an "ent" claim (plan type, feature
+flags, entitlement expiry). ClaimsJWTAuthentication then builds
+request.user from the token alone. Claims are a snapshot taken at mint
+time, so these tokens live JWT_CLAIMS_ACCESS_LIFETIME (minutes, not days)
+to bound how stale a plan change can be.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+
+from . import entitlements
+
+ENTITLEMENT_CLAIM = "ent"
+
+
+def claims_enabled():
+    return getattr(settings, "JWT_ENTITLEMENT_CLAIMS", False)
+
+
+def entitlement_claims(user):
+    data = entitlements.for_user(user.pk)
+    valid_until = data["valid_until"]
+    return {
+        "email": user.email,
+        "username": user.username,
+        "role": user.role,
+        "shop_id": user.shop_id,
+        ENTITLEMENT_CLAIM: {
+            "exists": data["exists"],
+            "admin": data["allowed_by_admin"],
+            "exp": int(valid_until.timestamp()) if valid_until else None,
+            "plan": data["plan_type"],
+            "features": data["features"],
+        },
+    }
+
+
+def entitlement_from_claim(claim):
+    """Turns the "ent" claim back into an entitlements snapshot dict."""
+    exp = claim.get("exp")
+    return {
+        "exists": claim.get("exists", False),
+        "allowed_by_admin": claim.get("admin", False),
+        "valid_until": datetime.fromtimestamp(exp, tz=dt_timezone.utc) if exp is not None else None,
+        "plan_type": claim.get("plan"),
+        "features": claim.get("features") or {},
+    }
+
+
+def access_token_for(refresh, user):
+    """
+    Access token for `refresh`; with claims enabled it is short-lived and
+    carries the user's entitlements.
+    """
+    access = refresh.access_token
+    if claims_enabled():
+        access.set_exp(lifetime=getattr(settings, "JWT_CLAIMS_ACCESS_LIFETIME", timedelta(minutes=15)))
+        for claim, value in entitlement_claims(user).items():
+            access[claim] = value
+    return access
@@ -4,16 +4,23 @@
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.shortcuts import get_object_or_404
-from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags, urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes, force_str
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
-from django.db.models import Sum, Count
+from django.db import transaction
+from django.core.cache import cache
+from django.db.models import Sum, Count, Max, Prefetch, Q, F, DecimalField
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from datetime import datetime, time, timedelta
 
 # --- 3rd Party Imports ---
-import razorpay
 from rest_framework import viewsets, generics, permissions, status
 from rest_framework.decorators import api_view, permission_classes, action
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import JSONParser
 from rest_framework.response import Response
 
 # --- Local App Imports ---
@@ -29,18 +36,29 @@ from .serializers import (
     ShopSerializer,
     PaymentSerializer, 
     UserSubscriptionSerializer,
-    UserSerializer  # <-- FIX: This import will now work
+    UserSerializer,  # <-- FIX: This import will now work
+    create_invoices_in_bulk,
 )
+from . import entitlements, gateway, plans
+from .pagination import InvoiceCursorPagination
+from .parsers import NDJSONParser
 
 # Models (from *THIS* app - 'api')
 from .models import SubscriptionPlan, Payment, UserSubscription
 # from .models import Expense # Uncomment if you use Expense in this file
 
 # Models (from *OTHER* apps)
+from accounts.models import normalize_email_address
 from catalog.models import Product
+from catalog import search as product_search, sku_cache, sync as product_sync
 from customers.models import Customer
-from sales.models import Invoice
+from sales.models import Invoice, InvoiceItem
+from sales import idempotency, quotas
+from sales.sequences import allocate_invoice_numbers
 from shops.models import Shop, TaxProfile
+from reports import analytics, rollups
+from reports import gst as gst_report
+from reports.models import DailySales
 
 # Email utilities
 from .emails import send_password_reset_email
@@ -60,30 +78,266 @@ class SubscriptionPlanViewSet(viewsets.ModelViewSet):
     serializer_class = SubscriptionPlanSerializer
     permission_classes = (permissions.IsAuthenticated,) # Keep as IsAuthenticated
 
+    def list(self, request, *args, **kwargs):
+        """
+        Served from the in-process plan catalog (api/plans.py) with an ETag
+        tied to the catalog version, so clients can cache it and revalidate
+        with If-None-Match.
+        """
+        catalog = plans.get_catalog()
+        etag = plans.etag(catalog)
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(plans.serialized(
+                catalog, lambda rows: self.get_serializer(rows, many=True).data
+            ))
+        response["ETag"] = etag
+        patch_cache_control(response, private=True, max_age=getattr(settings, "PLAN_CATALOG_MAX_AGE", 3600))
+        return response
+
 # ---------- Reports ----------
+DASHBOARD_LOW_STOCK_THRESHOLD = 5  # used when a product has no low_stock_threshold of its own
+
+
+def _dashboard_summary(shop_id):
+    now = timezone.localtime()
+    today = timezone.make_aware(datetime.combine(now.date(), time.min))
+    week = today - timedelta(days=now.weekday())
+    month = today.replace(day=1)
+
+    sales = Invoice.objects.filter(shop_id=shop_id).exclude(status='CANCELLED').aggregate(
+        total_sales=Sum('grand_total'),
+        total_invoices=Count('id'),
+        today_sales=Sum('grand_total', filter=Q(invoice_date__gte=today)),
+        today_invoices=Count('id', filter=Q(invoice_date__gte=today)),
+        week_sales=Sum('grand_total', filter=Q(invoice_date__gte=week)),
+        week_invoices=Count('id', filter=Q(invoice_date__gte=week)),
+        month_sales=Sum('grand_total', filter=Q(invoice_date__gte=month)),
+        month_invoices=Count('id', filter=Q(invoice_date__gte=month)),
+    )
+    low_stock = Q(quantity__gt=0) & (
+        Q(low_stock_threshold__gt=0, quantity__lte=F('low_stock_threshold'))
+        | Q(low_stock_threshold=0, quantity__lte=DASHBOARD_LOW_STOCK_THRESHOLD)
+    )
+    stock = Product.objects.filter(shop_id=shop_id).aggregate(
+        total_products=Count('id'),
+        low_stock=Count('id', filter=low_stock),
+        out_of_stock=Count('id', filter=Q(quantity__lte=0)),
+        inventory_value=Sum(
+            F('price') * F('quantity'),
+            filter=Q(quantity__gt=0),
+            output_field=DecimalField(max_digits=18, decimal_places=2),
+        ),
+    )
+    return {
+        **{key: value or 0 for key, value in sales.items()},
+        **{key: value or 0 for key, value in stock.items()},
+    }
+
+
 class ReportsViewSet(viewsets.ViewSet):
     permission_classes = (permissions.IsAuthenticated,)
 
     @action(detail=False, methods=['get'])
     def sales_summary(self, request):
+        """
+        Sales totals from the DailySales rollup (one row per day and payment
+        mode), optionally limited with ?from=YYYY-MM-DD&to=YYYY-MM-DD.
+        Cancelled invoices are not counted.
+        """
         # --- FIX: Filter invoices by the user's shop ---
-        if not request.user.shop:
+        if not request.user.shop_id:
             return Response({"error": "User is not associated with a shop"}, status=400)
-            
-        # Use aggregation for efficiency
-        summary = Invoice.objects.filter(shop=request.user.shop).aggregate(
-            total_sales=Sum('grand_total'),
-            total_invoices=Count('id')
-        )
+
+        rows = DailySales.objects.filter(shop_id=request.user.shop_id)
+        start = _parse_day_param(request.query_params.get('from'), 'from')
+        end = _parse_day_param(request.query_params.get('to'), 'to')
+        if start:
+            rows = rows.filter(date__gte=start)
+        if end:
+            rows = rows.filter(date__lte=end)
+
+        by_payment_mode = {
+            row['payment_mode']: {"total_sales": row['total_sales'] or 0, "total_invoices": row['total_invoices'] or 0}
+            for row in rows.values('payment_mode').annotate(
+                total_sales=Sum('grand_total'), total_invoices=Sum('invoice_count')
+            ).order_by()
+        }
         
         return Response({
-            "total_sales": summary['total_sales'] or 0,
-            "total_invoices": summary['total_invoices'] or 0
+            "total_sales": sum((m["total_sales"] for m in by_payment_mode.values()), 0),
+            "total_invoices": sum(m["total_invoices"] for m in by_payment_mode.values()),
+            "by_payment_mode": by_payment_mode,
         })
 
+    @action(detail=False, methods=['get'])
+    def dashboard(self, request):
+        """
+        Everything the Dashboard cards need, aggregated in SQL: one query over
+        invoices and one over products. Cached per shop for
+        DASHBOARD_CACHE_TTL seconds.
+        """
+        shop_id = getattr(request.user, 'shop_id', None)
+        if not shop_id:
+            return Response({"error": "User is not associated with a shop"}, status=400)
+
+        cache_key = f"reports:dashboard:{shop_id}"
+        data = cache.get(cache_key)
+        if data is None:
+            data = _dashboard_summary(shop_id)
+            cache.set(cache_key, data, getattr(settings, 'DASHBOARD_CACHE_TTL', 30))
+        return Response(data)
+
+    # --- Product sales analytics (reports/analytics.py) ---
+    def _window(self, request, default_days=30):
+        end = _parse_day_param(request.query_params.get('to'), 'to') or timezone.localdate()
+        start = _parse_day_param(request.query_params.get('from'), 'from') or end - timedelta(days=default_days - 1)
+        if start > end:
+            raise ValidationError({"from": "Must not be after 'to'."})
+        return start, end
+
+    def _int_param(self, request, name, default, maximum):
+        try:
+            value = int(request.query_params.get(name, default))
+        except (TypeError, ValueError):
+            raise ValidationError({name: "Must be an integer."})
+        return max(1, min(value, maximum))
+
+    @action(detail=False, methods=['get'])
+    def top_sellers(self, request):
+        """?from=&to= (default last 30 days), ?limit=10, ?order=qty|revenue"""
+        if not request.user.shop_id:
+            return Response({"error": "User is not associated with a shop"}, status=400)
+        start, end = self._window(request)
+        limit = self._int_param(request, 'limit', 10, 100)
+        rows = analytics.top_sellers(request.user.shop_id, start, end, limit, request.query_params.get('order', 'qty'))
+        return Response({"from": start, "to": end, "results": rows})
+
+    @action(detail=False, methods=['get'])
+    def slow_movers(self, request):
+        """?from=&to= (default last 30 days), ?limit=10"""
+        if not request.user.shop_id:
+            return Response({"error": "User is not associated with a shop"}, status=400)
+        start, end = self._window(request)
+        limit = self._int_param(request, 'limit', 10, 100)
+        return Response({"from": start, "to": end, "results": analytics.slow_movers(request.user.shop_id, start, end, limit)})
+
+    @action(detail=False, methods=['get'])
+    def stock_cover(self, request):
+        """Days of stock remaining at the average daily velocity. ?days=30, ?limit=50"""
+        if not request.user.shop_id:
+            return Response({"error": "User is not associated with a shop"}, status=400)
+        days = self._int_param(request, 'days', 30, 366)
+        limit = self._int_param(request, 'limit', 50, 500)
+        rows = analytics.stock_cover(request.user.shop_id, timezone.localdate(), days, limit)
+        return Response({"days": days, "results": rows})
+
+    @action(detail=False, methods=['get'])
+    def product_sales(self, request):
+        """Daily qty/revenue for one product. ?product=<id>&from=&to="""
+        if not request.user.shop_id:
+            return Response({"error": "User is not associated with a shop"}, status=400)
+        try:
+            product_id = int(request.query_params['product'])
+        except (KeyError, ValueError):
+            product_id = 0
+        if product_id < 1:
+            raise ValidationError({"product": "Required; must be a positive integer id."})
+        start, end = self._window(request)
+        rows = analytics.product_daily(request.user.shop_id, product_id, start, end)
+        return Response({"product": product_id, "from": start, "to": end, "results": rows})
+
+    @action(detail=False, methods=['get'])
+    def gst(self, request):
+        """
+        GST summary by tax slab. ?month=YYYY-MM (closed months are cached),
+        or ?from=YYYY-MM-DD&to=YYYY-MM-DD. Defaults to the current month.
+        """
+        if not request.user.shop_id:
+            return Response({"error": "User is not associated with a shop"}, status=400)
+
+        params = request.query_params
+        if 'from' in params or 'to' in params:
+            start, end = self._window(request)
+            return Response(gst_report.summarize(request.user.shop_id, start, end))
+
+        month = params.get('month')
+        if month:
+            try:
+                year, month = (int(part) for part in month.split('-'))
+                gst_report.month_bounds(year, month)
+            except ValueError:
+                raise ValidationError({"month": "Use YYYY-MM."})
+        else:
+            today = timezone.localdate()
+            year, month = today.year, today.month
+        return Response(gst_report.summarize_month(request.user.shop_id, year, month))
+
     def list(self, request):
         return Response({"detail": "Reports endpoint"})
 
+def _parse_day_param(value, name):
+    if not value:
+        return None
+    try:
+        day = parse_date(value)
+    except ValueError:
+        day = None
+    if day is None:
+        raise ValidationError({name: "Use YYYY-MM-DD."})
+    return day
+
+
+def _parse_date_param(value, name, end_of_day=False):
+    """
+    Parses a ?from= / ?to= query value into an aware datetime. A bare date
+    means the start of that day, or the start of the next day when
+    `end_of_day` is set (for an exclusive upper bound).
+    """
+    if not value:
+        return None
+    try:
+        day = parse_date(value)
+        parsed = None if day else parse_datetime(value)
+    except ValueError:
+        day = parsed = None
+    if parsed is not None:
+        return parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed)
+    if day is None:
+        raise ValidationError({name: "Use YYYY-MM-DD or an ISO 8601 datetime."})
+    if end_of_day:
+        day += timedelta(days=1)
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+class ConditionalListMixin:
+    """
+    Conditional GET for list endpoints. The ETag comes from one aggregate
+    over the listed rows, (count, max updated_at), served by a
+    (shop, updated_at) index: any save moves max(updated_at), any delete
+    changes the count. A client holding the current ETag gets 304 without
+    a single row being serialized. No Last-Modified is sent: a delete does
+    not move max(updated_at), so If-Modified-Since would keep the deleted
+    row alive in the client's copy.
+    """
+    def list(self, request, *args, **kwargs):
+        validators = self.filter_queryset(self.get_queryset()).aggregate(
+            count=Count('id'), last_modified=Max('updated_at')
+        )
+        last_modified = validators['last_modified']
+        stamp = int(last_modified.timestamp() * 1_000_000) if last_modified else 0
+        etag = f'"{self.basename}-{validators["count"]}-{stamp}"'
+
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = super().list(request, *args, **kwargs)
+        response["ETag"] = etag
+        # Cache it, but revalidate every time; the body differs per shop.
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ["Authorization"])
+        return response
+
+
 # ---------- Base Class for Shop Filtering ----------
 class ShopFilteredViewSet(viewsets.ModelViewSet):
     """
@@ -101,9 +355,9 @@ class ShopFilteredViewSet(viewsets.ModelViewSet):
         # Get the base queryset from the child class (e.g., Product.objects.all())
         base_queryset = super().get_queryset() 
         
-        if user.is_authenticated and hasattr(user, 'shop') and user.shop is not None:
-            # Filter by the user's shop
-            return base_queryset.filter(shop=user.shop)
+        if user.is_authenticated and getattr(user, 'shop_id', None) is not None:
+            # Filter by the user's shop (by id, so no shop lookup is needed)
+            return base_queryset.filter(shop_id=user.shop_id)
         
         # User has no shop, return empty
         return base_queryset.none() 
@@ -121,23 +375,287 @@ class ShopFilteredViewSet(viewsets.ModelViewSet):
             raise permissions.ValidationError("You are not associated with a shop and cannot create this object.")
 
 # ---------- Standard CRUD (FIXED with Filtering) ----------
-class ProductViewSet(ShopFilteredViewSet): # <-- Use base class
+class ProductViewSet(ConditionalListMixin, ShopFilteredViewSet): # <-- Use base class
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
     # permission_classes are inherited
 
+    def list(self, request, *args, **kwargs):
+        """
+        GET /api/products/                      every product of the shop
+        GET /api/products/?updated_since=<c>    delta feed: products changed and
+            ids deleted since cursor <c> ("0" for all), plus the next cursor.
+            See catalog/sync.py.
+        """
+        if 'updated_since' not in request.query_params:
+            return super().list(request, *args, **kwargs)
+        shop_id = request.user.shop_id
+        if not shop_id:
+            return Response({"error": "User is not associated with a shop"}, status=400)
+        try:
+            since = product_sync.decode_cursor(request.query_params['updated_since'])
+        except ValueError:
+            raise ValidationError({"updated_since": "Must be a cursor returned by this endpoint, or 0."})
+        try:
+            delta = product_sync.changes(shop_id, since)
+        except product_sync.CursorExpired:
+            return Response(
+                {"error": "Cursor expired; sync again from updated_since=0."}, status=status.HTTP_410_GONE
+            )
+        return Response({
+            "changed": self.get_serializer(delta.changed, many=True).data,
+            "deleted": delta.deleted,
+            "cursor": delta.cursor,
+            "has_more": delta.has_more,
+        })
 
-class CustomerViewSet(ShopFilteredViewSet): # <-- Use base class
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        GET /api/products/search/?q=bas+ric&limit=20
+        Prefix search over name and SKU from the text index (catalog/search.py),
+        best match first, at most search.MAX_LIMIT results.
+        """
+        shop_id = request.user.shop_id
+        if not shop_id:
+            return Response({"error": "User is not associated with a shop"}, status=400)
+        results = product_search.search_products(
+            shop_id, request.query_params.get('q', ''), request.query_params.get('limit')
+        )
+        return Response(self.get_serializer(results, many=True).data)
+
+    @action(detail=False, methods=['get'], url_path=r'by-sku/(?P<code>[^/]+)')
+    def by_sku(self, request, code=None):
+        """
+        GET /api/products/by-sku/<code>/
+        Barcode scan: the active product with exactly this SKU in the user's
+        shop, from the worker's hot cache (catalog/sku_cache.py) or one probe of
+        the (shop, sku) unique index.
+        """
+        shop_id = request.user.shop_id
+        if not shop_id:
+            return Response({"error": "User is not associated with a shop"}, status=400)
+        code = code.strip()
+        if not code:
+            return Response({"error": "No product with this SKU"}, status=404)
+        version = sku_cache.current_version(shop_id)
+        data = sku_cache.get(shop_id, code, version)
+        if data is None:
+            try:
+                product = Product.objects.get(shop_id=shop_id, sku=code, is_active=True)
+            except Product.DoesNotExist:
+                return Response({"error": "No product with this SKU"}, status=404)
+            data = self.get_serializer(product).data
+            sku_cache.put(shop_id, code, version, product.pk, data)
+        return Response(data)
+
+
+class CustomerViewSet(ConditionalListMixin, ShopFilteredViewSet): # <-- Use base class
     queryset = Customer.objects.all()
     serializer_class = CustomerSerializer
     # permission_classes are inherited
 
 
 class InvoiceViewSet(ShopFilteredViewSet): # <-- Use base class
-    queryset = Invoice.objects.all().order_by('-invoice_date') # Show newest first
+    # Customer is joined and items + their products are prefetched, so a
+    # page of invoices costs three queries however many rows it has.
+    queryset = Invoice.objects.select_related('customer').prefetch_related(
+        Prefetch('items', queryset=InvoiceItem.objects.select_related('product'))
+    ).order_by('-invoice_date') # Show newest first
     serializer_class = InvoiceSerializer
+    pagination_class = InvoiceCursorPagination
     # permission_classes are inherited
 
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            rollups.remove_invoices([instance])
+            quotas.remove_bills([instance])
+            instance.delete()
+
+    def get_queryset(self):
+        """
+        List filters: ?from=YYYY-MM-DD&to=YYYY-MM-DD (inclusive, shop-local
+        dates, full ISO datetimes also accepted), ?status=PAID, ?customer_mobile=...
+        Dates are turned into a half-open datetime range so the
+        (shop, invoice_date) index is used.
+        """
+        queryset = super().get_queryset()
+        if self.action != 'list':
+            return queryset
+
+        params = self.request.query_params
+        start = _parse_date_param(params.get('from'), 'from')
+        end = _parse_date_param(params.get('to'), 'to', end_of_day=True)
+        if start is not None:
+            queryset = queryset.filter(invoice_date__gte=start)
+        if end is not None:
+            queryset = queryset.filter(invoice_date__lt=end)
+        if params.get('status'):
+            queryset = queryset.filter(status=params['status'].upper())
+        if params.get('customer_mobile'):
+            queryset = queryset.filter(customer_mobile=params['customer_mobile'])
+        return queryset
+
+    def create(self, request, *args, **kwargs):
+        """
+        Honors an optional `Idempotency-Key` header: a retried POST with the
+        same key returns the stored response instead of billing twice.
+        """
+        key = request.headers.get("Idempotency-Key")
+        shop = getattr(request.user, "shop", None)
+        if not key or shop is None:
+            return super().create(request, *args, **kwargs)
+
+        if len(key) > idempotency.MAX_KEY_LENGTH:
+            return Response(
+                {"detail": f"Idempotency-Key must be at most {idempotency.MAX_KEY_LENGTH} characters."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        request_fingerprint = idempotency.fingerprint(request.data)
+        record, created = idempotency.claim(shop, key, request_fingerprint)
+        if not created:
+            if record.fingerprint != request_fingerprint:
+                return Response(
+                    {"detail": "Idempotency-Key was already used with a different request."},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                )
+            if record.response_status is None:
+                return Response(
+                    {"detail": "A request with this Idempotency-Key is still being processed."},
+                    status=status.HTTP_409_CONFLICT
+                )
+            return Response(
+                record.response_body,
+                status=record.response_status,
+                headers={"Idempotent-Replayed": "true"}
+            )
+
+        # The response is stored in the invoice's transaction: a worker that
+        # dies before storing it leaves no invoice behind either, so a retry
+        # taking over the abandoned claim cannot bill twice.
+        try:
+            with transaction.atomic():
+                response = super().create(request, *args, **kwargs)
+                idempotency.store(record, response.status_code, response.data)
+        except Exception:
+            idempotency.release(record)
+            raise
+        return response
+
+    @action(detail=False, methods=['post'], parser_classes=[JSONParser, NDJSONParser])
+    def batch(self, request):
+        """
+        Offline till sync. Accepts a JSON array (or {"invoices": [...]}, or an
+        application/x-ndjson stream) of invoices, validates each one, allocates
+        all numbers in one step and bulk-inserts the valid ones. Returns one
+        result per input, in order; invalid entries do not block the rest.
+        Each entry may carry an "idempotency_key" so re-sending a queue that
+        partly reached the server does not bill twice.
+        """
+        shop = getattr(request.user, "shop", None)
+        if shop is None:
+            return Response({"error": "User is not associated with a shop"}, status=400)
+
+        entries = request.data
+        if isinstance(entries, dict):
+            entries = entries.get("invoices")
+        if not isinstance(entries, list):
+            return Response({"detail": "Expected a list of invoices."}, status=status.HTTP_400_BAD_REQUEST)
+        max_size = getattr(settings, "INVOICE_BATCH_MAX_SIZE", 500)
+        if len(entries) > max_size:
+            return Response(
+                {"detail": f"At most {max_size} invoices per batch."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        keys = [
+            e["idempotency_key"] for e in entries
+            if isinstance(e, dict) and e.get("idempotency_key") and isinstance(e["idempotency_key"], str)
+        ]
+        known = idempotency.lookup_many(shop, keys)
+
+        # Load every product referenced anywhere in the batch in one query.
+        product_ids = set()
+        for entry in entries:
+            for item in (entry.get("items") if isinstance(entry, dict) else None) or []:
+                try:
+                    product_ids.add(int(item.get("product")))
+                except (AttributeError, TypeError, ValueError):
+                    continue
+        context = self.get_serializer_context()
+        context["invoice_products"] = Product.objects.in_bulk(product_ids) if product_ids else {}
+
+        results = [None] * len(entries)
+        valid = []  # (index, validated_data, key, fingerprint)
+        seen_keys = set()
+        for index, entry in enumerate(entries):
+            if not isinstance(entry, dict):
+                results[index] = {"index": index, "status": "error", "errors": {"detail": "Expected an object."}}
+                continue
+            key = entry.get("idempotency_key")
+            if key is not None and not isinstance(key, str):
+                results[index] = {"index": index, "status": "error",
+                                  "errors": {"idempotency_key": "Must be a string."}}
+                continue
+            payload = {k: v for k, v in entry.items() if k != "idempotency_key"}
+            request_fingerprint = idempotency.fingerprint(payload) if key else None
+            if key:
+                if len(key) > idempotency.MAX_KEY_LENGTH or key in seen_keys:
+                    results[index] = {"index": index, "status": "error",
+                                      "errors": {"idempotency_key": "Too long or repeated within the batch."}}
+                    continue
+                seen_keys.add(key)
+                record = known.get(key)
+                if record is not None:
+                    if record.fingerprint != request_fingerprint or record.response_status is None:
+                        results[index] = {"index": index, "status": "error",
+                                          "errors": {"idempotency_key": "Already used with a different request."}}
+                    else:
+                        results[index] = {**record.response_body, "index": index, "status": "replayed"}
+                    continue
+
+            serializer = self.get_serializer(data=payload, context=context)
+            if serializer.is_valid():
+                valid.append((index, serializer.validated_data, key, request_fingerprint))
+            else:
+                results[index] = {"index": index, "status": "error", "errors": serializer.errors}
+
+        # Entries beyond this week's bill quota are refused, in order.
+        left = quotas.remaining(shop.id, entitlements.limit(entitlements.for_shop(request.user), quotas.FEATURE))
+        if left is not None and len(valid) > left:
+            for index, *_ in valid[left:]:
+                results[index] = {"index": index, "status": "error",
+                                  "errors": {"detail": quotas.BillQuotaExceeded.default_detail}}
+            valid = valid[:left]
+
+        if valid:
+            # Numbers are reserved before the write transaction; if the write
+            # fails they become gaps (see sales/sequences.py).
+            numbers = allocate_invoice_numbers(shop.id, len(valid))
+            try:
+                with transaction.atomic():
+                    invoices = create_invoices_in_bulk(shop, [v[1] for v in valid], numbers)
+                    remembered = {}
+                    for (index, _, key, request_fingerprint), invoice in zip(valid, invoices):
+                        body = {"id": invoice.id, "number": invoice.number, "grand_total": str(invoice.grand_total)}
+                        results[index] = {"index": index, "status": "created", **body}
+                        if key:
+                            remembered[key] = (status.HTTP_201_CREATED, body, request_fingerprint)
+                    idempotency.remember_many(shop, remembered)
+            except idempotency.KeyConflict:
+                return Response(
+                    {"detail": "Another sync with the same idempotency keys is in progress."},
+                    status=status.HTTP_409_CONFLICT
+                )
+
+        created = sum(1 for r in results if r["status"] == "created")
+        failed = sum(1 for r in results if r["status"] == "error")
+        return Response(
+            {"created": created, "failed": failed, "results": results},
+            status=status.HTTP_207_MULTI_STATUS if failed else status.HTTP_201_CREATED
+        )
+
 
 class TaxProfileViewSet(ShopFilteredViewSet): # <-- Use base class
     queryset = TaxProfile.objects.all()
@@ -177,9 +695,6 @@ class MeViewSet(viewsets.ViewSet):
 
 # ---------- Payment & Subscription Views ----------
 RAZORPAY_KEY_ID = settings.RAZORPAY_KEY_ID
-RAZORPAY_KEY_SECRET = settings.RAZORPAY_KEY_SECRET
-
-razorpay_client = razorpay.Client(auth=(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET))
 
 
 @api_view(["POST"])
@@ -187,25 +702,28 @@ razorpay_client = razorpay.Client(auth=(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET))
 def create_order(request):
     """User selects a plan → Create Razorpay order"""
     plan_id = request.data.get("plan_id")
-    try:
-        plan = SubscriptionPlan.objects.get(id=plan_id)
-    except SubscriptionPlan.DoesNotExist:
+    plan = plans.get_plan(plan_id)
+    if plan is None:
         return Response({"error": "Plan not found"}, status=status.HTTP_404_NOT_FOUND)
 
     amount_paise = int(plan.price * 100)
 
-    order = razorpay_client.order.create({
-        "amount": amount_paise,
-        "currency": "INR",
-        "payment_capture": 1
-    })
+    client = gateway.get_client()
+    try:
+        order = gateway.call("order.create", client.order.create, {
+            "amount": amount_paise,
+            "currency": "INR",
+            "payment_capture": 1
+        })
+    except gateway.GatewayUnavailable as e:
+        return Response({"error": str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
 
     payment = Payment.objects.create(
         user=request.user,
         plan=plan,
         order_id=order["id"],
         amount=plan.price,
-        status="created"
+        status="CREATED"
     )
 
     return Response({
@@ -242,8 +760,9 @@ class ForgotPasswordView(APIView):
         if not email:
             return Response({"error": "Email is required."}, status=400)
 
-        # --- FIX: Use email__iexact for case-insensitive search ---
-        user = User.objects.filter(email__iexact=email).first()
+        # Case-insensitive: emails are stored lowercased, so normalize and
+        # match exactly against the unique index.
+        user = User.objects.filter(email=normalize_email_address(email)).first()
         if not user:
              # Do not reveal if user exists
             return Response({"message": "If an account with this email exists, a reset link has been sent."})
@@ -254,7 +773,8 @@ class ForgotPasswordView(APIView):
         frontend_url = settings.FRONTEND_URL or "http://localhost:5173"
         reset_url = f"{frontend_url}/reset-password/{uidb64}/{token}"
 
-        send_password_reset_email(email, reset_url)
+        # Queued; the send_queued_emails worker delivers it.
+        send_password_reset_email(user.email, reset_url)
         return Response({"message": "Password reset link sent to your email."})
     
 
@@ -0,0 +1,120 @@
+# backend/api/webhooks.py
+"""
+Razorpay webhook pipeline.
+
+The webhook view verifies the signature, stores the event with
+`record` (INSERT ... ON CONFLICT DO NOTHING on the unique event id, so
+Razorpay's retries are dropped) and returns 200 straight away. The
+`process_webhook_events` worker then calls `process_pending`, which loads
+a batch of pending events and the payments they refer to in two queries
+and applies each event in its own transaction. Flipping the event to
+PROCESSED commits or rolls back together with its effects, so every event
+takes effect exactly once. A failing event is retried on later runs, up to
+MAX_ATTEMPTS.
+"""
+import hashlib
+import hmac
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Payment, UserSubscription, WebhookEvent
+
+MAX_ATTEMPTS = 5
+
+
+def verify_signature(body, signature, secret):
+    """HMAC-SHA256 of the raw body, as Razorpay signs webhooks."""
+    if not signature or not secret:
+        return False
+    expected = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+def record(event_id, data, body):
+    """Stores the event unless one with the same id already exists."""
+    WebhookEvent.objects.bulk_create(
+        [WebhookEvent(
+            event_id=event_id or hashlib.sha256(body).hexdigest(),
+            event=str(data.get("event", ""))[:64],
+            payload=data,
+        )],
+        ignore_conflicts=True,
+    )
+
+
+def _payment_entity(event):
+    try:
+        return event.payload["payload"]["payment"]["entity"]
+    except (KeyError, TypeError):
+        return {}
+
+
+def mark_captured(payment, payment_id):
+    """Records a captured payment and activates its plan, once."""
+    if payment.status == "SUCCESS" and payment.payment_id == payment_id:
+        return False  # already applied (verify_payment, webhook or reconciliation)
+    payment.payment_id = payment_id
+    payment.status = "SUCCESS"
+    payment.save(update_fields=["payment_id", "status", "updated_at"])
+    subscription, _ = UserSubscription.objects.get_or_create(user_id=payment.user_id)
+    subscription.activate_plan(payment.plan)
+    return True
+
+
+def mark_failed(payment):
+    if payment.status == "SUCCESS":
+        return False
+    payment.status = "FAILED"
+    payment.save(update_fields=["status", "updated_at"])
+    return True
+
+
+def _payment_captured(event, payment):
+    if payment is not None:
+        mark_captured(payment, _payment_entity(event).get("id"))
+
+
+def _payment_failed(event, payment):
+    if payment is not None:
+        mark_failed(payment)
+
+
+HANDLERS = {
+    "payment.captured": _payment_captured,
+    "payment.failed": _payment_failed,
+}
+
+
+def process_pending(batch_size=100):
+    """Applies up to `batch_size` pending events. Returns (processed, failed)."""
+    events = list(WebhookEvent.objects.filter(status="PENDING").order_by("id")[:batch_size])
+    if not events:
+        return 0, 0
+
+    order_ids = {_payment_entity(event).get("order_id") for event in events} - {None}
+    payments = Payment.objects.select_related("plan").in_bulk(order_ids, field_name="order_id") if order_ids else {}
+
+    processed = failed = 0
+    for event in events:
+        handler = HANDLERS.get(event.event)
+        try:
+            with transaction.atomic():
+                # Claim the event; if another worker got there first, skip it.
+                claimed = WebhookEvent.objects.filter(pk=event.pk, status="PENDING").update(
+                    status="PROCESSED", attempts=event.attempts + 1, processed_at=timezone.now(),
+                )
+                if not claimed:
+                    continue
+                if handler:
+                    handler(event, payments.get(_payment_entity(event).get("order_id")))
+            processed += 1
+        except Exception as exc:
+            failed += 1
+            event.attempts += 1
+            WebhookEvent.objects.filter(pk=event.pk, status="PENDING").update(
+                attempts=event.attempts,
+                last_error=str(exc)[:2000],
+                status="FAILED" if event.attempts >= MAX_ATTEMPTS else "PENDING",
+            )
+    return processed, failed
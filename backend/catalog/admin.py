@@ -1,6 +1,7 @@
 # backend/catalog/admin.py
 from django.contrib import admin
-from .models import Product
+from . import stock
+from .models import Product, StockMovement
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
@@ -8,4 +9,25 @@ class ProductAdmin(admin.ModelAdmin):
     list_filter = ('shop', 'is_active', 'unit')
     search_fields = ('name', 'sku', 'shop__name')
     list_editable = ('price', 'quantity', 'is_active')
-    raw_id_fields = ('shop',)
\ No newline at end of file
+    raw_id_fields = ('shop',)
+
+    def save_model(self, request, obj, form, change):
+        # Stock edited here goes through the ledger like the stock page.
+        old_quantity = form.initial.get('quantity', 0) if change else 0
+        super().save_model(request, obj, form, change)
+        stock.record_change(obj, old_quantity, note=f"Admin edit by {request.user}")
+
+
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    list_display = ('product', 'shop', 'kind', 'qty', 'invoice', 'created_at')
+    list_filter = ('kind',)
+    search_fields = ('product__name', 'product__sku', 'note')
+    raw_id_fields = ('shop', 'product', 'invoice')
+
+    # The ledger is append-only.
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save
 
 
 class CatalogConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'catalog'
+
+    def ready(self):
+        from . import sku_cache, sync
+        from .models import Product
+
+        post_save.connect(sku_cache.bump_version, sender=Product, dispatch_uid="product-skus-save")
+        post_delete.connect(sku_cache.bump_version, sender=Product, dispatch_uid="product-skus-delete")
+        post_delete.connect(sync.record_tombstone, sender=Product, dispatch_uid="product-tombstone")
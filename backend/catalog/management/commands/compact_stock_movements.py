@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from catalog.stock import compact
+
+
+class Command(BaseCommand):
+    help = "Folds settled stock movements into the per-product stock snapshots."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Keep compacting instead of exiting after one pass.")
+        parser.add_argument("--interval", type=float, default=60.0, help="Seconds to wait between passes with --loop.")
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            total += compact()
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
+        self.stdout.write(self.style.SUCCESS(f"Moved {total} stock snapshots."))
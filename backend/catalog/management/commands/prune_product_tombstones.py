@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from catalog.sync import prune_tombstones
+
+
+class Command(BaseCommand):
+    help = "Deletes product tombstones older than the delta sync retention window."
+
+    def handle(self, *args, **options):
+        deleted = prune_tombstones()
+        self.stdout.write(self.style.SUCCESS(f"Pruned {deleted} product tombstones."))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from catalog.stock import rebuild
+
+
+class Command(BaseCommand):
+    help = "Recomputes stock snapshots from the movement ledger and reconciles Product.quantity with it."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--shop", type=int, help="Only rebuild this shop id.")
+        parser.add_argument(
+            "--adopt-product-quantity", action="store_true",
+            help="Keep Product.quantity and record the difference as adjustments, instead of overwriting it "
+                 "from the ledger. Not for use with STOCK_DEFERRED_QUANTITY.",
+        )
+
+    def handle(self, *args, **options):
+        mismatched = rebuild(shop_id=options.get("shop"), adopt_product_quantity=options["adopt_product_quantity"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt stock snapshots; reconciled {mismatched} products."))
@@ -0,0 +1,78 @@
+# Generated by Django 5.0.6 on 2026-10-17 03:10
+
+from django.db import migrations
+
+# See catalog/search.py. The FTS table is contentless: triggers feed it the
+# shop token and text, and deletes must repeat the old values.
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE catalog_product_fts USING fts5(
+        shop, name, sku,
+        content='', prefix='1 2 3', tokenize="unicode61 remove_diacritics 2"
+    )
+    """,
+    """
+    INSERT INTO catalog_product_fts(rowid, shop, name, sku)
+    SELECT id, 's' || shop_id, name, sku FROM catalog_product
+    """,
+    """
+    CREATE TRIGGER catalog_product_fts_ai AFTER INSERT ON catalog_product BEGIN
+        INSERT INTO catalog_product_fts(rowid, shop, name, sku)
+        VALUES (new.id, 's' || new.shop_id, new.name, new.sku);
+    END
+    """,
+    """
+    CREATE TRIGGER catalog_product_fts_ad AFTER DELETE ON catalog_product BEGIN
+        INSERT INTO catalog_product_fts(catalog_product_fts, rowid, shop, name, sku)
+        VALUES ('delete', old.id, 's' || old.shop_id, old.name, old.sku);
+    END
+    """,
+    # Only text changes touch the index; stock updates on every sale do not.
+    """
+    CREATE TRIGGER catalog_product_fts_au AFTER UPDATE OF shop_id, name, sku ON catalog_product BEGIN
+        INSERT INTO catalog_product_fts(catalog_product_fts, rowid, shop, name, sku)
+        VALUES ('delete', old.id, 's' || old.shop_id, old.name, old.sku);
+        INSERT INTO catalog_product_fts(rowid, shop, name, sku)
+        VALUES (new.id, 's' || new.shop_id, new.name, new.sku);
+    END
+    """,
+]
+
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS catalog_product_fts_au",
+    "DROP TRIGGER IF EXISTS catalog_product_fts_ad",
+    "DROP TRIGGER IF EXISTS catalog_product_fts_ai",
+    "DROP TABLE IF EXISTS catalog_product_fts",
+]
+
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS catalog_product_name_trgm ON catalog_product USING gin (UPPER(name) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS catalog_product_sku_trgm ON catalog_product USING gin (UPPER(sku) gin_trgm_ops)",
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS catalog_product_sku_trgm",
+    "DROP INDEX IF EXISTS catalog_product_name_trgm",
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRES_FORWARD}),
+            _run({'sqlite': SQLITE_BACKWARD, 'postgresql': POSTGRES_BACKWARD}),
+        ),
+    ]
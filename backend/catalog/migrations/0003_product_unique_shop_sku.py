@@ -0,0 +1,35 @@
+# Generated by Django 5.0.6 on 2026-10-17 02:20
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def check_duplicate_skus(apps, schema_editor):
+    # Fail with the offending SKUs rather than a bare IntegrityError; which
+    # duplicate keeps the code is the shop's call, not the migration's.
+    Product = apps.get_model('catalog', 'Product')
+    duplicates = (
+        Product.objects.exclude(sku='').values('shop_id', 'sku')
+        .annotate(n=Count('id')).filter(n__gt=1).order_by('shop_id', 'sku')
+    )
+    if duplicates:
+        raise RuntimeError(
+            "Products sharing a SKU within a shop must be given distinct SKUs first: "
+            + ", ".join(f"shop {row['shop_id']}: {row['sku']}" for row in duplicates)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0002_product_search_index'),
+        ('shops', '0003_shop_whatsapp_number'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicate_skus, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='product',
+            constraint=models.UniqueConstraint(condition=models.Q(('sku', ''), _negated=True), fields=('shop', 'sku'), name='product_unique_shop_sku'),
+        ),
+    ]
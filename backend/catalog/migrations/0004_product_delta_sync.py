@@ -0,0 +1,31 @@
+# Generated by Django 5.0.6 on 2026-10-17 02:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0003_product_unique_shop_sku'),
+        ('shops', '0003_shop_whatsapp_number'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shop_id', models.BigIntegerField()),
+                ('product_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['shop', 'updated_at', 'id'], name='product_shop_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producttombstone',
+            index=models.Index(fields=['shop_id', 'deleted_at'], name='product_tombstone_shop_idx'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.0.6 on 2026-10-17 02:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def opening_balances(apps, schema_editor):
+    # Start every product's ledger at its current stock, so on hand from
+    # the ledger matches Product.quantity from day one.
+    Product = apps.get_model('catalog', 'Product')
+    StockMovement = apps.get_model('catalog', 'StockMovement')
+    movements = [
+        StockMovement(shop_id=shop_id, product_id=pk, kind='ADJUSTMENT', qty=quantity, note='Opening balance')
+        for pk, shop_id, quantity in Product.objects.exclude(quantity=0).values_list('id', 'shop_id', 'quantity')
+    ]
+    StockMovement.objects.bulk_create(movements, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0004_product_delta_sync'),
+        ('sales', '0011_weeklybillcount'),
+        ('shops', '0003_shop_whatsapp_number'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('last_movement_id', models.BigIntegerField(default=0)),
+                ('taken_at', models.DateTimeField(auto_now=True)),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stock_snapshot', to='catalog.product')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('SALE', 'Sale'), ('PURCHASE', 'Purchase'), ('ADJUSTMENT', 'Adjustment'), ('RETURN', 'Return')], max_length=10)),
+                ('qty', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('note', models.CharField(blank=True, max_length=140)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('invoice', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='sales.invoice')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='catalog.product')),
+                ('shop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='shops.shop')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', 'id'], name='stock_movement_product_idx')],
+            },
+        ),
+        migrations.RunPython(opening_balances, migrations.RunPython.noop),
+    ]
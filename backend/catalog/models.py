@@ -13,5 +13,81 @@ class Product(models.Model):
     quantity = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     is_active = models.BooleanField(default=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Delta sync (?updated_since=, catalog/sync.py) walks this index.
+            models.Index(fields=['shop', 'updated_at', 'id'], name='product_shop_updated_idx'),
+        ]
+        constraints = [
+            # Barcode lookups (/api/products/by-sku/) probe this index.
+            # Blank SKUs are common and allowed to repeat.
+            models.UniqueConstraint(
+                fields=['shop', 'sku'], condition=~models.Q(sku=''), name='product_unique_shop_sku',
+            ),
+        ]
+
     def __str__(self):
         return self.name
+
+
+class ProductTombstone(models.Model):
+    """
+    Marks a deleted product for the delta sync feed (catalog/sync.py).
+    shop_id is a plain column, not a foreign key, so deleting a shop (which
+    deletes its products) is not blocked by the tombstones it leaves.
+    """
+    shop_id = models.BigIntegerField()
+    product_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['shop_id', 'deleted_at'], name='product_tombstone_shop_idx'),
+        ]
+
+
+class StockMovement(models.Model):
+    """
+    One change to a product's stock; rows are only ever added. On hand is
+    the product's StockSnapshot plus the movements after it, see
+    catalog/stock.py.
+    """
+    KIND_CHOICES = [
+        ('SALE', 'Sale'),
+        ('PURCHASE', 'Purchase'),
+        ('ADJUSTMENT', 'Adjustment'),
+        ('RETURN', 'Return'),
+    ]
+
+    shop = models.ForeignKey('shops.Shop', on_delete=models.CASCADE, related_name='stock_movements')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_movements')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    # Signed: sales are negative.
+    qty = models.DecimalField(max_digits=12, decimal_places=2)
+    invoice = models.ForeignKey('sales.Invoice', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    note = models.CharField(max_length=140, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # On-hand reads and compaction sum a product's movements after its snapshot.
+            models.Index(fields=['product', 'id'], name='stock_movement_product_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.qty} of {self.product_id}"
+
+
+class StockSnapshot(models.Model):
+    """
+    A product's stock as of movement `last_movement_id`, written by
+    compaction so on-hand never has to sum the whole ledger.
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name='stock_snapshot')
+    quantity = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    last_movement_id = models.BigIntegerField(default=0)
+    taken_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.product_id}: {self.quantity} @ {self.last_movement_id}"
@@ -0,0 +1,119 @@
+# backend/catalog/search.py
+"""
+Product search by name and SKU.
+
+SQLite: a contentless FTS5 table `catalog_product_fts` (shop, name, sku),
+kept in sync by triggers on catalog_product (see migration 0002). The shop
+is stored as a token ("s<id>") so the shop filter is an index lookup, not
+a post-filter, and every query word is a prefix match. Results are ranked
+by bm25 with name matches weighted above SKU matches.
+
+PostgreSQL: the same word-prefix match, as a regex anchored at word starts
+on UPPER(name) and a LIKE prefix on UPPER(sku); trigram (pg_trgm) GIN
+indexes on both serve it. Results are ranked by trigram similarity.
+
+Other backends run the word-prefix match unindexed. Every backend returns
+at most MAX_LIMIT products.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Product
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 50
+
+FTS_TABLE = "catalog_product_fts"
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def clamp_limit(limit):
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        return DEFAULT_LIMIT
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def _fts_query(shop_id, words):
+    # Each word is quoted (so FTS5 syntax in user input is inert) and
+    # prefix-matched; all words must match in name or sku.
+    terms = " AND ".join(f'"{word}"*' for word in words)
+    return f'shop:"s{shop_id}" AND {{name sku}} : ({terms})'
+
+
+def _sqlite_ids(shop_id, words, limit):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT p.id
+            FROM {FTS_TABLE} f
+            JOIN catalog_product p ON p.id = f.rowid
+            WHERE {FTS_TABLE} MATCH %s AND p.is_active
+            ORDER BY bm25({FTS_TABLE}, 0.0, 10.0, 5.0), p.name
+            LIMIT %s
+            """,
+            [_fts_query(shop_id, words), limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _word_prefix_match(words, name="name", sku="sku", upper=False):
+    # Every word must start a word of the name (or start the SKU), like the
+    # FTS5 prefix query. Words are \w+ only, so they are safe in a pattern.
+    match = Q()
+    for word in words:
+        if upper:
+            word = word.upper()
+            match &= Q(**{f"{name}__regex": rf"(^|\W){word}"}) | Q(**{f"{sku}__startswith": word})
+        else:
+            match &= Q(**{f"{name}__iregex": rf"(^|\W){word}"}) | Q(**{f"{sku}__istartswith": word})
+    return match
+
+
+def _postgres_ids(shop_id, text, words, limit):
+    from django.contrib.postgres.search import TrigramSimilarity
+    from django.db.models.functions import Greatest, Upper
+
+    rows = (
+        Product.objects
+        # Matched on UPPER(name) / UPPER(sku) so the trigram GIN indexes
+        # (which serve both ~ and LIKE) are used.
+        .annotate(upper_name=Upper("name"), upper_sku=Upper("sku"))
+        .filter(
+            _word_prefix_match(words, "upper_name", "upper_sku", upper=True),
+            shop_id=shop_id, is_active=True,
+        )
+        .annotate(rank=Greatest(
+            TrigramSimilarity(Upper("name"), text.upper()),
+            TrigramSimilarity(Upper("sku"), text.upper()),
+        ))
+        .order_by("-rank", "name")
+        .values_list("id", flat=True)[:limit]
+    )
+    return list(rows)
+
+
+def _fallback_ids(shop_id, words, limit):
+    rows = Product.objects.filter(_word_prefix_match(words), shop_id=shop_id, is_active=True).order_by("name")
+    return list(rows.values_list("id", flat=True)[:limit])
+
+
+def search_products(shop_id, text, limit=DEFAULT_LIMIT):
+    """Active products of the shop matching `text`, best match first."""
+    limit = clamp_limit(limit)
+    words = [word.lower() for word in _WORD.findall(text or "")]
+    if not words:
+        return []
+
+    if connection.vendor == "sqlite":
+        ids = _sqlite_ids(shop_id, words, limit)
+    elif connection.vendor == "postgresql":
+        ids = _postgres_ids(shop_id, text, words, limit)
+    else:
+        ids = _fallback_ids(shop_id, words, limit)
+
+    products = Product.objects.in_bulk(ids)
+    return [products[pk] for pk in ids if pk in products]
@@ -0,0 +1,97 @@
+# backend/catalog/sku_cache.py
+"""
+Process-local cache of recently scanned SKUs, per shop.
+
+A barcode scan hits /api/products/by-sku/<code>/; a till scans the same few
+hundred items all day, so each worker keeps the serialized product for the
+last SKU_CACHE_SIZE codes of every shop and serves repeats with no query.
+
+Invalidation: saving or deleting a product (post_save/post_delete, connected
+in CatalogConfig.ready) writes a new per-shop version stamp to the shared
+cache, and entries stamped with an older version are dropped on their next
+read. As with the plan catalog, only the writing process sees the stamp
+under the default local-memory cache, so set CACHE_URL when running several
+workers. Stock changes from sales are plain UPDATEs that send no signal;
+the selling process evicts those products itself (evict_products) and other
+workers catch up within SKU_CACHE_TTL seconds.
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+_shops = {}  # shop id -> OrderedDict(sku -> (version, expires_at, product id, data))
+_skus_by_product = {}  # product id -> (shop id, sku)
+_lock = threading.Lock()
+
+
+def _version_key(shop_id):
+    return f"product-skus:version:{shop_id}"
+
+
+def current_version(shop_id):
+    key = _version_key(shop_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(sender, instance, **kwargs):
+    """Signal receiver: drops the shop's cached SKUs in every worker."""
+    key = _version_key(instance.shop_id)
+    cache.set(key, uuid.uuid4().hex, None)
+    evict_products([instance.pk])
+    # Again after commit, so a scan that read the old row mid-transaction
+    # cannot keep it under the new stamp.
+    transaction.on_commit(lambda: cache.set(key, uuid.uuid4().hex, None))
+
+
+def _drop(shop_id, sku):
+    _, _, product_id, _ = _shops[shop_id].pop(sku)
+    if _skus_by_product.get(product_id) == (shop_id, sku):
+        del _skus_by_product[product_id]
+
+
+def get(shop_id, sku, version):
+    with _lock:
+        entries = _shops.get(shop_id)
+        if not entries or sku not in entries:
+            return None
+        entry_version, expires_at, _, data = entries[sku]
+        if entry_version != version or expires_at <= time.monotonic():
+            _drop(shop_id, sku)
+            return None
+        entries.move_to_end(sku)
+        return data
+
+
+def put(shop_id, sku, version, product_id, data):
+    with _lock:
+        entries = _shops.setdefault(shop_id, OrderedDict())
+        if sku in entries:
+            _drop(shop_id, sku)
+        entries[sku] = (version, time.monotonic() + settings.SKU_CACHE_TTL, product_id, data)
+        _skus_by_product[product_id] = (shop_id, sku)
+        while len(entries) > settings.SKU_CACHE_SIZE:
+            _drop(shop_id, next(iter(entries)))
+
+
+def evict_products(product_ids):
+    """Drops the given products from this process's cache."""
+    with _lock:
+        for product_id in product_ids:
+            location = _skus_by_product.get(product_id)
+            if location is not None:
+                _drop(*location)
+
+
+def clear():
+    with _lock:
+        _shops.clear()
+        _skus_by_product.clear()
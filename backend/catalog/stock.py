@@ -0,0 +1,197 @@
+# backend/catalog/stock.py
+"""
+Stock ledger.
+
+Every stock change is a StockMovement row (sale, purchase, adjustment,
+return); sales are written in one bulk INSERT per invoice. A product's
+stock on hand is its StockSnapshot plus the movements recorded after the
+snapshot's `last_movement_id`, read through the (product, id) index.
+
+`compact` (run periodically by `compact_stock_movements`) moves each
+snapshot forward over movements older than SETTLE, so on-hand reads only
+ever sum a short tail. Movements are never deleted; the ledger is the
+audit trail. `rebuild` (command `rebuild_stock`) recomputes every snapshot
+from the whole ledger and reconciles Product.quantity with it.
+
+Product.quantity stays the value the app reads. By default the invoice's
+stock UPDATE keeps it current in the same transaction as the movements.
+With STOCK_DEFERRED_QUANTITY on, sales write only movements, so popular
+products are never row-locked by billing, and compaction brings
+Product.quantity up to date instead; it then lags by up to one
+compaction interval.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Max, Q, Sum, Value, When
+from django.utils import timezone
+
+from . import sku_cache
+from .models import Product, StockMovement, StockSnapshot
+
+# Movements younger than this are left out of snapshots: ids are taken at
+# INSERT, so a movement still in an open transaction may carry a lower id
+# than one already committed.
+SETTLE = timedelta(minutes=5)
+CHUNK_SIZE = 500
+ZERO = Decimal("0.00")
+
+
+def deferred_quantity():
+    return getattr(settings, "STOCK_DEFERRED_QUANTITY", False)
+
+
+def record_sales(lines):
+    """One SALE movement per invoice line; the lines must be saved."""
+    return StockMovement.objects.bulk_create([
+        StockMovement(
+            shop_id=line.invoice.shop_id, product_id=line.product_id, invoice_id=line.invoice_id,
+            kind="SALE", qty=-line.qty,
+        )
+        for line in lines
+    ], batch_size=CHUNK_SIZE)
+
+
+def record_change(product, old_quantity, kind="ADJUSTMENT", note=""):
+    """
+    Records a direct edit of product.quantity (stock page, admin) as a
+    movement. With deferred quantities the old value may lag the ledger, so
+    the difference is taken from the ledger instead.
+    """
+    if deferred_quantity() and product.pk:
+        old_quantity = on_hand([product.pk])[product.pk]
+    delta = Decimal(product.quantity) - Decimal(old_quantity or 0)
+    if delta:
+        StockMovement.objects.create(shop_id=product.shop_id, product=product, kind=kind, qty=delta, note=note)
+
+
+def _after_snapshot(movements):
+    return movements.filter(
+        Q(product__stock_snapshot__isnull=True) | Q(id__gt=F("product__stock_snapshot__last_movement_id"))
+    )
+
+
+def _totals(movements):
+    return dict(movements.values("product_id").annotate(total=Sum("qty")).values_list("product_id", "total"))
+
+
+def on_hand(product_ids):
+    """Returns {product id: stock on hand from the ledger}."""
+    product_ids = list(product_ids)
+    snapshots = dict(
+        StockSnapshot.objects.filter(product_id__in=product_ids).values_list("product_id", "quantity")
+    )
+    tail = _totals(_after_snapshot(StockMovement.objects.filter(product_id__in=product_ids)))
+    return {pk: snapshots.get(pk, ZERO) + tail.get(pk, ZERO) for pk in product_ids}
+
+
+def watermark():
+    """
+    Highest movement id folded into any snapshot. Compaction only ever
+    moves snapshots to the same new watermark, so every movement at or
+    below it is already in its product's snapshot.
+    """
+    return StockSnapshot.objects.aggregate(last=Max("last_movement_id"))["last"] or 0
+
+
+def _advance(after_id, up_to_id, product_ids=None):
+    """
+    Folds movements with after_id < id <= up_to_id into the snapshots.
+    Returns the ids of the products whose snapshot moved.
+    """
+    movements = _after_snapshot(StockMovement.objects.filter(id__gt=after_id, id__lte=up_to_id))
+    if product_ids is not None:
+        movements = movements.filter(product_id__in=product_ids)
+    totals = _totals(movements)
+    if not totals:
+        return []
+    current = dict(StockSnapshot.objects.filter(product_id__in=totals).values_list("product_id", "quantity"))
+    now = timezone.now()
+    StockSnapshot.objects.bulk_create(
+        [
+            StockSnapshot(product_id=pk, quantity=current.get(pk, ZERO) + total, last_movement_id=up_to_id, taken_at=now)
+            for pk, total in totals.items()
+        ],
+        batch_size=CHUNK_SIZE,
+        update_conflicts=True,
+        unique_fields=["product"],
+        update_fields=["quantity", "last_movement_id", "taken_at"],
+    )
+    return list(totals)
+
+
+def _set_quantities(quantities):
+    """Writes {product id: quantity} to Product.quantity, chunked."""
+    items = list(quantities.items())
+    now = timezone.now()
+    for start in range(0, len(items), CHUNK_SIZE):
+        chunk = dict(items[start:start + CHUNK_SIZE])
+        Product.objects.filter(pk__in=chunk).update(
+            quantity=Case(
+                *[When(pk=pk, then=Value(qty)) for pk, qty in chunk.items()],
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            ),
+            updated_at=now,
+        )
+    # Plain UPDATEs send no signal; see catalog/sku_cache.py.
+    sku_cache.evict_products(quantities)
+
+
+def compact(now=None):
+    """
+    Folds settled movements into the snapshots. With deferred quantities,
+    also brings Product.quantity of the products sold since the last run
+    up to date. Returns the number of snapshots moved. Run one compactor
+    at a time.
+    """
+    cutoff = (now or timezone.now()) - SETTLE
+    with transaction.atomic():
+        after_id = watermark()
+        up_to_id = (
+            StockMovement.objects.filter(id__gt=after_id, created_at__lt=cutoff).aggregate(last=Max("id"))["last"]
+        )
+        touched = _advance(after_id, up_to_id) if up_to_id else []
+        if deferred_quantity():
+            unsettled = StockMovement.objects.filter(id__gt=up_to_id or after_id).values_list("product_id", flat=True)
+            product_ids = set(touched) | set(unsettled)
+            if product_ids:
+                _set_quantities(on_hand(product_ids))
+    return len(touched)
+
+
+def rebuild(shop_id=None, adopt_product_quantity=False):
+    """
+    Recomputes snapshots from the whole ledger (up to the current
+    watermark, which it leaves where it is), then reconciles
+    Product.quantity with the ledger. By default the ledger wins and
+    Product.quantity is overwritten; with adopt_product_quantity the
+    product's quantity wins and the difference is recorded as an
+    ADJUSTMENT. Returns the number of products that disagreed.
+    """
+    products = Product.objects.all()
+    if shop_id is not None:
+        products = products.filter(shop_id=shop_id)
+    with transaction.atomic():
+        up_to_id = watermark()
+        product_ids = list(products.values_list("id", flat=True))
+        mismatched = {}
+        for start in range(0, len(product_ids), CHUNK_SIZE):
+            chunk = product_ids[start:start + CHUNK_SIZE]
+            StockSnapshot.objects.filter(product_id__in=chunk).delete()
+            if up_to_id:
+                _advance(0, up_to_id, chunk)
+            ledger = on_hand(chunk)
+            for pk, shop, quantity in Product.objects.filter(pk__in=chunk).values_list("id", "shop_id", "quantity"):
+                if quantity != ledger[pk]:
+                    mismatched[pk] = (shop, quantity, ledger[pk])
+
+        if adopt_product_quantity:
+            StockMovement.objects.bulk_create([
+                StockMovement(shop_id=shop, product_id=pk, kind="ADJUSTMENT", qty=quantity - ledger_qty, note="Reconciled")
+                for pk, (shop, quantity, ledger_qty) in mismatched.items()
+            ], batch_size=CHUNK_SIZE)
+        else:
+            _set_quantities({pk: ledger_qty for pk, (_, _, ledger_qty) in mismatched.items()})
+    return len(mismatched)
@@ -0,0 +1,98 @@
+# backend/catalog/sync.py
+"""
+Delta sync feed for products: GET /api/products/?updated_since=<cursor>.
+
+Clients keep a local copy of their shop's products. They start with
+updated_since=0 (everything) and then send back the cursor from each
+response to get only what changed since. A response covers the half-open
+window [since, until) of updated_at:
+
+  changed   products saved in the window; a deactivation arrives here with
+            is_active=false
+  deleted   ids of products deleted in the window (ProductTombstone)
+  cursor    `until`; send it as updated_since next time (opaque to clients)
+  has_more  the window was cut at PAGE_SIZE rows; ask again straight away
+
+`until` trails the clock by SETTLE: updated_at is stamped before the
+transaction commits, so a row still in flight is picked up by the next
+window instead of falling behind a cursor that has already passed it. The
+(shop, updated_at, id) index on Product serves the scan.
+
+Tombstones are kept for TOMBSTONE_RETENTION (prune_product_tombstones);
+an older cursor raises CursorExpired and the client starts over from 0.
+"""
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.utils import timezone
+
+from .models import Product, ProductTombstone
+
+PAGE_SIZE = 1000
+SETTLE = timedelta(seconds=5)
+TOMBSTONE_RETENTION = timedelta(days=30)
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+Delta = namedtuple("Delta", ["changed", "deleted", "cursor", "has_more"])
+
+
+class CursorExpired(Exception):
+    """The cursor predates the oldest tombstone still kept."""
+
+
+def encode_cursor(moment):
+    return str((moment - _EPOCH) // _MICROSECOND)
+
+
+def decode_cursor(value):
+    """Returns the cursor's datetime, or None for "0" (full sync). Raises ValueError."""
+    micros = int(value)
+    if micros < 0:
+        raise ValueError("negative cursor")
+    return _EPOCH + micros * _MICROSECOND if micros else None
+
+
+def changes(shop_id, since, now=None):
+    now = now or timezone.now()
+    until = now - SETTLE
+    if since is not None and since < now - TOMBSTONE_RETENTION:
+        raise CursorExpired()
+    if since is not None and since >= until:
+        return Delta([], [], encode_cursor(since), False)
+
+    products = Product.objects.filter(shop_id=shop_id, updated_at__lt=until)
+    if since is not None:
+        products = products.filter(updated_at__gte=since)
+    rows = list(products.order_by("updated_at", "id")[:PAGE_SIZE + 1])
+
+    has_more = len(rows) > PAGE_SIZE
+    if has_more:
+        # Cut the window before the first row that did not fit, so the
+        # next window starts exactly there.
+        until = rows[PAGE_SIZE].updated_at
+        rows = [row for row in rows if row.updated_at < until]
+        if not rows:
+            # More than a page shares one timestamp: take all of them.
+            rows = list(products.filter(updated_at=until).order_by("id"))
+            until += _MICROSECOND
+
+    deleted = []
+    if since is not None:
+        deleted = list(
+            ProductTombstone.objects.filter(shop_id=shop_id, deleted_at__gte=since, deleted_at__lt=until)
+            .values_list("product_id", flat=True)
+        )
+    return Delta(rows, deleted, encode_cursor(until), has_more)
+
+
+def record_tombstone(sender, instance, **kwargs):
+    """post_delete receiver (CatalogConfig.ready)."""
+    ProductTombstone.objects.create(shop_id=instance.shop_id, product_id=instance.pk, deleted_at=timezone.now())
+
+
+def prune_tombstones(now=None):
+    cutoff = (now or timezone.now()) - TOMBSTONE_RETENTION
+    deleted, _ = ProductTombstone.objects.filter(deleted_at__lt=cutoff).delete()
+    return deleted
@@ -1,3 +1,295 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from api.serializers import decrement_stock
+from shops.models import Shop
+from . import search, sku_cache, stock, sync
+from .models import Product, ProductTombstone, StockMovement, StockSnapshot
+
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        self.shop = Shop.objects.create(name="Test Kirana")
+        other = Shop.objects.create(name="Other Kirana")
+        self.user = User.objects.create_user(
+            email="owner@example.com", username="owner", password="pass12345",
+            role=User.Role.SHOP_OWNER, shop=self.shop,
+        )
+        self.basmati = Product.objects.create(shop=self.shop, name="Basmati Rice 5kg", sku="RICE-BAS-5", price=550)
+        self.sona = Product.objects.create(shop=self.shop, name="Sona Masoori Rice", sku="RICE-SON-1", price=70)
+        Product.objects.create(shop=self.shop, name="Rice Bran Oil", sku="OIL-RB-1", price=180, is_active=False)
+        Product.objects.create(shop=other, name="Basmati Rice 1kg", sku="RICE-BAS-1", price=120)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _search(self, q, **params):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get("/api/products/search/", {"q": q, **params})
+        self.assertEqual(resp.status_code, 200)
+        return [row["id"] for row in resp.data], len(ctx.captured_queries)
+
+    def test_prefix_search_is_scoped_to_the_shop_and_active_products(self):
+        ids, queries = self._search("ric")
+        self.assertEqual(set(ids), {self.basmati.id, self.sona.id})
+        self.assertEqual(queries, 2)  # index lookup + in_bulk
+        self.assertEqual(self._search("bas ri")[0], [self.basmati.id])
+        self.assertEqual(self._search("rice-son")[0], [self.sona.id])
+        self.assertEqual(self._search('"*) OR (')[0], [])
+
+    def test_fallback_matches_word_prefixes_not_substrings(self):
+        self.assertEqual(search._fallback_ids(self.shop.id, ["bas", "ri"], 10), [self.basmati.id])
+        self.assertEqual(search._fallback_ids(self.shop.id, ["ice"], 10), [])
+        self.assertEqual(search._fallback_ids(self.shop.id, ["rice"], 10), [self.basmati.id, self.sona.id])
+
+    def test_index_follows_renames_and_deletes(self):
+        self.sona.name = "Kolam Rice"
+        self.sona.save()
+        self.assertEqual(self._search("kolam")[0], [self.sona.id])
+        self.assertEqual(self._search("sona")[0], [])
+        self.sona.delete()
+        self.assertEqual(self._search("kolam")[0], [])
+
+    def test_results_are_capped(self):
+        Product.objects.bulk_create([
+            Product(shop=self.shop, name=f"Rice Pack {i}", price=10) for i in range(search.MAX_LIMIT + 5)
+        ])
+        self.assertEqual(len(self._search("rice", limit=1000)[0]), search.MAX_LIMIT)
+        self.assertEqual(len(self._search("rice")[0]), search.DEFAULT_LIMIT)
+
+
+class ProductSkuLookupTests(TestCase):
+    def setUp(self):
+        sku_cache.clear()
+        self.shop = Shop.objects.create(name="Test Kirana")
+        self.other = Shop.objects.create(name="Other Kirana")
+        self.user = User.objects.create_user(
+            email="owner@example.com", username="owner", password="pass12345",
+            role=User.Role.SHOP_OWNER, shop=self.shop,
+        )
+        self.product = Product.objects.create(shop=self.shop, name="Toor Dal 1kg", sku="8901234567890", price=160, quantity=10)
+        Product.objects.create(shop=self.other, name="Moong Dal 1kg", sku="8901234567891", price=140)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _scan(self, code):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(f"/api/products/by-sku/{code}/")
+        return resp, len(ctx.captured_queries)
+
+    def test_repeat_scans_are_served_from_the_cache(self):
+        resp, queries = self._scan("8901234567890")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data["id"], self.product.id)
+        self.assertEqual(queries, 1)
+        resp, queries = self._scan("8901234567890")
+        self.assertEqual(resp.data["id"], self.product.id)
+        self.assertEqual(queries, 0)
+
+    def test_other_shops_and_unknown_codes_are_not_found(self):
+        self.assertEqual(self._scan("8901234567891")[0].status_code, 404)
+        self.assertEqual(self._scan("0000")[0].status_code, 404)
+
+    def test_deactivated_products_are_not_found(self):
+        self._scan("8901234567890")
+        self.product.is_active = False
+        self.product.save()
+        self.assertEqual(self._scan("8901234567890")[0].status_code, 404)
+
+    def test_saving_a_product_invalidates_its_cached_scan(self):
+        self._scan("8901234567890")
+        self.product.price = 175
+        self.product.save()
+        resp, queries = self._scan("8901234567890")
+        self.assertEqual(queries, 1)
+        self.assertEqual(resp.data["price"], "175.00")
+
+    def test_sku_must_be_unique_within_a_shop_but_blank_may_repeat(self):
+        resp = self.client.post("/api/products/", {"name": "Copy", "sku": " 8901234567890 ", "price": "1"})
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn("sku", resp.data)
+        for name in ("Loose Sugar", "Loose Salt"):
+            self.assertEqual(self.client.post("/api/products/", {"name": name, "sku": "", "price": "1"}).status_code, 201)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Product.objects.create(shop=self.shop, name="Dup", sku="8901234567890", price=1)
+
+
+class ProductDeltaSyncTests(TestCase):
+    def setUp(self):
+        self.shop = Shop.objects.create(name="Test Kirana")
+        self.user = User.objects.create_user(
+            email="owner@example.com", username="owner", password="pass12345",
+            role=User.Role.SHOP_OWNER, shop=self.shop,
+        )
+        self.t0 = timezone.now() - timedelta(hours=1)
+        self.dal = self._product_at("Toor Dal", self.t0)
+        self.oil = self._product_at("Sunflower Oil", self.t0 + timedelta(minutes=1))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _product_at(self, name, moment, **fields):
+        product = Product.objects.create(shop=self.shop, name=name, price=100, **fields)
+        Product.objects.filter(pk=product.pk).update(updated_at=moment)
+        return product
+
+    def _feed(self, cursor):
+        resp = self.client.get("/api/products/", {"updated_since": cursor})
+        self.assertEqual(resp.status_code, 200)
+        return resp.data
+
+    def test_full_sync_then_only_changes_and_tombstones(self):
+        with mock.patch.object(sync.timezone, "now", return_value=self.t0 + timedelta(minutes=10)):
+            first = self._feed("0")
+        self.assertEqual([row["id"] for row in first["changed"]], [self.dal.id, self.oil.id])
+        self.assertEqual(first["deleted"], [])
+        self.assertFalse(first["has_more"])
+
+        self.assertEqual(self._feed(first["cursor"])["changed"], [])
+        later = self.t0 + timedelta(minutes=20)
+        Product.objects.filter(pk=self.oil.pk).update(is_active=False, updated_at=later)
+        dal_id = self.dal.id
+        self.dal.delete()
+        ProductTombstone.objects.filter(product_id=dal_id).update(deleted_at=later)
+
+        second = self._feed(first["cursor"])
+        self.assertEqual([(row["id"], row["is_active"]) for row in second["changed"]], [(self.oil.id, False)])
+        self.assertEqual(second["deleted"], [dal_id])
+
+    def test_recent_writes_wait_for_the_next_window(self):
+        fresh = Product.objects.create(shop=self.shop, name="Fresh Paneer", price=90)
+        self.assertNotIn(fresh.id, [row["id"] for row in self._feed("0")["changed"]])
+
+    def test_large_windows_are_paged_without_gaps(self):
+        with mock.patch.object(sync, "PAGE_SIZE", 1):
+            first = self._feed("0")
+            self.assertTrue(first["has_more"])
+            second = self._feed(first["cursor"])
+        self.assertEqual([row["id"] for row in first["changed"] + second["changed"]], [self.dal.id, self.oil.id])
+
+    def test_bad_and_expired_cursors(self):
+        self.assertEqual(self.client.get("/api/products/", {"updated_since": "yesterday"}).status_code, 400)
+        stale = sync.encode_cursor(timezone.now() - sync.TOMBSTONE_RETENTION - timedelta(days=1))
+        self.assertEqual(self.client.get("/api/products/", {"updated_since": stale}).status_code, 410)
+
+
+class ProductListConditionalGetTests(TestCase):
+    def setUp(self):
+        self.shop = Shop.objects.create(name="Test Kirana")
+        self.user = User.objects.create_user(
+            email="owner@example.com", username="owner", password="pass12345",
+            role=User.Role.SHOP_OWNER, shop=self.shop,
+        )
+        self.dal = Product.objects.create(shop=self.shop, name="Toor Dal", price=160)
+        self.oil = Product.objects.create(shop=self.shop, name="Sunflower Oil", price=180)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _get(self, **headers):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get("/api/products/", headers=headers)
+        return resp, len(ctx.captured_queries)
+
+    def test_unchanged_list_is_304_from_one_query(self):
+        first, _ = self._get()
+        self.assertEqual(first.status_code, 200)
+        resp, queries = self._get(if_none_match=first["ETag"])
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(queries, 1)
+
+    def test_saves_sales_and_deletes_change_the_etag(self):
+        etag = self._get()[0]["ETag"]
+        self.oil.price = 190
+        self.oil.save()
+        resp, _ = self._get(if_none_match=etag)
+        self.assertEqual(resp.status_code, 200)
+
+        etag = resp["ETag"]
+        decrement_stock({self.dal.pk: 1})
+        resp, _ = self._get(if_none_match=etag)
+        self.assertEqual(resp.status_code, 200)
+
+        etag = resp["ETag"]
+        self.dal.delete()
+        self.assertEqual(self._get(if_none_match=etag)[0].status_code, 200)
+
+    def test_if_modified_since_alone_never_hides_a_delete(self):
+        # The dal is not the latest change, so deleting it leaves
+        # max(updated_at) where it was.
+        Product.objects.filter(pk=self.dal.pk).update(updated_at=self.oil.updated_at - timedelta(days=1))
+        since = http_date(self.oil.updated_at.timestamp() + 1)
+        self.dal.delete()
+
+        resp, _ = self._get(if_modified_since=since)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual([row["id"] for row in resp.data], [self.oil.id])
+
+
+class StockLedgerTests(TestCase):
+    def setUp(self):
+        self.shop = Shop.objects.create(name="Test Kirana")
+        self.user = User.objects.create_user(
+            email="owner@example.com", username="owner", password="pass12345",
+            role=User.Role.SHOP_OWNER, shop=self.shop,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        resp = self.client.post("/api/products/", {"name": "Toor Dal", "price": "160", "quantity": "50"})
+        self.dal = Product.objects.get(pk=resp.data["id"])
+
+    def _sell(self, qty):
+        resp = self.client.post("/api/invoices/", {
+            "customer_name": "Walk-in",
+            "items": [{"product": self.dal.id, "qty": qty, "unit_price": "160.00", "tax_rate": "0"}],
+        }, format="json")
+        self.assertEqual(resp.status_code, 201, resp.content)
+
+    def _ledger(self):
+        return stock.on_hand([self.dal.id])[self.dal.id]
+
+    def test_sales_and_edits_are_recorded_and_compacted(self):
+        self._sell(3)
+        self._sell(2)
+        self.client.patch(f"/api/products/{self.dal.id}/", {"quantity": "60"})
+        self.assertEqual(
+            list(StockMovement.objects.filter(product=self.dal).values_list("kind", "qty")),
+            [("ADJUSTMENT", Decimal("50")), ("SALE", Decimal("-3")), ("SALE", Decimal("-2")), ("ADJUSTMENT", Decimal("15"))],
+        )
+        self.assertEqual(self._ledger(), Decimal("60"))
+
+        self.assertEqual(stock.compact(), 0)  # nothing has settled yet
+        self.assertEqual(stock.compact(now=timezone.now() + stock.SETTLE * 2), 1)
+        snapshot = StockSnapshot.objects.get(product=self.dal)
+        self.assertEqual(snapshot.quantity, Decimal("60"))
+        self._sell(1)
+        self.assertEqual(self._ledger(), Decimal("59"))
+        self.dal.refresh_from_db()
+        self.assertEqual(self.dal.quantity, Decimal("59"))
+
+    def test_rebuild_reconciles_product_quantity(self):
+        self._sell(5)
+        Product.objects.filter(pk=self.dal.pk).update(quantity=1)
+        self.assertEqual(stock.rebuild(), 1)
+        self.dal.refresh_from_db()
+        self.assertEqual(self.dal.quantity, Decimal("45"))
+
+        Product.objects.filter(pk=self.dal.pk).update(quantity=40)
+        self.assertEqual(stock.rebuild(adopt_product_quantity=True), 1)
+        self.assertEqual(self._ledger(), Decimal("40"))
+        self.assertEqual(stock.rebuild(), 0)
+
+    @override_settings(STOCK_DEFERRED_QUANTITY=True)
+    def test_deferred_quantity_is_updated_by_compaction(self):
+        self._sell(4)
+        self.dal.refresh_from_db()
+        self.assertEqual(self.dal.quantity, Decimal("50"))
+        stock.compact()
+        self.dal.refresh_from_db()
+        self.assertEqual(self.dal.quantity, Decimal("46"))
@@ -2,6 +2,7 @@
 from pathlib import Path
 from datetime import timedelta
 import environ
+from corsheaders.defaults import default_headers
 
 # =======================================
 # Environment Setup
@@ -96,6 +97,29 @@ DATABASES = {
     }
 }
 
+# =======================================
+# Cache
+# =======================================
+# Per-process memory by default; point CACHE_URL at Redis/Memcached
+# (e.g. redis://127.0.0.1:6379/1) so every worker sees the same entries.
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+# Seconds a user's subscription entitlements are cached for the middleware.
+ENTITLEMENT_CACHE_TTL = env.int('ENTITLEMENT_CACHE_TTL', default=300)
+# max-age (seconds) for /api/subscription-plans/; clients revalidate by ETag.
+PLAN_CATALOG_MAX_AGE = env.int('PLAN_CATALOG_MAX_AGE', default=3600)
+# Seconds before a worker reloads the plan catalog even without a new version
+# stamp (bounds staleness when CACHE_URL is not a shared cache).
+PLAN_CATALOG_RECHECK = env.int('PLAN_CATALOG_RECHECK', default=60)
+# Per-worker cache of scanned SKUs (catalog/sku_cache.py): entries per shop,
+# and seconds before an entry is re-read (bounds stock staleness across workers).
+SKU_CACHE_SIZE = env.int('SKU_CACHE_SIZE', default=500)
+SKU_CACHE_TTL = env.int('SKU_CACHE_TTL', default=60)
+# When true, billing only appends stock movements and `compact_stock_movements`
+# updates Product.quantity (see catalog/stock.py).
+STOCK_DEFERRED_QUANTITY = env.bool('STOCK_DEFERRED_QUANTITY', default=False)
+
 # =======================================
 # Authentication
 # =======================================
@@ -110,7 +134,7 @@ AUTHENTICATION_BACKENDS = [
 # =======================================
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "api.authentication.ClaimsJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticated",
@@ -133,6 +157,12 @@ SIMPLE_JWT = {
     "BLACKLIST_AFTER_ROTATION": False,
     "AUTH_HEADER_TYPES": ("Bearer",),
 }
+
+# Opt-in: access tokens carry role, shop and plan entitlements so API
+# requests authenticate without DB reads. Such tokens use the short
+# lifetime below instead of ACCESS_TOKEN_LIFETIME to bound staleness.
+JWT_ENTITLEMENT_CLAIMS = env.bool('JWT_ENTITLEMENT_CLAIMS', default=False)
+JWT_CLAIMS_ACCESS_LIFETIME = timedelta(minutes=env.int('JWT_CLAIMS_ACCESS_MINUTES', default=15))
 # ---------------------------------
 
 # =======================================
@@ -140,16 +170,48 @@ SIMPLE_JWT = {
 # =======================================
 RAZORPAY_KEY_ID = env('RAZORPAY_KEY_ID', default='')
 RAZORPAY_KEY_SECRET = env('RAZORPAY_KEY_SECRET', default='')
+# Secret set on the webhook in the Razorpay dashboard.
+RAZORPAY_WEBHOOK_SECRET = env('RAZORPAY_WEBHOOK_SECRET', default=RAZORPAY_KEY_SECRET)
+# Overridable so reconcile_payments can run against a stub server.
+RAZORPAY_API_BASE = env('RAZORPAY_API_BASE', default='https://api.razorpay.com/v1')
+# Gateway client (api/gateway.py): timeouts in seconds, keep-alive pool size,
+# and the circuit breaker (consecutive failures to open, seconds until retry).
+RAZORPAY_CONNECT_TIMEOUT = env.float('RAZORPAY_CONNECT_TIMEOUT', default=3.0)
+RAZORPAY_READ_TIMEOUT = env.float('RAZORPAY_READ_TIMEOUT', default=10.0)
+RAZORPAY_POOL_SIZE = env.int('RAZORPAY_POOL_SIZE', default=10)
+RAZORPAY_BREAKER_THRESHOLD = env.int('RAZORPAY_BREAKER_THRESHOLD', default=5)
+RAZORPAY_BREAKER_RESET = env.int('RAZORPAY_BREAKER_RESET', default=30)
+
+# =======================================
+# Billing
+# =======================================
+# Invoice numbers each worker reserves at a time (see sales/sequences.py).
+# 1 = gap-free numbering at the cost of one sequence write per bill.
+INVOICE_NUMBER_BLOCK_SIZE = env.int('INVOICE_NUMBER_BLOCK_SIZE', default=20)
+# Largest offline queue accepted by POST /api/invoices/batch/.
+INVOICE_BATCH_MAX_SIZE = env.int('INVOICE_BATCH_MAX_SIZE', default=500)
+# Seconds a shop's /api/reports/dashboard/ summary is cached.
+DASHBOARD_CACHE_TTL = env.int('DASHBOARD_CACHE_TTL', default=30)
+# Seconds a closed month's GST summary is cached (reports/gst.py).
+GST_MONTH_CACHE_TTL = env.int('GST_MONTH_CACHE_TTL', default=3600)
+# How long a POST /api/invoices/ Idempotency-Key is remembered.
+IDEMPOTENCY_KEY_TTL = timedelta(hours=env.int('IDEMPOTENCY_KEY_TTL_HOURS', default=24))
+# A claimed key with no stored response after this long is taken over by the
+# next retry (the original request died mid-bill).
+IDEMPOTENCY_CLAIM_TIMEOUT = timedelta(seconds=env.int('IDEMPOTENCY_CLAIM_TIMEOUT_SECONDS', default=120))
 
 # =======================================
 # CORS & CSRF
 # =======================================
+# Also used to build links in emails (password reset).
+FRONTEND_URL = env('FRONTEND_URL', default='http://localhost:5173')
 CORS_ALLOW_CREDENTIALS = True
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
 CORS_ALLOWED_ORIGINS = [
-    env('FRONTEND_URL', default='http://localhost:5173'),
+    FRONTEND_URL,
 ]
 CSRF_TRUSTED_ORIGINS = [
-    env('FRONTEND_URL', default='http://localhost:5173'),
+    FRONTEND_URL,
     'http://127.0.0.1:5173',
 ]
 
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.6 on 2026-10-17 02:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0001_initial'),
+        ('shops', '0003_shop_whatsapp_number'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['shop', 'updated_at'], name='customer_shop_updated_idx'),
+        ),
+    ]
@@ -6,6 +6,14 @@ class Customer(models.Model):
     mobile = models.CharField(max_length=20, db_index=True)
     email = models.EmailField(blank=True)
     address = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Conditional GET validators on /api/customers/ (count, max updated_at).
+            models.Index(fields=['shop', 'updated_at'], name='customer_shop_updated_idx'),
+        ]
+
     def __str__(self):
         return f"{self.name} ({self.mobile})"
 
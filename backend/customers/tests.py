@@ -1,3 +1,28 @@
 from django.test import TestCase
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from accounts.models import User
+from shops.models import Shop
+from .models import Customer
+
+
+class CustomerListConditionalGetTests(TestCase):
+    def setUp(self):
+        self.shop = Shop.objects.create(name="Test Kirana")
+        self.user = User.objects.create_user(
+            email="owner@example.com", username="owner", password="pass12345",
+            role=User.Role.SHOP_OWNER, shop=self.shop,
+        )
+        self.customer = Customer.objects.create(shop=self.shop, name="Asha", mobile="9800000001")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_list_revalidates_by_etag(self):
+        first = self.client.get("/api/customers/")
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(self.client.get("/api/customers/", headers={"if_none_match": first["ETag"]}).status_code, 304)
+
+        Customer.objects.create(shop=self.shop, name="Ravi", mobile="9800000002")
+        resp = self.client.get("/api/customers/", headers={"if_none_match": first["ETag"]})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.data), 2)
@@ -1,3 +1,9 @@
 from django.contrib import admin
+from .models import DailySales
 
-# Register your models here.
+
+@admin.register(DailySales)
+class DailySalesAdmin(admin.ModelAdmin):
+    list_display = ('shop', 'date', 'payment_mode', 'invoice_count', 'grand_total')
+    list_filter = ('payment_mode', 'date')
+    raw_id_fields = ('shop',)
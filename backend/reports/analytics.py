@@ -0,0 +1,83 @@
+# backend/reports/analytics.py
+"""
+Product-level sales analysis, read from the DailyProductSales rollup so the
+cost depends on the number of products and days, not on the number of
+invoice lines ever written.
+"""
+from datetime import timedelta
+
+from django.db.models import Case, DecimalField, ExpressionWrapper, F, FloatField, Q, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce
+
+from catalog.models import Product
+from .models import DailyProductSales
+
+ZERO = Value(0, output_field=DecimalField(max_digits=14, decimal_places=2))
+
+
+def _sold_in(start, end):
+    """Sum of the product's rollup rows between two dates (inclusive)."""
+    window = Q(daily_sales__date__gte=start, daily_sales__date__lte=end)
+    return {
+        "qty_sold": Coalesce(Sum('daily_sales__qty', filter=window), ZERO),
+        "revenue": Coalesce(Sum('daily_sales__revenue', filter=window), ZERO),
+    }
+
+
+def top_sellers(shop_id, start, end, limit=10, order_by='qty'):
+    """Best selling products in the window, by quantity or revenue."""
+    key = 'revenue' if order_by == 'revenue' else 'qty_sold'
+    return list(
+        DailyProductSales.objects
+        .filter(shop_id=shop_id, date__gte=start, date__lte=end)
+        .values('product_id', name=F('product__name'))
+        .annotate(qty_sold=Sum('qty'), revenue=Sum('revenue'))
+        .order_by(f'-{key}', 'product_id')[:limit]
+    )
+
+
+def slow_movers(shop_id, start, end, limit=10):
+    """Active products that sold least in the window, including those that sold nothing."""
+    return list(
+        Product.objects
+        .filter(shop_id=shop_id, is_active=True)
+        .annotate(**_sold_in(start, end))
+        .values('id', 'name', 'quantity', 'qty_sold', 'revenue')
+        .order_by('qty_sold', 'name')[:limit]
+    )
+
+
+def stock_cover(shop_id, end, days=30, limit=50):
+    """
+    Days of stock left per active product: Product.quantity divided by the
+    average daily quantity sold over the `days` days ending at `end`.
+    Products that did not sell in that window have no estimate (None) and
+    are listed last.
+    """
+    start = end - timedelta(days=days - 1)
+    # Float division: the estimate needs no cents, and SQLite would
+    # otherwise truncate integer-valued decimals.
+    sold = Cast('qty_sold', FloatField())
+    rows = (
+        Product.objects
+        .filter(shop_id=shop_id, is_active=True)
+        .annotate(**_sold_in(start, end))
+        .annotate(velocity=ExpressionWrapper(sold / Value(float(days)), output_field=FloatField()))
+        .annotate(days_remaining=Case(
+            When(qty_sold__gt=0, then=Cast('quantity', FloatField()) * Value(float(days)) / sold),
+            default=None,
+            output_field=FloatField(),
+        ))
+        .values('id', 'name', 'quantity', 'qty_sold', 'velocity', 'days_remaining')
+        .order_by(F('days_remaining').asc(nulls_last=True), 'name')[:limit]
+    )
+    return list(rows)
+
+
+def product_daily(shop_id, product_id, start, end):
+    """Daily qty and revenue series for one product."""
+    return list(
+        DailyProductSales.objects
+        .filter(shop_id=shop_id, product_id=product_id, date__gte=start, date__lte=end)
+        .values('date', 'qty', 'revenue')
+    )
@@ -0,0 +1,106 @@
+# backend/reports/gst.py
+"""
+GST slab summary: taxable value and tax per tax rate over a date range,
+computed with one grouped query over InvoiceItem. Cancelled invoices are
+excluded. Tax is split evenly into CGST and SGST (intra-state supply).
+
+A closed month's result is cached for GST_MONTH_CACHE_TTL seconds. It only
+changes if an invoice from that month is later cancelled or deleted, which
+calls `forget_month`: that moves the month's version stamp (part of the
+cache key) now and again once the transaction commits, so a report computed
+from the old rows meanwhile is stored under a key nobody reads. With the
+default per-process cache other workers only see the new stamp once their
+entry expires, so set CACHE_URL when running several workers.
+"""
+import uuid
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+from django.utils import timezone
+
+CENT = Decimal("0.01")
+
+
+def _money(value):
+    return Decimal(value or 0).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def month_bounds(year, month):
+    start = date(year, month, 1)
+    end = (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    return start, end
+
+
+def summarize(shop_id, start, end):
+    """GST slabs for invoices dated between `start` and `end` (inclusive, local dates)."""
+    from sales.models import InvoiceItem
+
+    lower = timezone.make_aware(datetime.combine(start, time.min))
+    upper = timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min))
+    taxable = ExpressionWrapper(F('qty') * F('unit_price'), output_field=DecimalField(max_digits=14, decimal_places=2))
+    rows = (
+        InvoiceItem.objects
+        .filter(invoice__shop_id=shop_id, invoice__invoice_date__gte=lower, invoice__invoice_date__lt=upper)
+        .exclude(invoice__status='CANCELLED')
+        .values('tax_rate')
+        .annotate(taxable_value=Sum(taxable), total=Sum('line_total'), line_count=Count('id'))
+        .order_by('tax_rate')
+    )
+
+    slabs = []
+    totals = dict.fromkeys(('taxable_value', 'tax_amount', 'cgst', 'sgst', 'total'), Decimal("0.00"))
+    for row in rows:
+        taxable_value = _money(row['taxable_value'])
+        total = _money(row['total'])
+        tax_amount = total - taxable_value
+        cgst = _money(tax_amount / 2)
+        slab = {
+            "tax_rate": row['tax_rate'],
+            "taxable_value": taxable_value,
+            "tax_amount": tax_amount,
+            "cgst": cgst,
+            "sgst": tax_amount - cgst,
+            "total": total,
+            "line_count": row['line_count'],
+        }
+        slabs.append(slab)
+        for key in totals:
+            totals[key] += slab[key]
+    return {"from": start, "to": end, "slabs": slabs, "totals": totals}
+
+
+def _version_key(shop_id, year, month):
+    return f"reports:gst-version:{shop_id}:{year:04d}-{month:02d}"
+
+
+def _month_key(shop_id, year, month):
+    version_key = _version_key(shop_id, year, month)
+    version = cache.get(version_key)
+    if version is None:
+        cache.add(version_key, uuid.uuid4().hex, None)
+        version = cache.get(version_key)
+    return f"reports:gst:{shop_id}:{year:04d}-{month:02d}:{version}"
+
+
+def summarize_month(shop_id, year, month):
+    """Like `summarize` for a calendar month; closed months are served from cache."""
+    start, end = month_bounds(year, month)
+    if end >= timezone.localdate():
+        return summarize(shop_id, start, end)
+
+    key = _month_key(shop_id, year, month)
+    data = cache.get(key)
+    if data is None:
+        data = summarize(shop_id, start, end)
+        cache.set(key, data, getattr(settings, "GST_MONTH_CACHE_TTL", 3600))
+    return data
+
+
+def forget_month(shop_id, day):
+    version_key = _version_key(shop_id, day.year, day.month)
+    cache.set(version_key, uuid.uuid4().hex, None)
+    transaction.on_commit(lambda: cache.set(version_key, uuid.uuid4().hex, None))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from reports.rollups import rebuild
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the DailySales and DailyProductSales rollups from the invoices."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--shop", type=int, help="Only rebuild this shop id.")
+
+    def handle(self, *args, **options):
+        rows, product_rows = rebuild(shop_id=options.get("shop"))
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt DailySales: {rows} rows, DailyProductSales: {product_rows} rows."
+        ))
@@ -0,0 +1,57 @@
+# Generated by Django 5.0.6 on 2026-10-17 02:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def backfill_daily_sales(apps, schema_editor):
+    # Same grouping as reports.rollups.rebuild, on the historical models.
+    Invoice = apps.get_model('sales', 'Invoice')
+    DailySales = apps.get_model('reports', 'DailySales')
+    totals = ('subtotal', 'tax_total', 'discount_total', 'grand_total')
+    grouped = (
+        Invoice.objects.exclude(status='CANCELLED')
+        .annotate(date=TruncDate('invoice_date', tzinfo=timezone.get_current_timezone()))
+        .values('shop_id', 'date', 'payment_mode')
+        .annotate(invoice_count=Count('id'), **{field: Sum(field) for field in totals})
+        .order_by()
+    )
+    DailySales.objects.bulk_create([DailySales(**row) for row in grouped], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('shops', '0003_shop_whatsapp_number'),
+        ('sales', '0010_invoice_shop_date_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('payment_mode', models.CharField(default='cash', max_length=20)),
+                ('invoice_count', models.IntegerField(default=0)),
+                ('subtotal', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('tax_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('discount_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('grand_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('shop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='shops.shop')),
+            ],
+            options={
+                'ordering': ['date'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailysales',
+            constraint=models.UniqueConstraint(fields=('shop', 'date', 'payment_mode'), name='unique_daily_sales'),
+        ),
+        migrations.RunPython(backfill_daily_sales, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.0.6 on 2026-10-17 02:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def backfill_daily_product_sales(apps, schema_editor):
+    # Same grouping as reports.rollups.rebuild, on the historical models.
+    InvoiceItem = apps.get_model('sales', 'InvoiceItem')
+    DailyProductSales = apps.get_model('reports', 'DailyProductSales')
+    grouped = (
+        InvoiceItem.objects.exclude(invoice__status='CANCELLED')
+        .annotate(
+            date=TruncDate('invoice__invoice_date', tzinfo=timezone.get_current_timezone()),
+            shop_id=F('invoice__shop_id'),
+        )
+        .values('shop_id', 'product_id', 'date')
+        .annotate(qty_sold=Sum('qty'), revenue=Sum('line_total'))
+        .order_by()
+    )
+    DailyProductSales.objects.bulk_create([
+        DailyProductSales(
+            shop_id=row['shop_id'], product_id=row['product_id'], date=row['date'],
+            qty=row['qty_sold'], revenue=row['revenue'],
+        )
+        for row in grouped
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0001_initial'),
+        ('reports', '0001_initial'),
+        ('shops', '0003_shop_whatsapp_number'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyProductSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('qty', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='catalog.product')),
+                ('shop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_product_sales', to='shops.shop')),
+            ],
+            options={
+                'ordering': ['date'],
+                'indexes': [models.Index(fields=['shop', 'date'], name='daily_product_sales_shop_date')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailyproductsales',
+            constraint=models.UniqueConstraint(fields=('product', 'date'), name='unique_daily_product_sales'),
+        ),
+        migrations.RunPython(backfill_daily_product_sales, migrations.RunPython.noop),
+    ]
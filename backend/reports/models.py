@@ -1,3 +1,54 @@
 from django.db import models
 
-# Create your models here.
+
+class DailySales(models.Model):
+    """
+    Per-shop, per-day, per-payment-mode sales totals, maintained in the same
+    transaction as the invoice writes (see reports/rollups.py). Range reports
+    read these rows instead of scanning Invoice. Cancelled invoices are not
+    counted. Rebuild with `python manage.py rebuild_daily_sales`.
+    """
+    shop = models.ForeignKey('shops.Shop', on_delete=models.CASCADE, related_name='daily_sales')
+    date = models.DateField()
+    payment_mode = models.CharField(max_length=20, default='cash')
+
+    invoice_count = models.IntegerField(default=0)
+    subtotal = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    tax_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    discount_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    grand_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['date']
+        constraints = [
+            models.UniqueConstraint(fields=['shop', 'date', 'payment_mode'], name='unique_daily_sales'),
+        ]
+
+    def __str__(self):
+        return f"{self.shop_id} {self.date} {self.payment_mode}: ₹{self.grand_total}"
+
+
+class DailyProductSales(models.Model):
+    """
+    Quantity and revenue sold per product per day, maintained alongside
+    DailySales from the invoice lines. Backs the top-seller, slow-mover
+    and days-of-stock reports (reports/analytics.py).
+    """
+    shop = models.ForeignKey('shops.Shop', on_delete=models.CASCADE, related_name='daily_product_sales')
+    product = models.ForeignKey('catalog.Product', on_delete=models.CASCADE, related_name='daily_sales')
+    date = models.DateField()
+
+    qty = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['date']
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'date'], name='unique_daily_product_sales'),
+        ]
+        indexes = [
+            models.Index(fields=['shop', 'date'], name='daily_product_sales_shop_date'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} {self.date}: {self.qty}"
@@ -0,0 +1,194 @@
+# backend/reports/rollups.py
+"""
+Incremental maintenance of the DailySales and DailyProductSales rollups.
+
+Every code path that creates, cancels, restores or deletes invoices calls
+`add_invoices` / `remove_invoices` / `status_changed` inside its own
+transaction, so the rollups commit or roll back together with the invoices.
+DailySales costs one UPDATE per (shop, day, payment mode) touched, usually
+exactly one; DailyProductSales costs a fixed three statements per
+(shop, day) however many products the lines cover.
+"""
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, Count, F, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailyProductSales, DailySales
+
+TOTAL_FIELDS = ('subtotal', 'tax_total', 'discount_total', 'grand_total')
+
+
+def _group(invoices, sign):
+    groups = {}
+    for invoice in invoices:
+        key = (invoice.shop_id, timezone.localdate(invoice.invoice_date), invoice.payment_mode)
+        totals = groups.setdefault(key, dict.fromkeys(('invoice_count',) + TOTAL_FIELDS, 0))
+        totals['invoice_count'] += sign
+        for field in TOTAL_FIELDS:
+            totals[field] += sign * (getattr(invoice, field) or 0)
+    return groups
+
+
+def _apply(groups):
+    for (shop_id, date, payment_mode), totals in groups.items():
+        lookup = dict(shop_id=shop_id, date=date, payment_mode=payment_mode)
+        increments = {field: F(field) + value for field, value in totals.items()}
+        if DailySales.objects.filter(**lookup).update(**increments):
+            continue
+        try:
+            with transaction.atomic():
+                DailySales.objects.create(**lookup, **totals)
+        except IntegrityError:
+            # Another transaction created the row first.
+            DailySales.objects.filter(**lookup).update(**increments)
+
+
+def _group_lines(invoices, lines, sign):
+    by_id = {invoice.pk: invoice for invoice in invoices}
+    groups = {}  # (shop_id, date) -> {product_id: [qty, revenue]}
+    for line in lines:
+        invoice = by_id[line.invoice_id]
+        products = groups.setdefault((invoice.shop_id, timezone.localdate(invoice.invoice_date)), {})
+        totals = products.setdefault(line.product_id, [0, 0])
+        totals[0] += sign * line.qty
+        totals[1] += sign * line.line_total
+    return groups
+
+
+def _case(products, index):
+    return Case(
+        *[When(product_id=pk, then=Value(totals[index])) for pk, totals in products.items()],
+        output_field=models.DecimalField(max_digits=14, decimal_places=2),
+    )
+
+
+def _apply_lines(groups):
+    for (shop_id, date), products in groups.items():
+        rows = DailyProductSales.objects.filter(date=date, product_id__in=products.keys())
+        existing = set(rows.values_list('product_id', flat=True))
+        if existing:
+            rows.filter(product_id__in=existing).update(
+                qty=F('qty') + _case(products, 0),
+                revenue=F('revenue') + _case(products, 1),
+            )
+        missing = {pk: totals for pk, totals in products.items() if pk not in existing}
+        if not missing:
+            continue
+        try:
+            with transaction.atomic():
+                DailyProductSales.objects.bulk_create([
+                    DailyProductSales(shop_id=shop_id, product_id=pk, date=date, qty=qty, revenue=revenue)
+                    for pk, (qty, revenue) in missing.items()
+                ])
+        except IntegrityError:
+            # A concurrent bill created some of the rows first; fall back to
+            # applying the remainder row by row.
+            for pk, (qty, revenue) in missing.items():
+                lookup = dict(shop_id=shop_id, product_id=pk, date=date)
+                if not DailyProductSales.objects.filter(**lookup).update(qty=F('qty') + qty, revenue=F('revenue') + revenue):
+                    DailyProductSales.objects.create(**lookup, qty=qty, revenue=revenue)
+
+
+def _lines_for(invoices, lines):
+    if lines is not None:
+        return lines
+    from sales.models import InvoiceItem
+    return InvoiceItem.objects.filter(invoice__in=[invoice.pk for invoice in invoices]).only(
+        'invoice_id', 'product_id', 'qty', 'line_total'
+    )
+
+
+def add_invoices(invoices, lines=None):
+    """
+    Counts newly written invoices into the rollups. Pass the invoices'
+    `lines` when the caller already holds them to save a query.
+    """
+    invoices = [i for i in invoices if i.status != 'CANCELLED']
+    if not invoices:
+        return
+    _apply(_group(invoices, 1))
+    _apply_lines(_group_lines(invoices, _lines_for(invoices, lines), 1))
+
+
+def _forget_gst_months(invoices):
+    # A cancel or delete can reach back into a closed, cached GST month.
+    from . import gst
+    for shop_id, day in {(i.shop_id, timezone.localdate(i.invoice_date)) for i in invoices}:
+        gst.forget_month(shop_id, day)
+
+
+def remove_invoices(invoices):
+    """Takes invoices that are about to be deleted back out of the rollups."""
+    invoices = [i for i in invoices if i.status != 'CANCELLED']
+    if not invoices:
+        return
+    _apply(_group(invoices, -1))
+    _apply_lines(_group_lines(invoices, _lines_for(invoices, None), -1))
+    _forget_gst_months(invoices)
+
+
+def status_changed(invoice, old_status):
+    """Applies a cancel (or un-cancel) of an already counted invoice."""
+    was_counted = old_status != 'CANCELLED'
+    is_counted = invoice.status != 'CANCELLED'
+    if was_counted != is_counted:
+        sign = 1 if is_counted else -1
+        _apply(_group([invoice], sign))
+        _apply_lines(_group_lines([invoice], _lines_for([invoice], None), sign))
+        _forget_gst_months([invoice])
+
+
+def rebuild(shop_id=None):
+    """
+    Recomputes both rollups from Invoice / InvoiceItem with one grouped
+    query each. Returns the number of (DailySales, DailyProductSales) rows.
+    """
+    from sales.models import Invoice, InvoiceItem
+
+    tz = timezone.get_current_timezone()
+    invoices = Invoice.objects.exclude(status='CANCELLED')
+    items = InvoiceItem.objects.exclude(invoice__status='CANCELLED')
+    rows = DailySales.objects.all()
+    product_rows = DailyProductSales.objects.all()
+    if shop_id is not None:
+        invoices = invoices.filter(shop_id=shop_id)
+        items = items.filter(invoice__shop_id=shop_id)
+        rows = rows.filter(shop_id=shop_id)
+        product_rows = product_rows.filter(shop_id=shop_id)
+
+    grouped = (
+        invoices
+        .annotate(date=TruncDate('invoice_date', tzinfo=tz))
+        .values('shop_id', 'date', 'payment_mode')
+        .annotate(
+            invoice_count=Count('id'),
+            **{field: Sum(field) for field in TOTAL_FIELDS},
+        )
+        .order_by()
+    )
+    grouped_lines = (
+        items
+        .annotate(date=TruncDate('invoice__invoice_date', tzinfo=tz), shop_id=F('invoice__shop_id'))
+        .values('shop_id', 'product_id', 'date')
+        .annotate(qty_sold=Sum('qty'), revenue=Sum('line_total'))
+        .order_by()
+    )
+    with transaction.atomic():
+        rows.delete()
+        product_rows.delete()
+        created = DailySales.objects.bulk_create(
+            [DailySales(**row) for row in grouped.iterator()],
+            batch_size=1000,
+        )
+        created_lines = DailyProductSales.objects.bulk_create(
+            [
+                DailyProductSales(
+                    shop_id=row['shop_id'], product_id=row['product_id'], date=row['date'],
+                    qty=row['qty_sold'], revenue=row['revenue'],
+                )
+                for row in grouped_lines.iterator()
+            ],
+            batch_size=1000,
+        )
+    return len(created), len(created_lines)
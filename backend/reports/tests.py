@@ -1,3 +1,215 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from catalog.models import Product
+from sales.models import Invoice
+from shops.models import Shop
+from . import gst
+from .models import DailyProductSales, DailySales
+from .rollups import rebuild
+
+
+class DashboardSummaryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.shop = Shop.objects.create(name="Test Kirana")
+        self.user = User.objects.create_user(
+            email="owner@example.com", username="owner", password="pass12345",
+            role=User.Role.SHOP_OWNER, shop=self.shop,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _invoice(self, number, total, days_ago=0, status="PAID"):
+        invoice = Invoice.objects.create(shop=self.shop, number=number, grand_total=total, status=status)
+        Invoice.objects.filter(pk=invoice.pk).update(invoice_date=timezone.now() - timedelta(days=days_ago))
+
+    def test_dashboard_aggregates_in_sql_and_is_cached(self):
+        self._invoice("a", 100)
+        self._invoice("b", 50, days_ago=400)
+        self._invoice("c", 999, status="CANCELLED")
+        Product.objects.create(shop=self.shop, name="Rice", price=10, quantity=3)
+        Product.objects.create(shop=self.shop, name="Dal", price=20, quantity=0)
+        Product.objects.create(shop=self.shop, name="Oil", price=5, quantity=50, low_stock_threshold=60)
+        Product.objects.create(shop=self.shop, name="Salt", price=1, quantity=40)
+
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get("/api/reports/dashboard/")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(ctx.captured_queries), 2)  # invoices, products
+        self.assertEqual(resp.data["total_sales"], Decimal("150"))
+        self.assertEqual(resp.data["total_invoices"], 2)
+        self.assertEqual(resp.data["today_sales"], Decimal("100"))
+        self.assertEqual(resp.data["today_invoices"], 1)
+        self.assertEqual(resp.data["total_products"], 4)
+        self.assertEqual(resp.data["low_stock"], 2)
+        self.assertEqual(resp.data["out_of_stock"], 1)
+        self.assertEqual(resp.data["inventory_value"], Decimal("320"))
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get("/api/reports/dashboard/")
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+
+class DailySalesRollupTests(TestCase):
+    def setUp(self):
+        self.shop = Shop.objects.create(name="Test Kirana")
+        self.user = User.objects.create_user(
+            email="owner@example.com", username="owner", password="pass12345",
+            role=User.Role.SHOP_OWNER, shop=self.shop,
+        )
+        self.product = Product.objects.create(shop=self.shop, name="Rice", price=10, quantity=100)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _bill(self, qty):
+        payload = {"items": [{"product": self.product.id, "qty": qty, "unit_price": "10.00", "tax_rate": "0"}]}
+        resp = self.client.post("/api/invoices/", payload, format="json")
+        self.assertEqual(resp.status_code, 201, resp.content)
+        return resp.data["id"]
+
+    def _rows(self):
+        return list(DailySales.objects.values_list("date", "payment_mode", "invoice_count", "grand_total"))
+
+    def test_rollup_follows_create_cancel_and_delete(self):
+        first, second, third = self._bill(1), self._bill(2), self._bill(3)
+        self.client.post("/api/invoices/batch/", [{"items": [
+            {"product": self.product.id, "qty": 4, "unit_price": "10.00"}
+        ]}], format="json")
+        self.assertEqual(self._rows(), [(timezone.localdate(), "cash", 4, Decimal("100.00"))])
+
+        self.assertEqual(self.client.patch(f"/api/invoices/{second}/", {"status": "CANCELLED"}, format="json").status_code, 200)
+        self.assertEqual(self.client.delete(f"/api/invoices/{third}/").status_code, 204)
+        self.assertEqual(self._rows(), [(timezone.localdate(), "cash", 2, Decimal("50.00"))])
+
+        # Cancelled invoices are already out of the rollup; deleting one changes nothing.
+        self.client.delete(f"/api/invoices/{second}/")
+        incremental = self._rows()
+        rebuild()
+        self.assertEqual(self._rows(), incremental)
+
+        summary = self.client.get("/api/reports/sales_summary/", {"from": timezone.localdate().isoformat()})
+        self.assertEqual(summary.data["total_sales"], Decimal("50.00"))
+        self.assertEqual(summary.data["total_invoices"], 2)
+        self.assertEqual(summary.data["by_payment_mode"]["cash"]["total_invoices"], 2)
+
+
+class ProductAnalyticsTests(TestCase):
+    def setUp(self):
+        self.shop = Shop.objects.create(name="Test Kirana")
+        self.user = User.objects.create_user(
+            email="owner@example.com", username="owner", password="pass12345",
+            role=User.Role.SHOP_OWNER, shop=self.shop,
+        )
+        self.rice = Product.objects.create(shop=self.shop, name="Rice", price=10, quantity=100)
+        self.dal = Product.objects.create(shop=self.shop, name="Dal", price=50, quantity=10)
+        self.salt = Product.objects.create(shop=self.shop, name="Salt", price=1, quantity=40)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _bill(self, *lines):
+        items = [{"product": p.id, "qty": qty, "unit_price": str(p.price), "tax_rate": "0"} for p, qty in lines]
+        resp = self.client.post("/api/invoices/", {"items": items}, format="json")
+        self.assertEqual(resp.status_code, 201, resp.content)
+        return resp.data["id"]
+
+    def test_rollup_drives_top_sellers_slow_movers_and_stock_cover(self):
+        self._bill((self.rice, 10), (self.dal, 1))
+        self._bill((self.rice, 20), (self.dal, 2))
+        cancelled = self._bill((self.salt, 5))
+        self.client.patch(f"/api/invoices/{cancelled}/", {"status": "CANCELLED"}, format="json")
+
+        rows = {r.product_id: (r.qty, r.revenue) for r in DailyProductSales.objects.all()}
+        self.assertEqual(rows[self.rice.id], (Decimal("30.00"), Decimal("300.00")))
+        self.assertEqual(rows[self.salt.id], (Decimal("0.00"), Decimal("0.00")))
+
+        top = self.client.get("/api/reports/top_sellers/").data["results"]
+        self.assertEqual([r["name"] for r in top[:2]], ["Rice", "Dal"])
+        by_revenue = self.client.get("/api/reports/top_sellers/", {"order": "revenue"}).data["results"]
+        self.assertEqual(by_revenue[0]["name"], "Rice")
+
+        slow = self.client.get("/api/reports/slow_movers/", {"limit": 1}).data["results"]
+        self.assertEqual(slow[0]["name"], "Salt")
+
+        cover = {r["name"]: r for r in self.client.get("/api/reports/stock_cover/", {"days": 10}).data["results"]}
+        # Rice: 70 left, sold 30 over 10 days -> 3/day -> ~23 days.
+        self.assertAlmostEqual(float(cover["Rice"]["days_remaining"]), 70 / 3, places=1)
+        self.assertIsNone(cover["Salt"]["days_remaining"])
+
+        series = self.client.get("/api/reports/product_sales/", {"product": self.rice.id}).data["results"]
+        self.assertEqual([(r["date"], r["qty"]) for r in series], [(timezone.localdate(), Decimal("30.00"))])
+        for bad in ({}, {"product": "0"}, {"product": "-3"}, {"product": "rice"}):
+            self.assertEqual(self.client.get("/api/reports/product_sales/", bad).status_code, 400)
+
+        incremental = sorted(DailyProductSales.objects.values_list("product_id", "qty", "revenue"))
+        rebuild()
+        rebuilt = sorted(DailyProductSales.objects.values_list("product_id", "qty", "revenue"))
+        self.assertEqual([r for r in incremental if r[1]], rebuilt)
+
+
+class GSTReportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.shop = Shop.objects.create(name="Test Kirana")
+        self.user = User.objects.create_user(
+            email="owner@example.com", username="owner", password="pass12345",
+            role=User.Role.SHOP_OWNER, shop=self.shop,
+        )
+        self.product = Product.objects.create(shop=self.shop, name="Rice", price=100, quantity=100)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _bill(self, *rates):
+        items = [{"product": self.product.id, "qty": 2, "unit_price": "100.00", "tax_rate": rate} for rate in rates]
+        resp = self.client.post("/api/invoices/", {"items": items}, format="json")
+        self.assertEqual(resp.status_code, 201, resp.content)
+        return resp.data["id"]
+
+    def test_groups_lines_by_slab_and_splits_cgst_sgst(self):
+        self._bill("5", "18")
+        self._bill("5")
+        cancelled = self._bill("12")
+        self.client.patch(f"/api/invoices/{cancelled}/", {"status": "CANCELLED"}, format="json")
+
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get("/api/reports/gst/")
+        self.assertEqual(len(ctx.captured_queries), 1)
+        slabs = {slab["tax_rate"]: slab for slab in resp.data["slabs"]}
+        self.assertEqual(sorted(slabs), [Decimal("5"), Decimal("18")])
+        self.assertEqual(slabs[Decimal("5")]["taxable_value"], Decimal("400.00"))
+        self.assertEqual(slabs[Decimal("5")]["tax_amount"], Decimal("20.00"))
+        self.assertEqual((slabs[Decimal("5")]["cgst"], slabs[Decimal("5")]["sgst"]), (Decimal("10.00"), Decimal("10.00")))
+        self.assertEqual(resp.data["totals"]["tax_amount"], Decimal("56.00"))
+
+    def test_closed_month_is_cached_until_an_invoice_in_it_changes(self):
+        invoice_id = self._bill("5")
+        last_month = timezone.localdate().replace(day=1) - timedelta(days=1)
+        Invoice.objects.filter(pk=invoice_id).update(
+            invoice_date=timezone.now().replace(year=last_month.year, month=last_month.month, day=15)
+        )
+        month = last_month.strftime("%Y-%m")
+
+        first = self.client.get("/api/reports/gst/", {"month": month})
+        self.assertEqual(first.data["totals"]["taxable_value"], Decimal("200.00"))
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get("/api/reports/gst/", {"month": month})
+        self.assertEqual(len(ctx.captured_queries), 0)
 
-# Create your tests here.
+        # A report computed from the old rows while the cancel is in flight
+        # lands under the old stamp, which the commit retires.
+        stale_key = gst._month_key(self.shop.id, last_month.year, last_month.month)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f"/api/invoices/{invoice_id}/", {"status": "CANCELLED"}, format="json")
+            cache.set(gst._month_key(self.shop.id, last_month.year, last_month.month), first.data)
+        self.assertNotEqual(gst._month_key(self.shop.id, last_month.year, last_month.month), stale_key)
+        after = self.client.get("/api/reports/gst/", {"month": month})
+        self.assertEqual(after.data["slabs"], [])
+        self.assertEqual(self.client.get("/api/reports/gst/", {"month": "2026-13"}).status_code, 400)
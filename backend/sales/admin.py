@@ -1,6 +1,6 @@
 # backend/sales/admin.py
 from django.contrib import admin
-from .models import Invoice, InvoiceItem
+from .models import Invoice, InvoiceItem, InvoiceSequence
 
 class InvoiceItemInline(admin.TabularInline):
     model = InvoiceItem
@@ -15,4 +15,9 @@ class InvoiceAdmin(admin.ModelAdmin):
     search_fields = ('number', 'customer_name', 'customer_mobile', 'shop__name')
     raw_id_fields = ('shop', 'customer', 'created_by')
     inlines = [InvoiceItemInline]
-    readonly_fields = ('created_at', 'updated_at')
\ No newline at end of file
+    readonly_fields = ('created_at', 'updated_at')
+
+@admin.register(InvoiceSequence)
+class InvoiceSequenceAdmin(admin.ModelAdmin):
+    list_display = ('shop', 'last_value', 'updated_at')
+    raw_id_fields = ('shop',)
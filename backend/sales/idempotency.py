@@ -0,0 +1,131 @@
+# backend/sales/idempotency.py
+"""
+Idempotency-Key support for invoice creation.
+
+A key is claimed (inserted) before the invoice is written and the response
+is stored against it in the invoice's own transaction, so a retry costs
+one lookup on the (shop, key) unique index and never reaches the
+serializer. A claim still without a response after CLAIM_TIMEOUT belongs
+to a request that died (worker killed mid-bill) before its invoice
+committed; the next retry takes it over instead of getting 409 until the
+key expires. Should the original request still commit after that, storing
+its response finds the claim gone and rolls its invoice back.
+"""
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import IdempotencyKey
+
+DEFAULT_TTL = timedelta(hours=24)
+DEFAULT_CLAIM_TIMEOUT = timedelta(minutes=2)
+MAX_KEY_LENGTH = 64
+
+
+class KeyConflict(Exception):
+    """Another request stored one of the keys first."""
+
+
+def get_ttl():
+    return getattr(settings, "IDEMPOTENCY_KEY_TTL", DEFAULT_TTL)
+
+
+def get_claim_timeout():
+    return getattr(settings, "IDEMPOTENCY_CLAIM_TIMEOUT", DEFAULT_CLAIM_TIMEOUT)
+
+
+def _is_dead(record, now):
+    """Expired, or claimed by a request that never stored a response."""
+    if record.expires_at <= now:
+        return True
+    return record.response_status is None and record.created_at <= now - get_claim_timeout()
+
+
+def fingerprint(data):
+    payload = json.dumps(data, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def claim(shop, key, request_fingerprint):
+    """
+    Returns (record, created). `created` is True when this request owns the
+    key and must run; otherwise `record` belongs to an earlier request.
+    """
+    record = IdempotencyKey.objects.filter(shop=shop, key=key).first()
+    if record is not None and _is_dead(record, timezone.now()):
+        record.delete()
+        record = None
+    if record is not None:
+        return record, False
+
+    try:
+        with transaction.atomic():
+            record = IdempotencyKey.objects.create(
+                shop=shop,
+                key=key,
+                fingerprint=request_fingerprint,
+                expires_at=timezone.now() + get_ttl(),
+            )
+        return record, True
+    except IntegrityError:
+        # Lost the race against a concurrent retry carrying the same key.
+        return IdempotencyKey.objects.get(shop=shop, key=key), False
+
+
+def store(record, status_code, body):
+    """Raises DatabaseError when the claim was taken over meanwhile."""
+    record.response_status = status_code
+    record.response_body = body
+    record.save(update_fields=["response_status", "response_body"])
+
+
+def release(record):
+    """Forgets a claimed key so the client may retry once the error is fixed."""
+    record.delete()
+
+
+def lookup_many(shop, keys):
+    """
+    Batch variant of `claim` for the offline sync endpoint: returns
+    {key: record} for the keys that are still live, dropping dead ones.
+    """
+    if not keys:
+        return {}
+    now = timezone.now()
+    IdempotencyKey.objects.filter(shop=shop, key__in=keys).filter(
+        Q(expires_at__lte=now) | Q(response_status__isnull=True, created_at__lte=now - get_claim_timeout())
+    ).delete()
+    return {record.key: record for record in IdempotencyKey.objects.filter(shop=shop, key__in=keys)}
+
+
+def remember_many(shop, responses):
+    """
+    Stores {key: (status_code, body, fingerprint)} in one insert. Raises
+    KeyConflict when a concurrent request stored one of the keys first.
+    """
+    expires_at = timezone.now() + get_ttl()
+    try:
+        with transaction.atomic():
+            IdempotencyKey.objects.bulk_create([
+                IdempotencyKey(
+                    shop=shop,
+                    key=key,
+                    fingerprint=request_fingerprint,
+                    response_status=status_code,
+                    response_body=body,
+                    expires_at=expires_at,
+                )
+                for key, (status_code, body, request_fingerprint) in responses.items()
+            ])
+    except IntegrityError as exc:
+        raise KeyConflict() from exc
+
+
+def purge_expired(now=None):
+    deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=now or timezone.now()).delete()
+    return deleted
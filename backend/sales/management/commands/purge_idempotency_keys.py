@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from sales.idempotency import purge_expired
+
+
+class Command(BaseCommand):
+    help = "Deletes expired invoice Idempotency-Key records."
+
+    def handle(self, *args, **options):
+        deleted = purge_expired()
+        self.stdout.write(self.style.SUCCESS(f"Purged {deleted} expired idempotency keys."))
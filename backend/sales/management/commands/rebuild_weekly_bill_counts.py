@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from sales.quotas import rebuild
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the per-shop weekly bill counters used for the max_bills_per_week quota."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--shop", type=int, help="Only rebuild this shop id.")
+
+    def handle(self, *args, **options):
+        rows = rebuild(shop_id=options.get("shop"))
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt WeeklyBillCount: {rows} rows."))
@@ -0,0 +1,35 @@
+# Generated by Django 5.0.6 on 2026-10-17 01:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def seed_sequences(apps, schema_editor):
+    # Continue every shop's numbering from the legacy Shop.counter_invoice.
+    Shop = apps.get_model('shops', 'Shop')
+    InvoiceSequence = apps.get_model('sales', 'InvoiceSequence')
+    InvoiceSequence.objects.bulk_create([
+        InvoiceSequence(shop_id=shop_id, last_value=counter)
+        for shop_id, counter in Shop.objects.values_list('id', 'counter_invoice')
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0007_invoice_status'),
+        ('shops', '0003_shop_whatsapp_number'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InvoiceSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_value', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('shop', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='invoice_sequence', to='shops.shop')),
+            ],
+        ),
+        migrations.RunPython(seed_sequences, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.0.6 on 2026-10-17 01:58
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0001_initial'),
+        ('sales', '0009_idempotencykey'),
+        ('shops', '0003_shop_whatsapp_number'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['shop', 'invoice_date', 'id'], name='invoice_shop_date_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.0.6 on 2026-10-17 02:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncWeek
+from django.utils import timezone
+
+
+def backfill_weekly_bill_counts(apps, schema_editor):
+    Invoice = apps.get_model('sales', 'Invoice')
+    WeeklyBillCount = apps.get_model('sales', 'WeeklyBillCount')
+    grouped = (
+        Invoice.objects
+        .annotate(week=TruncWeek('invoice_date', output_field=models.DateField(), tzinfo=timezone.get_current_timezone()))
+        .values('shop_id', 'week')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    WeeklyBillCount.objects.bulk_create([WeeklyBillCount(**row) for row in grouped], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0010_invoice_shop_date_idx'),
+        ('shops', '0003_shop_whatsapp_number'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WeeklyBillCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('week', models.DateField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('shop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='weekly_bill_counts', to='shops.shop')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='weeklybillcount',
+            constraint=models.UniqueConstraint(fields=('shop', 'week'), name='unique_weekly_bill_count'),
+        ),
+        migrations.RunPython(backfill_weekly_bill_counts, migrations.RunPython.noop),
+    ]
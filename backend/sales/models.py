@@ -1,3 +1,4 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.utils import timezone
 
@@ -30,6 +31,12 @@ class Invoice(models.Model):
     created_by = models.ForeignKey("accounts.User", on_delete=models.SET_NULL, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Backs the shop's invoice list: date-range filters and cursor pagination.
+            models.Index(fields=["shop", "invoice_date", "id"], name="invoice_shop_date_idx"),
+        ]
     
     def __str__(self):
         return f"{self.number} - {self.customer_name or 'Unknown'}"
@@ -48,3 +55,66 @@ class InvoiceItem(models.Model):
     
     def __str__(self):
         return f"{self.product.name} x {self.qty}"
+
+
+class InvoiceSequence(models.Model):
+    """
+    Per-shop invoice number counter, kept off the Shop row so billing does
+    not lock the shop. Workers reserve numbers from it in blocks, see
+    sales/sequences.py for the allocation and gap policy.
+    """
+    shop = models.OneToOneField("shops.Shop", on_delete=models.CASCADE, related_name="invoice_sequence")
+    # Highest number handed out so far (to any worker).
+    last_value = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"InvoiceSequence({self.shop_id}): {self.last_value}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Remembers the response to a POST /api/invoices/ sent with an
+    `Idempotency-Key` header, so a till retrying after a timeout gets the
+    original invoice back instead of a second bill. Rows expire after
+    settings.IDEMPOTENCY_KEY_TTL and are purged by `purge_idempotency_keys`.
+    """
+    shop = models.ForeignKey("shops.Shop", on_delete=models.CASCADE, related_name="idempotency_keys")
+    key = models.CharField(max_length=64)
+    # sha256 of the request payload; a reused key with a different body is rejected.
+    fingerprint = models.CharField(max_length=64)
+    # Null while the original request is still being processed.
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["shop", "key"], name="unique_idempotency_key_per_shop"),
+        ]
+
+    def is_expired(self):
+        return self.expires_at <= timezone.now()
+
+    def __str__(self):
+        return f"{self.shop_id}:{self.key}"
+
+
+class WeeklyBillCount(models.Model):
+    """
+    Bills issued per shop per ISO week (`week` is the Monday), kept so the
+    plan's `max_bills_per_week` can be checked with a single-row read. See
+    sales/quotas.py.
+    """
+    shop = models.ForeignKey("shops.Shop", on_delete=models.CASCADE, related_name="weekly_bill_counts")
+    week = models.DateField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["shop", "week"], name="unique_weekly_bill_count"),
+        ]
+
+    def __str__(self):
+        return f"{self.shop_id} week of {self.week}: {self.count}"
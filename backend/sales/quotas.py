@@ -0,0 +1,103 @@
+# backend/sales/quotas.py
+"""
+Weekly bill quota (the plan feature `max_bills_per_week`).
+
+WeeklyBillCount holds one counter per shop per ISO week. `add_bills` /
+`remove_bills` run inside the invoice transactions and bump it with an F()
+increment, so checking the quota is one single-row read instead of a COUNT
+over the week's invoices. `rebuild` recomputes the counters from Invoice.
+
+Every issued bill counts, cancelled ones included; deleting an invoice
+gives its slot back. The check runs before any invoice is written, so
+requests racing past it together can overshoot the limit by at most their
+own number.
+"""
+from datetime import timedelta
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncWeek
+from django.utils import timezone
+from rest_framework.exceptions import PermissionDenied
+
+from .models import Invoice, WeeklyBillCount
+
+FEATURE = "max_bills_per_week"
+
+
+class BillQuotaExceeded(PermissionDenied):
+    default_detail = "Weekly bill limit for your plan has been reached."
+    default_code = "bill_quota_exceeded"
+
+
+def week_of(day):
+    """Monday of the ISO week containing `day`."""
+    return day - timedelta(days=day.weekday())
+
+
+def bills_this_week(shop_id, day=None):
+    week = week_of(day or timezone.localdate())
+    return WeeklyBillCount.objects.filter(shop_id=shop_id, week=week).values_list("count", flat=True).first() or 0
+
+
+def remaining(shop_id, limit, day=None):
+    """Bills the shop may still issue this week; None when unlimited."""
+    if limit is None:
+        return None
+    return max(limit - bills_this_week(shop_id, day), 0)
+
+
+def check(shop_id, limit, count=1):
+    """Raises BillQuotaExceeded if `count` more bills would pass `limit`."""
+    left = remaining(shop_id, limit)
+    if left is not None and count > left:
+        raise BillQuotaExceeded(f"Your plan allows {limit} bills per week; this week's limit has been reached.")
+
+
+def _apply(invoices, sign):
+    groups = {}
+    for invoice in invoices:
+        key = (invoice.shop_id, week_of(timezone.localdate(invoice.invoice_date)))
+        groups[key] = groups.get(key, 0) + sign
+    for (shop_id, week), delta in groups.items():
+        lookup = dict(shop_id=shop_id, week=week)
+        if WeeklyBillCount.objects.filter(**lookup).update(count=F("count") + delta) or delta < 0:
+            continue
+        try:
+            with transaction.atomic():
+                WeeklyBillCount.objects.create(**lookup, count=delta)
+        except IntegrityError:
+            # Another transaction created the row first.
+            WeeklyBillCount.objects.filter(**lookup).update(count=F("count") + delta)
+
+
+def add_bills(invoices):
+    _apply(invoices, 1)
+
+
+def remove_bills(invoices):
+    _apply(invoices, -1)
+
+
+def rebuild(shop_id=None):
+    """Recomputes the counters from Invoice. Returns the number of rows."""
+    invoices = Invoice.objects.all()
+    rows = WeeklyBillCount.objects.all()
+    if shop_id is not None:
+        invoices = invoices.filter(shop_id=shop_id)
+        rows = rows.filter(shop_id=shop_id)
+
+    grouped = (
+        invoices
+        .annotate(week=TruncWeek("invoice_date", output_field=models.DateField(), tzinfo=timezone.get_current_timezone()))
+        .values("shop_id", "week")
+        .annotate(count=Count("id"))
+        .order_by()
+    )
+    with transaction.atomic():
+        rows.delete()
+        created = WeeklyBillCount.objects.bulk_create(
+            [WeeklyBillCount(**row) for row in grouped.iterator()],
+            batch_size=1000,
+        )
+    return len(created)
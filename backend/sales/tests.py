@@ -1,3 +1,338 @@
-from django.test import TestCase
+import json
+from datetime import datetime, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from django.core.cache import cache
+
+from accounts.models import User
+from api.models import SubscriptionPlan, UserSubscription
+from catalog.models import Product
+from shops.models import Shop
+from . import idempotency, quotas
+from .models import IdempotencyKey, Invoice, InvoiceItem, InvoiceSequence, WeeklyBillCount
+from .sequences import allocate_invoice_numbers, next_invoice_number, reset_blocks
+
+
+class InvoiceCreateTests(TestCase):
+    def setUp(self):
+        self.shop = Shop.objects.create(name="Test Kirana")
+        self.user = User.objects.create_user(
+            email="owner@example.com", username="owner", password="pass12345",
+            role=User.Role.SHOP_OWNER, shop=self.shop,
+        )
+        self.products = [
+            Product.objects.create(shop=self.shop, name=f"Item {i}", price=10, quantity=100)
+            for i in range(40)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _payload(self, products, qty=2):
+        return {
+            "customer_name": "Walk-in",
+            "items": [
+                {"product": p.id, "qty": qty, "unit_price": "10.00", "tax_rate": "5.00"}
+                for p in products
+            ],
+        }
+
+    def _post(self, payload):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.post("/api/invoices/", payload, format="json")
+        self.assertEqual(resp.status_code, 201, resp.content)
+        return resp, len(ctx.captured_queries)
+
+    def test_creates_lines_totals_and_decrements_stock(self):
+        payload = self._payload(self.products[:3])
+        # The same product twice on one bill is decremented once, by the sum.
+        payload["items"].append({"product": self.products[0].id, "qty": 1, "unit_price": "10.00", "tax_rate": "5.00"})
+        resp, _ = self._post(payload)
+
+        invoice = Invoice.objects.get(pk=resp.data["id"])
+        self.assertEqual(invoice.number, f"{self.shop.id}-1")
+        self.assertEqual(invoice.items.count(), 4)
+        self.assertEqual(invoice.subtotal, Decimal("70.00"))
+        self.assertEqual(invoice.tax_total, Decimal("3.50"))
+        self.assertEqual(invoice.grand_total, Decimal("73.50"))
+
+        self.products[0].refresh_from_db()
+        self.products[1].refresh_from_db()
+        self.assertEqual(self.products[0].quantity, Decimal("97"))
+        self.assertEqual(self.products[1].quantity, Decimal("98"))
+
+    def test_query_count_does_not_grow_with_line_count(self):
+        # Warm up: creates the shop's sequence row and today's rollup rows.
+        self._post(self._payload(self.products))
+        _, small = self._post(self._payload(self.products[:1]))
+        _, large = self._post(self._payload(self.products))
+        self.assertEqual(small, large)
+        self.assertEqual(InvoiceItem.objects.count(), 81)
+
+    def test_idempotency_key_replays_the_first_response(self):
+        payload = self._payload(self.products[:2])
+        first = self.client.post("/api/invoices/", payload, format="json", HTTP_IDEMPOTENCY_KEY="till-1-bill-9")
+        with CaptureQueriesContext(connection) as ctx:
+            retry = self.client.post("/api/invoices/", payload, format="json", HTTP_IDEMPOTENCY_KEY="till-1-bill-9")
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(retry.json()["number"], first.data["number"])
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(Invoice.objects.count(), 1)
+        self.products[0].refresh_from_db()
+        self.assertEqual(self.products[0].quantity, Decimal("98"))
+
+    def test_idempotency_key_reused_with_other_body_is_rejected(self):
+        self.client.post("/api/invoices/", self._payload(self.products[:1]), format="json", HTTP_IDEMPOTENCY_KEY="k")
+        resp = self.client.post("/api/invoices/", self._payload(self.products[:2]), format="json", HTTP_IDEMPOTENCY_KEY="k")
+        self.assertEqual(resp.status_code, 422)
+        self.assertEqual(Invoice.objects.count(), 1)
+
+    def test_failed_request_releases_its_idempotency_key(self):
+        bad = {"items": [{"product": 999999, "qty": 1, "unit_price": "1.00"}]}
+        resp = self.client.post("/api/invoices/", bad, format="json", HTTP_IDEMPOTENCY_KEY="k")
+        self.assertEqual(resp.status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_abandoned_claim_is_taken_over_by_the_next_retry(self):
+        payload = self._payload(self.products[:1])
+        record, _ = idempotency.claim(self.shop, "k", idempotency.fingerprint(payload))
+        resp = self.client.post("/api/invoices/", payload, format="json", HTTP_IDEMPOTENCY_KEY="k")
+        self.assertEqual(resp.status_code, 409)
+
+        IdempotencyKey.objects.filter(pk=record.pk).update(
+            created_at=timezone.now() - idempotency.get_claim_timeout() - timedelta(seconds=1)
+        )
+        resp = self.client.post("/api/invoices/", payload, format="json", HTTP_IDEMPOTENCY_KEY="k")
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(Invoice.objects.count(), 1)
+
+    def test_crash_before_storing_the_response_leaves_no_invoice(self):
+        payload = self._payload(self.products[:1])
+        # KeyboardInterrupt stands in for the worker dying: no release runs.
+        with mock.patch.object(idempotency, "store", side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                self.client.post("/api/invoices/", payload, format="json", HTTP_IDEMPOTENCY_KEY="k")
+        self.assertFalse(Invoice.objects.exists())
+
+        IdempotencyKey.objects.filter(key="k").update(
+            created_at=timezone.now() - idempotency.get_claim_timeout() - timedelta(seconds=1)
+        )
+        resp = self.client.post("/api/invoices/", payload, format="json", HTTP_IDEMPOTENCY_KEY="k")
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(Invoice.objects.count(), 1)
+        self.products[0].refresh_from_db()
+        self.assertEqual(self.products[0].quantity, Decimal("98"))
+
+    def test_request_whose_claim_was_taken_over_rolls_back(self):
+        payload = self._payload(self.products[:1])
+        real_store = idempotency.store
+
+        def taken_over(record, *args):
+            IdempotencyKey.objects.filter(pk=record.pk).delete()
+            real_store(record, *args)
+
+        with mock.patch.object(idempotency, "store", side_effect=taken_over):
+            with self.assertRaises(DatabaseError):
+                self.client.post("/api/invoices/", payload, format="json", HTTP_IDEMPOTENCY_KEY="k")
+        self.assertFalse(Invoice.objects.exists())
+        self.products[0].refresh_from_db()
+        self.assertEqual(self.products[0].quantity, Decimal("100"))
+
+    def test_batch_sync_reports_partial_failures(self):
+        good = self._payload(self.products[:2])
+        keyed = {**self._payload(self.products[2:3]), "customer_mobile": "9876543210", "idempotency_key": "offline-7"}
+        bad = {"items": [{"product": 999999, "qty": 1, "unit_price": "1.00"}]}
+        resp = self.client.post("/api/invoices/batch/", [good, bad, keyed], format="json")
+
+        self.assertEqual(resp.status_code, 207)
+        self.assertEqual((resp.data["created"], resp.data["failed"]), (2, 1))
+        self.assertEqual([r["status"] for r in resp.data["results"]], ["created", "error", "created"])
+        self.assertEqual(Invoice.objects.count(), 2)
+        self.assertEqual(Invoice.objects.get(pk=resp.data["results"][2]["id"]).customer.mobile, "9876543210")
+        self.products[2].refresh_from_db()
+        self.assertEqual(self.products[2].quantity, Decimal("98"))
+
+        # Re-sending the queue does not bill the keyed invoice twice.
+        again = self.client.post("/api/invoices/batch/", [keyed], format="json")
+        self.assertEqual(again.status_code, 201)
+        self.assertEqual(again.data["results"][0]["status"], "replayed")
+        self.assertEqual(again.data["results"][0]["number"], resp.data["results"][2]["number"])
+        self.assertEqual(Invoice.objects.count(), 2)
+
+    def test_batch_rejects_idempotency_keys_that_are_not_strings(self):
+        entries = [
+            {**self._payload(self.products[:1]), "idempotency_key": ["a"]},
+            {**self._payload(self.products[1:2]), "idempotency_key": {"k": 1}},
+            {**self._payload(self.products[2:3]), "idempotency_key": "offline-8"},
+        ]
+        resp = self.client.post("/api/invoices/batch/", entries, format="json")
+
+        self.assertEqual(resp.status_code, 207)
+        self.assertEqual([r["status"] for r in resp.data["results"]], ["error", "error", "created"])
+        self.assertEqual(Invoice.objects.count(), 1)
+
+    def test_batch_conflict_only_for_idempotency_keys(self):
+        keyed = {**self._payload(self.products[:1]), "idempotency_key": "offline-9"}
+        with mock.patch.object(idempotency, "lookup_many", return_value={}):
+            IdempotencyKey.objects.create(
+                shop=self.shop, key="offline-9", fingerprint="x", expires_at=timezone.now() + timedelta(hours=1)
+            )
+            resp = self.client.post("/api/invoices/batch/", [keyed], format="json")
+        self.assertEqual(resp.status_code, 409)
+        self.assertEqual(Invoice.objects.count(), 0)
+
+        with mock.patch("api.views.create_invoices_in_bulk", side_effect=IntegrityError("invoice number")):
+            with self.assertRaises(IntegrityError):
+                self.client.post("/api/invoices/batch/", [self._payload(self.products[:1])], format="json")
+
+    def test_batch_query_count_does_not_grow_with_batch_size(self):
+        def sync(count):
+            body = [self._payload(self.products[i:i + 3]) for i in range(count)]
+            with CaptureQueriesContext(connection) as ctx:
+                resp = self.client.post("/api/invoices/batch/", body, format="json")
+            self.assertEqual(resp.status_code, 201, resp.content)
+            return len(ctx.captured_queries)
+
+        sync(30)  # creates the shop's sequence row and today's rollup rows
+        self.assertEqual(sync(2), sync(30))
+        self.assertEqual(Invoice.objects.count(), 62)
+
+    def test_batch_accepts_ndjson(self):
+        body = "\n".join(json.dumps(self._payload(self.products[i:i + 1])) for i in range(3))
+        resp = self.client.post("/api/invoices/batch/", body, content_type="application/x-ndjson")
+        self.assertEqual(resp.status_code, 201, resp.content)
+        self.assertEqual(resp.data["created"], 3)
+
+    def test_listing_query_count_is_independent_of_invoice_count(self):
+        def list_queries():
+            with CaptureQueriesContext(connection) as ctx:
+                resp = self.client.get("/api/invoices/")
+            self.assertEqual(resp.status_code, 200)
+            return len(resp.data["results"]), len(ctx.captured_queries)
+
+        self._post({**self._payload(self.products[:3]), "customer_mobile": "9000000001"})
+        count_small, small = list_queries()
+        for i in range(10):
+            self._post({**self._payload(self.products[i:i + 4]), "customer_mobile": f"90000000{i + 10}"})
+        count_large, large = list_queries()
+
+        self.assertEqual((count_small, count_large), (1, 11))
+        self.assertEqual(small, large)
+
+    def test_list_is_cursor_paginated_and_filtered_server_side(self):
+        for i in range(5):
+            self._post({**self._payload(self.products[i:i + 1]), "customer_mobile": "9000000001" if i == 4 else ""})
+        ids = list(Invoice.objects.order_by("id").values_list("id", flat=True))
+        for day, pk in zip([1, 2, 3, 4, 5], ids):
+            Invoice.objects.filter(pk=pk).update(
+                invoice_date=timezone.make_aware(datetime(2026, 3, day, 12, 0))
+            )
+
+        first = self.client.get("/api/invoices/", {"page_size": 2})
+        self.assertEqual([r["id"] for r in first.data["results"]], [ids[4], ids[3]])
+        second = self.client.get(first.data["next"])
+        self.assertEqual([r["id"] for r in second.data["results"]], [ids[2], ids[1]])
+
+        ranged = self.client.get("/api/invoices/", {"from": "2026-03-02", "to": "2026-03-04"})
+        self.assertEqual([r["id"] for r in ranged.data["results"]], [ids[3], ids[2], ids[1]])
+
+        by_mobile = self.client.get("/api/invoices/", {"customer_mobile": "9000000001", "status": "paid"})
+        self.assertEqual([r["id"] for r in by_mobile.data["results"]], [ids[4]])
+
+        self.assertEqual(self.client.get("/api/invoices/", {"from": "yesterday"}).status_code, 400)
+
+
+class WeeklyBillQuotaTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.shop = Shop.objects.create(name="Test Kirana")
+        self.user = User.objects.create_user(
+            email="owner@example.com", username="owner", password="pass12345",
+            role=User.Role.SHOP_OWNER, shop=self.shop,
+        )
+        plan = SubscriptionPlan.objects.create(plan_type="FREE", duration_days=7, features={"max_bills_per_week": 3})
+        subscription, _ = UserSubscription.objects.get_or_create(user=self.user)
+        subscription.activate_plan(plan)
+        self.product = Product.objects.create(shop=self.shop, name="Rice", price=10, quantity=100)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _bill(self):
+        return {"items": [{"product": self.product.id, "qty": 1, "unit_price": "10.00"}]}
+
+    def test_bills_over_the_weekly_limit_are_rejected_before_any_write(self):
+        for _ in range(3):
+            self.assertEqual(self.client.post("/api/invoices/", self._bill(), format="json").status_code, 201)
+        resp = self.client.post("/api/invoices/", self._bill(), format="json")
+
+        self.assertEqual(resp.status_code, 403)
+        self.assertEqual(Invoice.objects.count(), 3)
+        self.assertEqual(quotas.bills_this_week(self.shop.id), 3)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, Decimal("97"))
+
+        # Deleting a bill gives its slot back.
+        self.client.delete(f"/api/invoices/{Invoice.objects.first().pk}/")
+        self.assertEqual(self.client.post("/api/invoices/", self._bill(), format="json").status_code, 201)
+
+    def test_shopkeepers_bill_under_the_owners_plan(self):
+        keeper = User.objects.create_user(
+            email="keeper@example.com", username="keeper", password="pass12345",
+            role=User.Role.SHOPKEEPER, shop=self.shop,
+        )
+        self.client.force_authenticate(keeper)
+        for _ in range(3):
+            self.assertEqual(self.client.post("/api/invoices/", self._bill(), format="json").status_code, 201)
+        self.assertEqual(self.client.post("/api/invoices/", self._bill(), format="json").status_code, 403)
+
+    def test_batch_sync_stops_at_the_limit_and_counters_rebuild(self):
+        self.client.post("/api/invoices/", self._bill(), format="json")
+        resp = self.client.post("/api/invoices/batch/", [self._bill()] * 3, format="json")
+
+        self.assertEqual(resp.status_code, 207)
+        self.assertEqual([r["status"] for r in resp.data["results"]], ["created", "created", "error"])
+        self.assertEqual(quotas.bills_this_week(self.shop.id), 3)
+
+        WeeklyBillCount.objects.all().delete()
+        self.assertEqual(quotas.rebuild(), 1)
+        self.assertEqual(quotas.bills_this_week(self.shop.id), 3)
+
+
+class InvoiceSequenceTests(TransactionTestCase):
+    def setUp(self):
+        reset_blocks()
+        self.shop = Shop.objects.create(name="Test Kirana", counter_invoice=7)
+
+    def tearDown(self):
+        reset_blocks()
+
+    @override_settings(INVOICE_NUMBER_BLOCK_SIZE=5)
+    def test_numbers_are_served_from_a_reserved_block(self):
+        numbers = [next_invoice_number(self.shop.id) for _ in range(3)]
+        # Continues from the legacy Shop.counter_invoice.
+        self.assertEqual(numbers, [f"{self.shop.id}-8", f"{self.shop.id}-9", f"{self.shop.id}-10"])
+        # One block of 5 was reserved; the other two stay with this worker.
+        self.assertEqual(InvoiceSequence.objects.get(shop=self.shop).last_value, 12)
+
+    @override_settings(INVOICE_NUMBER_BLOCK_SIZE=5)
+    def test_dropped_block_leaves_a_gap_but_never_repeats(self):
+        first = allocate_invoice_numbers(self.shop.id, 2)
+        reset_blocks()  # e.g. worker restart
+        second = allocate_invoice_numbers(self.shop.id, 1)
+        self.assertEqual(list(first), [8, 9])
+        self.assertEqual(list(second), [13])
+
+    def test_inside_a_transaction_only_the_requested_numbers_are_taken(self):
+        with transaction.atomic():
+            numbers = allocate_invoice_numbers(self.shop.id, 3)
+        self.assertEqual(list(numbers), [8, 9, 10])
+        self.assertEqual(InvoiceSequence.objects.get(shop=self.shop).last_value, 10)
@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from .models import Shop, SubscriptionPlan, TaxProfile
-from accounts.models import User
+from accounts.models import User, normalize_email_address
 from django.contrib.auth.hashers import make_password
 
 # SubscriptionPlan Serializer
@@ -66,6 +66,7 @@ class ShopRegistrationSerializer(serializers.Serializer):
         """
         Check that the email is not already in use.
         """
+        value = normalize_email_address(value)
         if User.objects.filter(email=value).exists(): # Changed to check email
             raise serializers.ValidationError("A user with this email already exists.")
         return value
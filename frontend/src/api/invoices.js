@@ -19,15 +19,43 @@ export const createInvoice = async (data) => {
   };
   // -------------------------
 
-  const res = await client.post("/invoices/", payload);
+  // The caller keeps one key per bill and sends it again on every retry,
+  // so a timed-out request that actually reached the server is not billed
+  // twice. A key made up here would be new on each retry and dedupe nothing.
+  const headers = data.idempotencyKey ? { "Idempotency-Key": data.idempotencyKey } : {};
+
+  const res = await client.post("/invoices/", payload, { headers });
+  return res.data;
+};
+
+// Sync bills queued while offline in one request.
+// Each entry may carry its own `idempotency_key`; the response has one
+// result per entry ({status: "created" | "replayed" | "error", ...}).
+export const syncInvoices = async (invoices) => {
+  const res = await client.post("/invoices/batch/", invoices);
+  return res.data;
+};
+
+// Get one page of invoices, newest first.
+// filters: { from, to, status, customer_mobile, page_size } (dates as YYYY-MM-DD)
+// Returns { next, previous, results }; pass `next` back as `cursorUrl`.
+export const getInvoicePage = async (filters = {}, cursorUrl = null) => {
+  const res = cursorUrl
+    ? await client.get(cursorUrl)
+    : await client.get("/invoices/", { params: filters });
   return res.data;
 };
 
-// Get all invoices
-export const getInvoices = async () => {
-  const res = await client.get("/invoices/");
-  // Handle both {data: [...]} and [...] responses
-  return res?.data || res || []; 
+// Get all invoices matching the filters (follows every cursor page)
+export const getInvoices = async (filters = {}) => {
+  const invoices = [];
+  let page = await getInvoicePage({ page_size: 500, ...filters });
+  invoices.push(...(page?.results || []));
+  while (page?.next) {
+    page = await getInvoicePage({}, page.next);
+    invoices.push(...(page?.results || []));
+  }
+  return invoices;
 };
 
 // Get single invoice
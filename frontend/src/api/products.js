@@ -1,26 +1,87 @@
 // frontend/src/api/products.js
 import client from "./axios"; // <-- Changed from "./client"
 
+// Local replica of the shop's products, kept current from the server's
+// delta feed (/products/?updated_since=<cursor>) so a page load only
+// downloads what changed since the last one.
+const replicaKey = () => {
+  const shop = JSON.parse(localStorage.getItem("shop")) || {};
+  return `products-replica:${shop.id ?? "none"}`;
+};
+
+const loadReplica = () => {
+  try {
+    return JSON.parse(localStorage.getItem(replicaKey())) || { cursor: "0", rows: {} };
+  } catch {
+    return { cursor: "0", rows: {} };
+  }
+};
+
+const saveReplica = (replica) => {
+  try {
+    localStorage.setItem(replicaKey(), JSON.stringify(replica));
+  } catch {
+    // Storage full: the next call simply syncs from the last saved cursor
+  }
+};
+
+// The feed trails the clock by a few seconds, so our own writes are
+// applied to the replica straight from the response
+const updateReplica = (fn) => {
+  const replica = loadReplica();
+  fn(replica.rows);
+  saveReplica(replica);
+};
+
 // Get all products
 export const getProducts = async () => {
-  const res = await client.get("/products/"); // updated backend endpoint
-  return res.data; // returns array of products
+  let replica = loadReplica();
+  let page;
+  do {
+    try {
+      const res = await client.get("/products/", { params: { updated_since: replica.cursor } });
+      page = res.data;
+    } catch (err) {
+      // Cursor too old for the server's tombstones: start over
+      if (err.response?.status !== 410 || replica.cursor === "0") throw err;
+      replica = { cursor: "0", rows: {} };
+      continue;
+    }
+    page.changed.forEach((p) => { replica.rows[p.id] = p; });
+    page.deleted.forEach((id) => { delete replica.rows[id]; });
+    replica.cursor = page.cursor;
+  } while (!page || page.has_more);
+  saveReplica(replica);
+  return Object.values(replica.rows); // returns array of products
 };
 
 // Create a new product
 export const createProduct = async (product) => {
   const res = await client.post("/products/", product);
+  updateReplica((rows) => { rows[res.data.id] = res.data; });
   return res.data;
 };
 
 // Update a product by ID
 export const updateProduct = async (id, product) => {
   const res = await client.put(`/products/${id}/`, product);
+  updateReplica((rows) => { rows[res.data.id] = res.data; });
   return res.data;
 };
 
 // Soft delete a product by ID (optional)
 export const deleteProduct = async (id) => {
   const res = await client.delete(`/products/${id}/`);
+  updateReplica((rows) => { delete rows[id]; });
+  return res.data;
+};
+// Server-side prefix search over name and SKU (ranked, capped by the server)
+export const searchProducts = async (q, limit = 20) => {
+  const res = await client.get("/products/search/", { params: { q, limit } });
   return res.data;
-};
\ No newline at end of file
+};
+// Exact SKU / barcode lookup for scanners (served from the server's hot cache)
+export const getProductBySku = async (code) => {
+  const res = await client.get(`/products/by-sku/${encodeURIComponent(code)}/`);
+  return res.data;
+};
@@ -0,0 +1,9 @@
+// frontend/src/api/reports.js
+import client from "./axios";
+
+// Dashboard cards: sales (today/week/month/all-time), invoice counts,
+// product, low-stock and out-of-stock counts and inventory value.
+export const getDashboardSummary = async () => {
+  const res = await client.get("/reports/dashboard/");
+  return res.data;
+};
@@ -1,7 +1,7 @@
 // frontend/src/pages/Billing.jsx
 import React, { useState, useEffect, useRef } from "react";
 // --- FIX: Corrected import paths with extensions ---
-import { getProducts } from "../api/products.js";
+import { getProductBySku, searchProducts } from "../api/products.js";
 import { createInvoice } from "../api/invoices.js";
 import { useSubscription } from "../context/SubscriptionContext.jsx"; // Import the hook
 // --------------------------------------------------
@@ -25,6 +25,9 @@ export default function Billing() {
   const mobileRef = useRef();
   const searchRef = useRef();
   const productRefs = useRef({});
+  // One Idempotency-Key per cart: retries and double submits of the same
+  // bill reuse it; it is dropped when the cart is cleared.
+  const billKeyRef = useRef(null);
 
   const [searchMatches, setSearchMatches] = useState([]);
   const [currentMatchIndex, setCurrentMatchIndex] = useState(-1);
@@ -34,36 +37,49 @@ export default function Billing() {
   const shopName = shop?.name || "My Shop";
   const today = new Date().toLocaleDateString();
 
-  // 🔹 Load products safely
-  const loadProducts = async () => {
+  const normalizeProduct = (p) => ({
+    id: p.id,
+    name: p.name,
+    price: Number(p.price),
+    unit: p.unit,
+    // Use tax_rate from API, fallback to gst_percent
+    tax_rate: Number(p.tax_rate || p.gst_percent || 0),
+    stock: Number(p.quantity),
+  });
+
+  // Latest query sent; responses for older ones arrive late and are dropped
+  const latestQueryRef = useRef("");
+
+  // 🔹 Search products on the server (name / SKU prefix, ranked, capped)
+  const loadProducts = async (query) => {
+    latestQueryRef.current = query;
+    if (!query.trim()) {
+      setProducts([]);
+      return;
+    }
     try {
-      const res = await getProducts();
-      // Handle both {data: [...]} and [...] responses
-      const data = res.data || res; 
-      const normalized = Array.isArray(data)
-        ? data.map((p) => ({
-            id: p.id,
-            name: p.name,
-            price: Number(p.price),
-            unit: p.unit,
-            // Use tax_rate from API, fallback to gst_percent
-            tax_rate: Number(p.tax_rate || p.gst_percent || 0), 
-            stock: Number(p.quantity),
-          }))
-        : [];
+      const data = await searchProducts(query);
+      if (latestQueryRef.current !== query) return;
+      const normalized = Array.isArray(data) ? data.map(normalizeProduct) : [];
       setProducts(normalized);
     } catch (err) {
-      console.error("Failed to load products:", err);
-      toast.error("Failed to load products. Please login or check your network.");
+      if (latestQueryRef.current !== query) return;
+      console.error("Failed to search products:", err);
+      toast.error("Failed to search products. Please login or check your network.");
       setProducts([]);
     }
   };
 
   useEffect(() => {
-    loadProducts();
     nameRef.current?.focus();
   }, []);
 
+  // Debounce keystrokes so a fast typist sends one request per pause
+  useEffect(() => {
+    const timer = setTimeout(() => loadProducts(search), 150);
+    return () => clearTimeout(timer);
+  }, [search]);
+
   // 🔹 Keyboard shortcuts
   useEffect(() => {
     const handleKeys = (e) => {
@@ -172,6 +188,7 @@ export default function Billing() {
         })),
         total_amount: total, 
         grand_total: total,
+        idempotencyKey: (billKeyRef.current ||= crypto.randomUUID()),
       };
 
       const res = await createInvoice(payload); 
@@ -190,13 +207,13 @@ export default function Billing() {
   // 🔹 Reset states
   const confirmInvoice = async () => {
     setCart([]);
+    billKeyRef.current = null;
     setCustomerName("");
     setCustomerMobile("");
     setSearch("");
     setHighlightedId(null);
     setShowModal(false);
     setInvoiceData(null); // Clear invoice data
-    await loadProducts();
     nameRef.current?.focus();
   };
 
@@ -209,11 +226,8 @@ export default function Billing() {
   // ... (Search logic: handleSearchKeys, scrollToProduct remain the same)
   // 🔹 Search logic
   const handleSearchKeys = (e) => {
-    const lowerSearch = search.toLowerCase();
-    const filtered = (products || []).filter((p) =>
-      p.name.toLowerCase().includes(lowerSearch)
-    );
-    const filteredIds = filtered.map((p) => p.id);
+    // The server already filtered and ranked the results
+    const filteredIds = (products || []).map((p) => p.id);
 
     if (e.key === "ArrowRight") {
       e.preventDefault();
@@ -240,6 +254,11 @@ export default function Billing() {
       if (prod) addToCart(prod);
     }
 
+    // A barcode scanner types the code and presses Enter: add it directly
+    if (e.key === "Enter" && currentMatchIndex < 0 && search.trim()) {
+      addScannedProduct(search.trim());
+    }
+
     if (!["Enter", "ArrowLeft", "ArrowRight"].includes(e.key)) {
       setSearchMatches(filteredIds);
       setCurrentMatchIndex(-1);
@@ -247,6 +266,16 @@ export default function Billing() {
     }
   };
 
+  const addScannedProduct = async (code) => {
+    try {
+      addToCart(normalizeProduct(await getProductBySku(code)));
+      setSearch("");
+    } catch (err) {
+      if (err.response?.status === 404) toast.error(`No product with SKU ${code}`);
+      else console.error("Failed to look up SKU:", err);
+    }
+  };
+
   const scrollToProduct = (id) => {
     const element = productRefs.current[id];
     if (element) {
@@ -318,7 +347,6 @@ export default function Billing() {
       {/* Product List - Horizontal scroll is good for mobile */}
       <div className="flex gap-4 mb-6 overflow-x-auto border p-3 rounded bg-gray-50 min-h-[140px]">
         {(products || [])
-          .filter((p) => p.name.toLowerCase().includes(search.toLowerCase()))
           .map((p) => {
             const orderedItem = cart.find((c) => c.id === p.id);
             const orderedQty = orderedItem ? orderedItem.qty : 0;
@@ -345,7 +373,9 @@ export default function Billing() {
             );
           })}
         {products.length === 0 && (
-          <p className="text-gray-500 self-center mx-auto">Loading products...</p>
+          <p className="text-gray-500 self-center mx-auto">
+            {search.trim() ? "No matching products" : "Type a product name or SKU to search"}
+          </p>
         )}
       </div>
 
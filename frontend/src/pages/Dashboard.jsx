@@ -1,6 +1,6 @@
 import React, { useEffect, useState } from "react";
-import { getInvoices } from "../api/invoices";
-import { getProducts } from "../api/products";
+import { getInvoicePage } from "../api/invoices";
+import { getDashboardSummary } from "../api/reports";
 
 // --- Icon Components for UI enhancement ---
 const CurrencyRupeeIcon = () => (
@@ -32,7 +32,7 @@ const NoSymbolIcon = () => (
 // --- Main Dashboard Component ---
 export default function Dashboard() {
   const [invoices, setInvoices] = useState([]);
-  const [products, setProducts] = useState([]);
+  const [summary, setSummary] = useState(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
 
@@ -41,27 +41,20 @@ export default function Dashboard() {
       setLoading(true);
       setError(null);
 
-      // Helper to safely extract array data from API responses
-      const normalizeApiResponse = (response) => {
-        if (Array.isArray(response?.data)) return response.data;
-        if (Array.isArray(response)) return response;
-        return [];
-      };
-
       try {
-        // --- Fetch data in parallel for better performance ---
-        const [invRes, prodRes] = await Promise.all([
-          getInvoices(),
-          getProducts(),
+        // --- Totals are aggregated on the server; only the 10 recent invoices are fetched ---
+        const [summaryRes, invRes] = await Promise.all([
+          getDashboardSummary(),
+          getInvoicePage({ page_size: 10 }),
         ]);
 
-        setInvoices(normalizeApiResponse(invRes));
-        setProducts(normalizeApiResponse(prodRes));
+        setSummary(summaryRes);
+        setInvoices(Array.isArray(invRes?.results) ? invRes.results : []);
       } catch (err) {
         console.error("Dashboard fetch error:", err);
         setError("Failed to load dashboard data. Please try again later.");
         setInvoices([]);
-        setProducts([]);
+        setSummary(null);
       } finally {
         setLoading(false);
       }
@@ -69,23 +62,12 @@ export default function Dashboard() {
 
     fetchData();
   }, []);
-// --- Calculated Metrics ---
-const totalSales = invoices.reduce(
-  (sum, inv) => sum + Number(inv.grand_total || 0), // Use grand_total consistently
-  0
-);
-const totalInvoices = invoices.length;
-const totalProducts = products.length;
-
-// --- FIX: Use a fixed threshold (e.g., 5) or fetch from settings ---
-const LOW_STOCK_THRESHOLD = 5; // Define the threshold here
-
-const lowStock = products.filter(
-  (p) => Number(p.quantity) > 0 && Number(p.quantity) <= LOW_STOCK_THRESHOLD
-).length;
-// ---------------------------------------------------------------------
-
-const outOfStock = products.filter((p) => Number(p.quantity) === 0).length;
+// --- Metrics (computed by /api/reports/dashboard/) ---
+const totalSales = Number(summary?.total_sales || 0);
+const totalInvoices = summary?.total_invoices || 0;
+const totalProducts = summary?.total_products || 0;
+const lowStock = summary?.low_stock || 0;
+const outOfStock = summary?.out_of_stock || 0;
 
   if (loading) {
     return <div className="flex items-center justify-center h-screen text-gray-500">Loading, please wait...</div>;
@@ -92,7 +92,11 @@ export default function Reports() {
             try {
                 setLoading(true);
                 setError(null);
-                const invRes = await getInvoices();
+                // Date range is filtered on the server
+                const invRes = await getInvoices({
+                    ...(fromDate && { from: fromDate }),
+                    ...(toDate && { to: toDate }),
+                });
                 const prodRes = await getProducts();
 
                 const invoiceData = invRes?.data || invRes || [];
@@ -109,7 +113,7 @@ export default function Reports() {
             }
         };
         loadData();
-    }, []);
+    }, [fromDate, toDate]);
 
     // Memoized calculations...
     const filteredInvoices = useMemo(() => {